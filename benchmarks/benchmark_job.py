@@ -0,0 +1,246 @@
+"""
+benchmark_job.py
+~~~~~~~~~~~~~~~~
+
+Benchmark reprodutível das etapas do job sobre extratos sintéticos.
+Para cada tamanho pedido, gera (uma vez) os dados com `gerar_dados`,
+executa as etapas do `etl_job` em `local[*]` medindo cada uma com
+`dependencies.perfil` e grava o resultado em `benchmarks/resultados`.
+Um resultado anterior pode ser passado para comparação; etapas que
+ficaram mais lentas que a tolerância são apontadas como regressão.
+
+Os caminhos lidos e escritos pelo Spark são absolutos (a JVM não segue
+o `os.chdir`); só os PNGs, gravados pelo Python, usam o diretório de
+trabalho corrente. Como o Spark é preguiçoso, extract_data e
+transform_data são materializadas com o sink `noop`; os tempos dessas
+etapas incluem as anteriores (a extração é contada também em
+transform_data). Nos tamanhos abaixo do limite do motor local, a etapa
+`motor_local` mede o mesmo cubo calculado sem Spark e registra se ele é
+idêntico ao do Spark.
+
+Uso:
+    $SPARK_HOME/bin/spark-submit --master local[*] \\
+        --py-files packages.zip,jobs/etl_job.py \\
+        benchmarks/benchmark_job.py --linhas 100000 1000000 \\
+        --comparar benchmarks/resultados/<resultado_anterior>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+
+from pyspark.sql import SparkSession
+
+import etl_job
+from dependencies.agregacao import construir_cubo
+from dependencies.graficos import renderizar
+from dependencies.motor_local import (LIMITE_BYTES_LOCAL, construir_cubo_local, cubos_iguais,
+                                      extrair_local, tamanho_entrada, transformar_local)
+from dependencies.particionamento import ajustar_particoes, aplicar_configuracao, tamanho_fontes
+from dependencies.perfil import Perfil
+from dependencies.semanas import calcular_series, salvar_series
+from dependencies.staging import preparar_staging
+from gerar_dados import gerar_dados
+
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_RESULTADOS = os.path.join(DIR_BENCHMARKS, 'resultados')
+DIR_TRABALHO = os.path.join(DIR_BENCHMARKS, 'trabalho')
+CONFIG_JOB = os.path.join(DIR_BENCHMARKS, os.pardir, 'configs', 'etl_config.json')
+
+
+def preparar_trabalho(spark, linhas, anos, semente, modelo):
+    """Cria (ou reaproveita) o diretório de trabalho de um tamanho.
+
+    Os dados gerados são reaproveitados enquanto os parâmetros de geração
+    forem os mesmos; o staging é sempre apagado para medir a conversão.
+
+    :return: Caminho do diretório de trabalho.
+    """
+    trabalho = os.path.join(DIR_TRABALHO, str(linhas))
+    parametros = {'linhas': linhas, 'anos': anos, 'semente': semente}
+    arquivo_parametros = os.path.join(trabalho, 'parametros.json')
+
+    atuais = None
+    if os.path.exists(arquivo_parametros):
+        with open(arquivo_parametros, 'r') as arquivo:
+            atuais = json.load(arquivo)
+
+    if atuais != parametros:
+        if os.path.isdir(trabalho):
+            shutil.rmtree(trabalho)
+        gerar_dados(spark, os.path.join(trabalho, 'data', 'raw'), linhas, anos, modelo, semente)
+        with open(arquivo_parametros, 'w') as arquivo:
+            json.dump(parametros, arquivo)
+
+    for gerado in ('staging', 'agregados', 'plots'):
+        caminho = os.path.join(trabalho, 'data', gerado)
+        if os.path.isdir(caminho):
+            shutil.rmtree(caminho)
+    os.makedirs(os.path.join(trabalho, 'data', 'plots'))
+    return trabalho
+
+
+def executar_etapas(spark, perfil, trabalho, graficos=True, particionamento=None):
+    """Executa as etapas do job sobre um diretório de trabalho, medindo cada uma.
+
+    :param spark: SparkSession.
+    :param perfil: Instância de `Perfil`.
+    :param trabalho: Diretório de trabalho (também o diretório corrente).
+    :param graficos: Se False, não renderiza os PNGs.
+    :param particionamento: Opções de particionamento da configuração do job.
+    :return: None
+    """
+    dir_raw = os.path.join(trabalho, 'data', 'raw')
+    dir_staging = os.path.join(trabalho, 'data', 'staging')
+    particionamento = particionamento or {}
+
+    with perfil.etapa('staging'):
+        preparar_staging(spark, dir_raw, dir_staging)
+
+    with perfil.etapa('particionamento') as etapa:
+        etapa['particoes_shuffle'] = ajustar_particoes(spark, tamanho_fontes(dir_staging), **particionamento)
+
+    with perfil.etapa('extract_data'):
+        etl_job.extract_data(spark, dir_staging, particionamento).write.format('noop').mode('overwrite').save()
+
+    with perfil.etapa('transform_data'):
+        (etl_job.transform_data(etl_job.extract_data(spark, dir_staging, particionamento))
+         .write.format('noop').mode('overwrite').save())
+
+    with perfil.etapa('cubo') as etapa:
+        cubo_sdf = construir_cubo(etl_job.transform_data(etl_job.extract_data(spark, dir_staging, particionamento)))
+        cubo = cubo_sdf.toPandas()
+        etapa['linhas_saida'] = len(cubo)
+
+    # O motor local só é medido nos tamanhos em que o modo automático o usaria
+    if tamanho_entrada(dir_raw) <= LIMITE_BYTES_LOCAL:
+        with perfil.etapa('motor_local') as etapa:
+            dados = extrair_local(etl_job.COLUNAS_EXTRACAO, dir_raw)
+            cubo_local = construir_cubo_local(transformar_local(dados, obrigatorias=etl_job.COLUNAS_OBRIGATORIAS))
+            etapa['linhas_saida'] = len(cubo_local)
+            etapa['cubo_identico'] = cubos_iguais(cubo, cubo_local)
+
+    with perfil.etapa('semanas'):
+        dir_agregados = os.path.join(trabalho, 'data', 'agregados')
+        salvar_series(spark, calcular_series(cubo_sdf),
+                      os.path.join(dir_agregados, 'semanas'), os.path.join(dir_agregados, 'alertas'))
+
+    with perfil.etapa('load_plot'):
+        descricoes = []
+        for analise in (etl_job.load_plot_1, etl_job.load_plot_2, etl_job.load_plot_3,
+                        etl_job.load_plot_4, etl_job.load_plot_5, etl_job.load_plot_6):
+            descricoes += analise(cubo)
+
+    if graficos:
+        with perfil.etapa('renderizar'):
+            renderizar(descricoes)
+
+    cubo_sdf.unpersist()
+    return None
+
+
+def versao_codigo():
+    """Commit atual do repositório (None fora de um checkout git)."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=DIR_BENCHMARKS,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultado, anterior, tolerancia):
+    """Compara os tempos por etapa com um resultado anterior.
+
+    :param resultado: Resultado atual.
+    :param anterior: Resultado anterior do mesmo tamanho.
+    :param tolerancia: Aumento relativo aceito (0.1 = 10%).
+    :return: Lista de tuplas (etapa, tempo anterior, tempo atual, razão,
+        regressão).
+    """
+    tempos_anteriores = {etapa['etapa']: etapa['duracao_s'] for etapa in anterior['etapas']}
+    linhas = []
+    for etapa in resultado['etapas']:
+        antes = tempos_anteriores.get(etapa['etapa'])
+        if not antes:
+            continue
+        razao = etapa['duracao_s'] / antes
+        linhas.append((etapa['etapa'], antes, etapa['duracao_s'], razao, razao > 1 + tolerancia))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das etapas do job ETL.')
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10 ** 5, 10 ** 6],
+                        help='tamanhos a medir (ex.: 100000 1000000 10000000 100000000)')
+    parser.add_argument('--anos', type=int, nargs='+', default=[2019, 2020, 2021])
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--sem-graficos', action='store_true', help='não mede a renderização dos PNGs')
+    parser.add_argument('--comparar', nargs='*', default=[],
+                        help='resultados anteriores para comparação (casados pelo número de linhas)')
+    parser.add_argument('--tolerancia', type=float, default=0.1)
+    args = parser.parse_args()
+
+    modelo = os.path.abspath('data/raw')
+    anteriores = {}
+    for caminho in args.comparar:
+        with open(caminho, 'r') as arquivo:
+            anterior = json.load(arquivo)
+        anteriores[anterior['linhas']] = anterior
+
+    # Mesma configuração de AQE e particionamento do job
+    config = None
+    if os.path.exists(CONFIG_JOB):
+        with open(CONFIG_JOB, 'r') as arquivo:
+            config = json.load(arquivo)
+
+    spark = SparkSession.builder.appName('benchmark_etl_job').getOrCreate()
+    aplicar_configuracao(spark, config)
+    diretorio_original = os.getcwd()
+    os.makedirs(DIR_RESULTADOS, exist_ok=True)
+    regressoes = 0
+
+    for linhas in args.linhas:
+        trabalho = preparar_trabalho(spark, linhas, args.anos, args.semente, modelo)
+        os.chdir(trabalho)
+        try:
+            perfil = Perfil(spark)
+            executar_etapas(spark, perfil, trabalho, graficos=not args.sem_graficos,
+                            particionamento=(config or {}).get('particionamento'))
+            relatorio = perfil.salvar_relatorio(os.path.join(trabalho, 'relatorio_execucao.json'))
+        finally:
+            os.chdir(diretorio_original)
+
+        resultado = dict(relatorio,
+                         linhas=linhas,
+                         anos=args.anos,
+                         semente=args.semente,
+                         master=spark.sparkContext.master,
+                         paralelismo=spark.sparkContext.defaultParallelism,
+                         versao_spark=spark.version,
+                         versao_python=platform.python_version(),
+                         commit=versao_codigo())
+        nome = '%s_%d.json' % (time.strftime('%Y%m%d_%H%M%S'), linhas)
+        with open(os.path.join(DIR_RESULTADOS, nome), 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+        print('== %d linhas (%s)' % (linhas, nome))
+        for etapa in resultado['etapas']:
+            print('%-16s %10.3fs' % (etapa['etapa'], etapa['duracao_s']))
+
+        if linhas in anteriores:
+            for etapa, antes, agora, razao, regressao in comparar(resultado, anteriores[linhas], args.tolerancia):
+                print('%-16s %10.3fs -> %10.3fs (x%.2f)%s' % (etapa, antes, agora, razao,
+                                                             '  REGRESSAO' if regressao else ''))
+                regressoes += regressao
+
+    spark.stop()
+    return 1 if regressoes else 0
+
+
+# entry point for PySpark benchmark application
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,189 @@
+"""
+gerar_dados.py
+~~~~~~~~~~~~~~
+
+Gerador de extratos sintéticos do SINAN para os benchmarks do job. Os
+arquivos seguem o cabeçalho real de cada doença (copiado dos CSVs em
+`data/raw`) e o nome `<doenca>_<ano>_recife.csv`, e são gerados pelo
+próprio Spark, de modo que 10^8 linhas não passam pelo driver.
+
+A distribuição imita os dados reais: a dengue domina as notificações,
+os bairros seguem uma cauda longa (poucos bairros concentram a maior
+parte dos casos), uma fração dos nomes vem com erros de codificação
+como `JARDIM S├O PAULO` e algumas colunas têm nulos nas taxas
+observadas. As semanas de notificação e de sintomas seguem o calendário
+epidemiológico de `dependencies.semanas`, não as semanas ISO.
+
+Uso:
+    $SPARK_HOME/bin/spark-submit --master local[*] --py-files packages.zip \\
+        benchmarks/gerar_dados.py --linhas 1000000 --destino /tmp/sinan/data/raw
+"""
+
+import argparse
+import glob
+import os
+import shutil
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+from dependencies.bairros import CORRECAO_BAIRRO_RESIDENCIA
+from dependencies.fontes import FONTES
+from dependencies.semanas import semana_epidemiologica
+
+# Participação de cada doença no total de notificações
+PESOS_DOENCAS = {'dengue': 0.8, 'chikungunya': 0.16, 'zika': 0.04}
+
+# Taxa de nulos por coluna (sem dt_nascimento, a idade vem de nu_idade)
+TAXAS_NULOS = {
+    'dt_nascimento': 0.04,
+    'no_bairro_residencia': 0.005,
+    'tp_sexo': 0.001,
+}
+
+# Fração dos bairros com erro de codificação ou digitação
+TAXA_BAIRROS_SUJOS = 0.01
+
+# Expoente da cauda longa dos bairros (quanto maior, mais concentrado)
+EXPOENTE_BAIRROS = 3.0
+
+
+def ler_cabecalho(modelo, doenca):
+    """Lê o cabeçalho real dos extratos de uma doença.
+
+    :param modelo: Diretório com os CSVs reais usados como modelo.
+    :param doenca: Prefixo dos arquivos da doença.
+    :return: Lista com os nomes das colunas.
+    """
+    arquivos = sorted(glob.glob(os.path.join(modelo, doenca + '_*.csv')))
+    if not arquivos:
+        raise ValueError('nenhum extrato de ' + doenca + ' em ' + modelo)
+    with open(arquivos[0], 'r', encoding='utf-8') as arquivo:
+        return arquivo.readline().strip().split(';')
+
+
+def escolher(valores, indice):
+    """Expressão que escolhe um valor de uma lista por um índice (base 0)."""
+    return F.element_at(F.array(*[F.lit(valor) for valor in valores]), indice.cast('int') + 1)
+
+
+def nulo_com_taxa(coluna, taxa, semente):
+    """Troca uma fração `taxa` dos valores da coluna por nulo."""
+    return F.when(F.rand(semente) < taxa, F.lit(None).cast('string')).otherwise(coluna)
+
+
+def gerar_doenca(spark, doenca, linhas, anos, cabecalho, semente):
+    """Gera as notificações sintéticas de uma doença.
+
+    :param spark: SparkSession.
+    :param doenca: Prefixo dos arquivos da doença.
+    :param linhas: Número de linhas.
+    :param anos: Lista de anos de notificação.
+    :param cabecalho: Colunas do extrato real da doença.
+    :param semente: Semente dos geradores aleatórios.
+    :return: DataFrame Spark com as colunas do cabeçalho e `ano`.
+    """
+    canonicos = sorted(set(CORRECAO_BAIRRO_RESIDENCIA.values()))
+    sujos = [nome for nome, correto in CORRECAO_BAIRRO_RESIDENCIA.items() if nome != correto]
+    coluna_ano = 'ano_notificacao' if 'ano_notificacao' in cabecalho else 'notificacao_ano'
+
+    sdf = (spark
+           .range(linhas)
+           .withColumn('ano', escolher(anos, F.floor(F.rand(semente) * len(anos))))
+           .withColumn('data', F.date_add(F.make_date('ano', F.lit(1), F.lit(1)),
+                                          F.floor(F.rand(semente + 1) * 365).cast('int')))
+           # Idade com mais casos entre adultos jovens
+           .withColumn('idade', F.least(F.lit(100), F.floor(F.abs(F.randn(semente + 2)) * 25 + F.rand(semente + 3) * 10)).cast('int'))
+           .withColumn('nascimento', F.add_months('data', -F.col('idade') * 12 - F.floor(F.rand(semente + 4) * 12).cast('int')))
+           .withColumn('bairro', F.when(F.rand(semente + 5) < TAXA_BAIRROS_SUJOS,
+                                        escolher(sujos, F.floor(F.rand(semente + 6) * len(sujos))))
+                                  .otherwise(escolher(canonicos, F.floor(F.pow(F.rand(semente + 7), EXPOENTE_BAIRROS) * len(canonicos)))))
+           .withColumn('sexo_sorteio', F.rand(semente + 8)))
+
+    gerados = {
+        'nu_notificacao': (F.col('id') + 1000000).cast('string'),
+        'tp_notificacao': F.lit('2'),
+        'dt_notificacao': F.date_format('data', 'yyyy-MM-dd'),
+        'ds_semana_notificacao': semana_epidemiologica(F.col('data')).cast('string'),
+        coluna_ano: F.col('ano').cast('string'),
+        'co_uf_notificacao': F.lit('26'),
+        'co_municipio_notificacao': F.lit('261160'),
+        'dt_diagnostico_sintoma': F.date_format(F.date_sub('data', 3), 'yyyy-MM-dd'),
+        'ds_semana_sintoma': semana_epidemiologica(F.date_sub('data', 3)).cast('string'),
+        # Metade das datas de nascimento vem só com ano e mês, como nos extratos de 2019
+        'dt_nascimento': F.when(F.rand(semente + 9) < 0.5, F.date_format('nascimento', 'yyyy-MM'))
+                          .otherwise(F.date_format('nascimento', 'yyyy-MM-dd')),
+        'nu_idade': (F.col('idade') + 4000).cast('string'),
+        'tp_sexo': F.when(F.col('sexo_sorteio') < 0.55, 'F').when(F.col('sexo_sorteio') < 0.99, 'M').otherwise('I'),
+        'co_uf_residencia': F.lit('26'),
+        'co_municipio_residencia': F.lit('261160'),
+        'no_bairro_residencia': F.col('bairro'),
+    }
+
+    colunas = []
+    for posicao, nome in enumerate(cabecalho):
+        coluna = gerados.get(nome, F.lit(None).cast('string'))
+        if nome in TAXAS_NULOS:
+            coluna = nulo_com_taxa(coluna, TAXAS_NULOS[nome], semente + 100 + posicao)
+        colunas.append(coluna.alias(nome))
+
+    return sdf.select(*colunas, 'ano')
+
+
+def gerar_dados(spark, destino, linhas, anos, modelo='data/raw', semente=42):
+    """Gera os extratos sintéticos de todas as doenças.
+
+    Cada par doença/ano vira um único arquivo `<doenca>_<ano>_recife.csv`
+    em `destino`, no mesmo formato dos extratos reais.
+
+    :param spark: SparkSession.
+    :param destino: Diretório dos CSVs gerados.
+    :param linhas: Número total de linhas.
+    :param anos: Lista de anos de notificação.
+    :param modelo: Diretório com os CSVs reais usados como modelo.
+    :param semente: Semente dos geradores aleatórios.
+    :return: Lista com os arquivos gerados.
+    """
+    os.makedirs(destino, exist_ok=True)
+    gerados = []
+
+    for indice, (doenca, peso) in enumerate(sorted(PESOS_DOENCAS.items())):
+        if doenca not in FONTES:
+            continue
+        temporario = os.path.join(destino, '_tmp_' + doenca)
+        sdf = gerar_doenca(spark, doenca, int(linhas * peso), anos,
+                           ler_cabecalho(modelo, doenca), semente + 1000 * indice)
+
+        # Um único arquivo por ano: todas as linhas do ano vão para a mesma tarefa
+        (sdf
+         .repartition('ano')
+         .write
+         .mode('overwrite')
+         .partitionBy('ano')
+         .csv(temporario, sep=';', header=True))
+
+        for ano in anos:
+            partes = glob.glob(os.path.join(temporario, 'ano=%d' % ano, 'part-*.csv'))
+            if not partes:
+                continue
+            arquivo = os.path.join(destino, '%s_%d_recife.csv' % (doenca, ano))
+            shutil.move(partes[0], arquivo)
+            gerados.append(arquivo)
+        shutil.rmtree(temporario)
+
+    return gerados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera extratos sintéticos do SINAN.')
+    parser.add_argument('--linhas', type=int, default=10 ** 5, help='número total de notificações')
+    parser.add_argument('--anos', type=int, nargs='+', default=[2019, 2020, 2021])
+    parser.add_argument('--destino', required=True, help='diretório dos CSVs gerados')
+    parser.add_argument('--modelo', default='data/raw', help='diretório com os CSVs reais')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    spark = SparkSession.builder.appName('gerar_dados_sinan').getOrCreate()
+    for arquivo in gerar_dados(spark, args.destino, args.linhas, args.anos, args.modelo, args.semente):
+        print(arquivo)
+    spark.stop()
@@ -0,0 +1,202 @@
+"""
+agregacao.py
+~~~~~~~~~~~~
+
+Módulo com o cubo de agregação compartilhado pelas análises do job. Os
+casos são contados uma única vez por todas as dimensões usadas nos
+gráficos; cada análise deriva seus números desse cubo, que é pequeno,
+em vez de disparar um groupBy próprio sobre os dados completos.
+
+Os casos são contados pelo nome bruto do bairro e os nomes são
+canonicalizados no cubo, que tem poucos nomes distintos; as células que
+passam a ter o mesmo bairro são somadas.
+"""
+
+import os
+import shutil
+from functools import reduce
+
+from pyspark import StorageLevel
+from pyspark.sql import functions as F
+
+from dependencies.bairros import corrigir_bairros
+from dependencies.esquemas import rotular_dimensoes
+
+# Diretório padrão do armazenamento de agregados
+CAMINHO_CUBO = 'data/agregados/cubo'
+
+# Dimensões usadas para particionar o cubo gravado
+PARTICOES_CUBO = ['virus', 'notificacao_ano']
+
+# Dimensões do cubo, na ordem do groupBy
+DIMENSOES_CUBO = [
+    'virus',
+    'notificacao_ano',
+    'notificacao_mes',
+    'notificacao_trimestre',
+    'notificacao_semana',
+    'tp_sexo',
+    'faixa_etaria',
+    'no_bairro_residencia',
+]
+
+
+def contar_casos(sdf):
+    """Conta os casos por todas as dimensões do cubo.
+
+    O agrupamento é feito sobre os códigos das dimensões codificadas;
+    os rótulos só são aplicados nas linhas do cubo.
+
+    :param sdf: DataFrame Spark no formato retornado por `transform_data`.
+    :return: DataFrame Spark com as dimensões rotuladas e `quantidade`.
+    """
+    return rotular_dimensoes(sdf
+                             .groupBy(*DIMENSOES_CUBO)
+                             .agg(F.count(F.lit(1)).alias('quantidade')))
+
+
+def consolidar_bairros(cubo):
+    """Canonicaliza os bairros de um cubo e soma as células que se juntam.
+
+    :param cubo: DataFrame Spark com o cubo contado pelo nome bruto do
+        bairro (pequeno ou persistido: os nomes distintos são coletados).
+    :return: DataFrame Spark com o cubo por bairro canônico.
+    """
+    return (corrigir_bairros(cubo, 'no_bairro_residencia')
+            .groupBy(*DIMENSOES_CUBO)
+            .agg(F.sum('quantidade').alias('quantidade')))
+
+
+def construir_cubo(sdf):
+    """Conta os casos por todas as dimensões do cubo em uma única passada.
+
+    A contagem pelo nome bruto do bairro é a única passada sobre os
+    dados; a canonicalização dos bairros lê essa contagem persistida. O
+    cubo final é persistido e materializado antes de a contagem bruta ser
+    liberada, para que a coleta e quaisquer usos posteriores não
+    recomputem a linhagem completa.
+
+    :param sdf: DataFrame Spark retornado por `transform_data`.
+    :return: DataFrame Spark persistido com as dimensões e `quantidade`.
+    """
+    brutos = contar_casos(sdf).persist(StorageLevel.MEMORY_AND_DISK)
+    cubo = consolidar_bairros(brutos).persist(StorageLevel.MEMORY_AND_DISK)
+    cubo.count()
+    brutos.unpersist()
+    return cubo
+
+
+def somar(cubo, dimensoes):
+    """Consolida o cubo (pandas) em um subconjunto das dimensões.
+
+    :param cubo: pandas DataFrame com o cubo coletado.
+    :param dimensoes: Lista de dimensões mantidas.
+    :return: pandas DataFrame com as dimensões e a coluna `quantidade`.
+    """
+    return (cubo
+            .groupby(dimensoes, dropna=False)['quantidade']
+            .sum()
+            .reset_index())
+
+
+def mesclar_cubos(cubo, delta):
+    """Soma um cubo de variações (positivas ou negativas) a um cubo.
+
+    Células que ficam zeradas são descartadas.
+
+    :param cubo: DataFrame Spark com o cubo atual (ou None).
+    :param delta: DataFrame Spark com as variações, no mesmo esquema.
+    :return: DataFrame Spark com o cubo atualizado.
+    """
+    if cubo is not None:
+        delta = cubo.unionByName(delta)
+    return (delta
+            .groupBy(*DIMENSOES_CUBO)
+            .agg(F.sum('quantidade').alias('quantidade'))
+            .filter(F.col('quantidade') != 0))
+
+
+def salvar_cubo(cubo, caminho):
+    """Grava o cubo no armazenamento de agregados, trocando a versão anterior.
+
+    O cubo é gravado em Parquet particionado por virus/notificacao_ano,
+    com um arquivo por partição, para que consultas filtradas (ver
+    `dependencies.consulta`) leiam só o necessário. A escrita vai para um
+    diretório temporário e só então substitui o diretório final, de modo
+    que o cubo pode ter sido derivado da versão que está sendo substituída.
+
+    :param cubo: DataFrame Spark com o cubo.
+    :param caminho: Diretório do cubo.
+    :return: None
+    """
+    temporario = caminho + '.tmp'
+    (cubo
+     .repartition(*PARTICOES_CUBO)
+     .write
+     .mode('overwrite')
+     .partitionBy(*PARTICOES_CUBO)
+     .parquet(temporario))
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+    os.rename(temporario, caminho)
+    return None
+
+
+def salvar_particoes_cubo(cubo, caminho, particoes):
+    """Regrava só algumas partições (virus/notificacao_ano) do cubo gravado.
+
+    As partições pedidas são gravadas em um diretório temporário e
+    trocadas uma a uma no cubo; as que não têm mais linhas são removidas
+    e as demais partições não são tocadas. A data de modificação do
+    diretório do cubo é atualizada, para que `dependencies.consulta` leia
+    de novo a lista de arquivos.
+
+    :param cubo: DataFrame Spark com as linhas das partições regravadas
+        (as de outras partições são ignoradas).
+    :param caminho: Diretório do cubo.
+    :param particoes: Lista de tuplas (virus, notificacao_ano).
+    :return: None
+    """
+    if not particoes:
+        return None
+    if not os.path.isdir(caminho):
+        salvar_cubo(cubo, caminho)
+        return None
+
+    temporario = caminho + '.tmp'
+    if os.path.isdir(temporario):
+        shutil.rmtree(temporario)
+    condicoes = [(F.col('virus') == virus) & (F.col('notificacao_ano') == ano) for virus, ano in particoes]
+    (cubo
+     .filter(reduce(lambda a, b: a | b, condicoes))
+     .repartition(*PARTICOES_CUBO)
+     .write
+     .mode('overwrite')
+     .partitionBy(*PARTICOES_CUBO)
+     .parquet(temporario))
+
+    for virus, ano in particoes:
+        relativo = os.path.join('virus=%s' % virus, 'notificacao_ano=%s' % ano)
+        atual = os.path.join(caminho, relativo)
+        if os.path.isdir(atual):
+            shutil.rmtree(atual)
+        if os.path.isdir(os.path.join(temporario, relativo)):
+            os.makedirs(os.path.dirname(atual), exist_ok=True)
+            os.rename(os.path.join(temporario, relativo), atual)
+        elif os.path.isdir(os.path.dirname(atual)) and not os.listdir(os.path.dirname(atual)):
+            os.rmdir(os.path.dirname(atual))
+    shutil.rmtree(temporario)
+    os.utime(caminho)
+    return None
+
+
+def carregar_cubo(spark, caminho):
+    """Lê o cubo gravado por `salvar_cubo`.
+
+    :param spark: SparkSession.
+    :param caminho: Diretório do cubo.
+    :return: DataFrame Spark com o cubo ou None se ainda não existir.
+    """
+    if not os.path.isdir(caminho):
+        return None
+    return spark.read.parquet(caminho)
@@ -0,0 +1,362 @@
+"""
+bairros.py
+~~~~~~~~~~
+
+Módulo com a canonicalização dos nomes dos bairros de residência. Cada
+nome bruto passa por reparo de codificação (textos UTF-8 lidos como
+CP850/Latin-1 e vice-versa), remoção de acentos e pontuação, consulta à
+tabela de apelidos e, se ainda não casar, busca aproximada no índice de
+bairros canônicos (trigramas + distância de edição).
+
+No Spark, a canonicalização é aplicada ao cubo de agregação, depois da
+contagem pelo nome bruto: só os nomes distintos do cubo são resolvidos
+(no driver, com cache por valor) e o mapeamento volta como um join de
+broadcast, de modo que o custo acompanha a cardinalidade e não o número
+de linhas, sem uma passada extra sobre os dados extraídos.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+from pyspark.sql import functions as F
+
+# Tabela de apelidos: grafias conhecidas (abreviações, erros de digitação e
+# de codificação) e o nome adotado: o bairro oficial correspondente, a
+# localidade (comunidades e bairros de municípios vizinhos, que não são
+# alvos da busca aproximada) ou `NAO IDENTIFICADO`
+CORRECAO_BAIRRO_RESIDENCIA = {
+    "SANTO AMARO": "SANTO AMARO",
+    "BOA VIAGEM": "BOA VIAGEM",
+    "IPSEP": "IPSEP",
+    "JORDAO": "JORDAO",
+    "IBURA": "IBURA",
+    "PINA": "PINA",
+    "CAMPO GRANDE": "CAMPO GRANDE",
+    "SAO JOSE": "SAO JOSE",
+    "CAMPINA DO BARRETO": "CAMPINA DO BARRETO",
+    "ARRUDA": "ARRUDA",
+    "BOMBA DO HEMETERIO": "BOMBA DO HEMETERIO",
+    "ALTO JOSE BONIFACIO": "ALTO JOSE BONIFACIO",
+    "VASCO DA GAMA": "VASCO DA GAMA",
+    "NOVA DESCOBERTA": "NOVA DESCOBERTA",
+    "PRADO": "PRADO",
+    "CORDEIRO": "CORDEIRO",
+    "IPUTINGA": "IPUTINGA",
+    "TORROES": "TORROES",
+    "VARZEA": "VARZEA",
+    "AFOGADOS": "AFOGADOS",
+    "BONGI": "BONGI",
+    "SAN MARTIN": "SAN MARTIN",
+    "JARDIM SAO PAULO": "JARDIM SAO PAULO",
+    "COHAB": "COHAB",
+    "COQUEIRAL": "COQUEIRAL",
+    "ESTRADA DOS REMEDIOS": "ESTRADA DOS REMEDIOS",
+    "JAQUEIRA": "JAQUEIRA",
+    "ROSARINHO": "ROSARINHO",
+    "IMBIRIBEIRA": "IMBIRIBEIRA",
+    "AGUA FRIA": "AGUA FRIA",
+    "FUNDAO": "FUNDAO",
+    "LINHA DO TIRO": "LINHA DO TIRO",
+    "GUABIRABA": "GUABIRABA",
+    "CASA AMARELA": "CASA AMARELA",
+    "ALTO DO MANDU": "ALTO DO MANDU",
+    "MACAXEIRA": "MACAXEIRA",
+    "ENGENHO DO MEIO": "ENGENHO DO MEIO",
+    "MANGUEIRA": "MANGUEIRA",
+    "AREIAS": "AREIAS",
+    "ALTO SANTA TEREZINHA": "ALTO SANTA TEREZINHA",
+    "DOIS UNIDOS": "DOIS UNIDOS",
+    "PASSARINHO": "PASSARINHO",
+    "ALTO JOSE DO PINHO": "ALTO JOSE DO PINHO",
+    "MADALENA": "MADALENA",
+    "TORRE": "TORRE",
+    "ILHA DO RETIRO": "ILHA DO RETIRO",
+    "BOA VISTA": "BOA VISTA",
+    "TORREAO": "TORREAO",
+    "CABANGA": "CABANGA",
+    "COELHOS": "COELHOS",
+    "TAMARINEIRA": "TAMARINEIRA",
+    "SITIO DOS PINTOS": "SITIO DOS PINTOS",
+    "ENCRUZILHADA": "ENCRUZILHADA",
+    "BRASILIA TEIMOSA": "BRASILIA TEIMOSA",
+    "CORREGO DO JENIPAPO": "CORREGO DO JENIPAPO",
+    "CURADO": "CURADO",
+    "GRACAS": "GRACAS",
+    "CAJUEIRO": "CAJUEIRO",
+    "PORTO DA MADEIRA": "PORTO DA MADEIRA",
+    "MORRO DA CONCEICAO": "MORRO DA CONCEICAO",
+    "DOIS IRMAOS": "DOIS IRMAOS",
+    "MUSTARDINHA": "MUSTARDINHA",
+    "ESTANCIA": "ESTANCIA",
+    "CACOTE": "CACOTE",
+    "BARRO": "BARRO",
+    "SANCHO": "SANCHO",
+    "BREJO DE BEBERIBE": "BREJO DE BEBERIBE",
+    "CAXANGA": "CAXANGA",
+    "ESPINHEIRO": "ESPINHEIRO",
+    "ILHA JOANA BEZERRA": "ILHA JOANA BEZERRA",
+    "MANGABEIRA": "MANGABEIRA",
+    "BREJO DA GUABIRABA": "BREJO DA GUABIRABA",
+    "TEJIPIO": "TEJIPIO",
+    "AFLITOS": "AFLITOS",
+    "CASA FORTE": "CASA FORTE",
+    "ZUMBI": "ZUMBI",
+    "BEBERIBE": "BEBERIBE",
+    "SANTA ROSA": "SANTA ROSA",
+    "SOLEDADE": "SOLEDADE",
+    "TOTO": "TOTO",
+    "HIPODROMO": "HIPODROMO",
+    "MONTEIRO": "MONTEIRO",
+    "PEIXINHOS": "PEIXINHOS",
+    "JIQUIA": "JIQUIA",
+    "PARNAMIRIM": "PARNAMIRIM",
+    "APIPUCOS": "APIPUCOS",
+    "PAISSANDU": "PAISSANDU",
+    "POCO": "POCO",
+    "CIDADE UNIVERSITARIA": "CIDADE UNIVERSITARIA",
+    "PONTO DE PARADA": "PONTO DE PARADA",
+    "RECIFE": "NAO IDENTIFICADO",
+    "DERBY": "DERBY",
+    "BREJO DE GUABIRABA": "BREJO DA GUABIRABA",
+    "ALTO SANTA ISABEL": "ALTO SANTA ISABEL",
+    "ALUIZIO PINTO": "ALUIZIO PINTO",
+    "BREJO": "BREJO",
+    "CENTRO": "NAO IDENTIFICADO",
+    "OURO PRETO": "OURO PRETO",
+    "RUA JERONIMO": "NAO IDENTIFICADO",
+    "SANTO ANTONIO": "SANTO ANTONIO",
+    "ILHA DO LEITE": "ILHA DO LEITE",
+    "SANTANA": "SANTANA",
+    "PACHECO": "PACHECO",
+    "GUARARAPES": "GUARARAPES",
+    "JD.JORDAO": "JORDAO",
+    "CHAO DE ESTRELAS": "CHAO DE ESTRELAS",
+    "ALTO DA BONDADE": "ALTO DA BONDADE",
+    "SITIO NOVO": "SITIO NOVO",
+    "CAMPO": "CAMPO GRANDE",
+    "BOA": "BOA VISTA",
+    "P": "PACHECO",
+    "JORDAO ALTO": "JORDAO",
+    "UR7 VARZEA": "VARZEA",
+    "RODA DE FOGO": "RODA DE FOGO",
+    "JARDIM S├O PAULO": "JARDIM SAO PAULO",
+    "ENG DO MEIO": "ENGENHO DO MEIO",
+    "CAMPINA": "CAMPINA DO BARRETO",
+    "ChÒo de Estrela": "CHAO DE ESTRELAS",
+    "CAÃOTE": "CACOTE",
+    "CAþOTE": "CACOTE",
+    "IPS": "IPSEP",
+    "BARROI": "BARRO",
+    "GRAþAS": "GRACAS",
+    "ENGE DO MEIO": "ENGENHO DO MEIO",
+    "Recife": "NAO IDENTIFICADO",
+    "IPUITINGA": "IPUTINGA",
+    "JIGUIA": "JIQUIA",
+    "PASSSARINHO": "PASSARINHO",
+    "NI": "SANTO ANTONIO",
+    "BAIRRO NOVO": "BAIRRO NOVO",
+    "JIQUI┴": "JIQUIA",
+    "ALTO DO PASCOAL": "ALTO DO PASCOAL",
+    "RECIFE ANTIGO": "BAIRRO DO RECIFE"
+}
+
+
+# Bairros canônicos: os 94 bairros oficiais do Recife, por RPA, alvos da
+# busca aproximada (o bairro "Recife" leva o nome usual, para que o nome
+# do município no campo de bairro não case com ele)
+BAIRROS_CANONICOS = sorted([
+    # RPA 1 - Centro
+    "BAIRRO DO RECIFE", "BOA VISTA", "CABANGA", "COELHOS", "ILHA DO LEITE", "ILHA JOANA BEZERRA",
+    "PAISSANDU", "SANTO AMARO", "SANTO ANTONIO", "SAO JOSE", "SOLEDADE",
+    # RPA 2 - Norte
+    "AGUA FRIA", "ALTO SANTA TEREZINHA", "ARRUDA", "BEBERIBE", "BOMBA DO HEMETERIO", "CAJUEIRO",
+    "CAMPINA DO BARRETO", "CAMPO GRANDE", "DOIS UNIDOS", "ENCRUZILHADA", "FUNDAO", "HIPODROMO",
+    "LINHA DO TIRO", "PEIXINHOS", "PONTO DE PARADA", "PORTO DA MADEIRA", "ROSARINHO", "TORREAO",
+    # RPA 3 - Noroeste
+    "AFLITOS", "ALTO DO MANDU", "ALTO JOSE BONIFACIO", "ALTO JOSE DO PINHO", "APIPUCOS",
+    "BREJO DA GUABIRABA", "BREJO DE BEBERIBE", "CASA AMARELA", "CASA FORTE", "CORREGO DO JENIPAPO",
+    "DERBY", "DOIS IRMAOS", "ESPINHEIRO", "GRACAS", "GUABIRABA", "JAQUEIRA", "MACAXEIRA",
+    "MANGABEIRA", "MONTEIRO", "MORRO DA CONCEICAO", "NOVA DESCOBERTA", "PARNAMIRIM", "PASSARINHO",
+    "PAU FERRO", "POCO", "SANTANA", "SITIO DOS PINTOS", "TAMARINEIRA", "VASCO DA GAMA",
+    # RPA 4 - Oeste
+    "CAXANGA", "CIDADE UNIVERSITARIA", "CORDEIRO", "ENGENHO DO MEIO", "ILHA DO RETIRO", "IPUTINGA",
+    "MADALENA", "PRADO", "TORRE", "TORROES", "VARZEA", "ZUMBI",
+    # RPA 5 - Sudoeste
+    "AFOGADOS", "AREIAS", "BARRO", "BONGI", "CACOTE", "COQUEIRAL", "CURADO", "ESTANCIA",
+    "JARDIM SAO PAULO", "JIQUIA", "MANGUEIRA", "MUSTARDINHA", "SAN MARTIN", "SANCHO", "TEJIPIO", "TOTO",
+    # RPA 6 - Sul
+    "BOA VIAGEM", "BRASILIA TEIMOSA", "COHAB", "IBURA", "IMBIRIBEIRA", "IPSEP", "JORDAO", "PINA",
+])
+
+# Valor usado para nomes que não são bairros (códigos, siglas soltas, o
+# nome do município)
+BAIRRO_NAO_IDENTIFICADO = 'NAO IDENTIFICADO'
+
+# Letras esperadas em nomes em português; o resto indica texto mal decodificado
+LETRAS_PORTUGUES = set('ÁÂÃÀÇÉÊÍÓÔÕÚÜáâãàçéêíóôõúü')
+
+# Combinações de codificação testadas no reparo: (codificar com, decodificar com)
+REPAROS_CODIFICACAO = [
+    ('cp850', 'latin-1'),
+    ('cp850', 'cp1252'),
+    ('latin-1', 'utf-8'),
+    ('cp1252', 'utf-8'),
+    ('cp850', 'utf-8'),
+]
+
+
+def pontuar_texto(texto):
+    """Quantidade de caracteres suspeitos (nem ASCII nem letras do português)."""
+    return sum(1 for caractere in texto if ord(caractere) > 127 and caractere not in LETRAS_PORTUGUES)
+
+
+def reparar_codificacao(texto):
+    """Desfaz erros de codificação comuns nos extratos.
+
+    Ex.: 'JARDIM S├O PAULO' (UTF-8 -> Latin-1 -> CP850) vira
+    'JARDIM SÃO PAULO' e 'SÃ£O' (UTF-8 lido como Latin-1) vira 'SãO'.
+
+    :param texto: Texto possivelmente mal decodificado.
+    :return: Texto com menos caracteres suspeitos (ou o original).
+    """
+    melhor, pontos = texto, pontuar_texto(texto)
+    if pontos == 0 and texto.isascii():
+        return texto
+
+    for codificar, decodificar in REPAROS_CODIFICACAO:
+        try:
+            candidato = texto.encode(codificar).decode(decodificar)
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            continue
+        pontos_candidato = pontuar_texto(candidato)
+        if pontos_candidato < pontos:
+            melhor, pontos = candidato, pontos_candidato
+    return melhor
+
+
+def normalizar_texto(texto):
+    """Chave de comparação: sem acentos, maiúscula, só letras, dígitos e espaços."""
+    sem_acentos = ''.join(caractere for caractere in unicodedata.normalize('NFKD', texto)
+                          if not unicodedata.combining(caractere))
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', sem_acentos.upper()).split())
+
+
+def trigramas(texto):
+    """Conjunto de trigramas de um texto (com bordas)."""
+    texto = '  ' + texto + ' '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def distancia_edicao(a, b, limite):
+    """Distância de Levenshtein entre dois textos, interrompida acima de `limite`.
+
+    :return: A distância ou `limite + 1` se ela passar do limite.
+    """
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior = list(range(len(b) + 1))
+    for i, caractere_a in enumerate(a, 1):
+        atual = [i]
+        for j, caractere_b in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1,
+                             anterior[j - 1] + (caractere_a != caractere_b)))
+        if min(atual) > limite:
+            return limite + 1
+        anterior = atual
+    return anterior[-1]
+
+
+def construir_indice():
+    """Monta o índice de busca: apelidos normalizados e trigramas dos canônicos.
+
+    :return: Tupla (apelidos, índice trigrama -> canônicos).
+    """
+    apelidos = {normalizar_texto(nome): nome for nome in BAIRROS_CANONICOS}
+    for bruto, canonico in CORRECAO_BAIRRO_RESIDENCIA.items():
+        apelidos[normalizar_texto(reparar_codificacao(bruto))] = canonico
+
+    indice = {}
+    for nome in BAIRROS_CANONICOS:
+        for trigrama in trigramas(normalizar_texto(nome)):
+            indice.setdefault(trigrama, set()).add(nome)
+    return apelidos, indice
+
+
+APELIDOS, INDICE_TRIGRAMAS = construir_indice()
+
+
+def buscar_aproximado(chave, candidatos=10):
+    """Procura o bairro canônico mais próximo de uma chave normalizada.
+
+    Os candidatos são os canônicos que mais compartilham trigramas com a
+    chave; vence o de menor distância de edição, aceita até 20% do
+    tamanho da chave (nomes com menos de 4 caracteres não são aproximados).
+
+    :param chave: Nome normalizado.
+    :param candidatos: Quantos canônicos avaliar pela distância de edição.
+    :return: Bairro canônico ou None.
+    """
+    if len(chave) < 4:
+        return None
+    limite = max(1, len(chave) // 5)
+
+    contagem = {}
+    for trigrama in trigramas(chave):
+        for nome in INDICE_TRIGRAMAS.get(trigrama, ()):
+            contagem[nome] = contagem.get(nome, 0) + 1
+    melhores = sorted(contagem, key=lambda nome: (-contagem[nome], nome))[:candidatos]
+
+    escolhido, menor = None, limite + 1
+    for nome in melhores:
+        distancia = distancia_edicao(chave, normalizar_texto(nome), limite)
+        if distancia < menor:
+            escolhido, menor = nome, distancia
+    return escolhido
+
+
+@lru_cache(maxsize=None)
+def canonicalizar(bruto):
+    """Resolve um nome bruto de bairro para o nome canônico.
+
+    Nomes sem letras suficientes (ex.: '462') viram `BAIRRO_NAO_IDENTIFICADO`;
+    nomes plausíveis que não casam com nenhum canônico são mantidos,
+    normalizados, em vez de interromper o job.
+
+    :param bruto: Nome como veio no extrato.
+    :return: Nome canônico (ou None para valores nulos).
+    """
+    if bruto is None:
+        return None
+
+    chave = normalizar_texto(reparar_codificacao(bruto))
+    if chave in APELIDOS:
+        return APELIDOS[chave]
+    if sum(caractere.isalpha() for caractere in chave) < 2:
+        return BAIRRO_NAO_IDENTIFICADO
+
+    return buscar_aproximado(chave) or chave
+
+
+def corrigir_bairros(sdf, coluna='no_bairro_residencia'):
+    """Canonicaliza a coluna de bairros de um DataFrame Spark.
+
+    Coleta apenas os valores distintos da coluna, resolve cada um com
+    `canonicalizar` e aplica o mapeamento com um join de broadcast. A
+    coleta é uma ação: `sdf` deve ser pequeno ou persistido (em geral, o
+    cubo contado pelo nome bruto).
+
+    :param sdf: DataFrame Spark.
+    :param coluna: Nome da coluna com os bairros.
+    :return: DataFrame Spark com a coluna canonicalizada.
+    """
+    brutos = [linha[coluna] for linha in sdf.select(coluna).distinct().collect()]
+    mapeamento = [(bruto, canonicalizar(bruto)) for bruto in brutos if bruto is not None]
+    if not mapeamento:
+        return sdf
+
+    tabela = sdf.sparkSession.createDataFrame(mapeamento, '_bairro_bruto string, _bairro_canonico string')
+    return (sdf
+            .join(F.broadcast(tabela), sdf[coluna] == tabela['_bairro_bruto'], 'left')
+            .withColumn(coluna, F.coalesce(F.col('_bairro_canonico'), F.col(coluna)))
+            .drop('_bairro_bruto', '_bairro_canonico'))
@@ -0,0 +1,253 @@
+"""
+cache.py
+~~~~~~~~
+
+Cache de resultados da execução, endereçado por conteúdo. A chave de
+uma entrada é o hash de tudo o que determina o resultado: o conteúdo
+dos CSVs brutos, as tabelas de correção e mapeamento (bairros, rótulos,
+fontes e faixas etárias) e a versão do código (o fonte dos módulos do
+job). Se nada disso mudou, o cubo de agregação e os gráficos de cada
+análise são lidos do cache em vez de recalculados.
+
+As entradas ficam em `data/cache`, uma por arquivo, com um índice JSON
+que guarda o tamanho e o último acesso de cada uma; ao passar do limite
+de tamanho ou de entradas, as menos usadas recentemente são removidas.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import time
+
+from dependencies.bairros import CORRECAO_BAIRRO_RESIDENCIA
+from dependencies.esquemas import DIMENSOES_CODIFICADAS
+from dependencies.fontes import FONTES, descobrir_fontes
+from dependencies.idades import FAIXAS_ETARIAS
+from dependencies.rotulos import SEXOS
+from dependencies.staging import hash_arquivo
+
+# Diretório padrão do cache
+CAMINHO_CACHE = 'data/cache'
+
+# Índice com as entradas e as impressões digitais dos arquivos brutos
+ARQUIVO_INDICE = '_indice.json'
+
+# Arquivo, no diretório do cubo, com a chave do cache que gerou o cubo gravado
+ARQUIVO_CHAVE_CUBO = '_chave_cache'
+
+# Limites do cache; acima deles as entradas menos usadas são removidas
+LIMITE_BYTES_CACHE = 256 * 1024 ** 2
+ENTRADAS_MAXIMAS = 64
+
+
+def impressao(*partes):
+    """Hash SHA-256 de valores serializáveis em JSON.
+
+    :param partes: Valores combinados na impressão (dicionários, listas,
+        textos, números).
+    :return: Hash hexadecimal.
+    """
+    texto = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def tabelas_correcao():
+    """Tabelas de correção e mapeamento que determinam o cubo.
+
+    :return: Dicionário nome -> tabela.
+    """
+    return {
+        'bairros': CORRECAO_BAIRRO_RESIDENCIA,
+        'codigos': DIMENSOES_CODIFICADAS,
+        'faixas_etarias': FAIXAS_ETARIAS,
+        'fontes': FONTES,
+        'sexos': SEXOS,
+    }
+
+
+def versao_codigo(modulo):
+    """Impressão do código do job: o fonte do módulo e de `dependencies`.
+
+    :param modulo: Módulo do job (ex.: `sys.modules[__name__]`).
+    :return: Hash hexadecimal, ou None se algum fonte não puder ser lido
+        (nesse caso o cache não deve ser usado).
+    """
+    modulos = [modulo] + [sys.modules[nome] for nome in sorted(sys.modules)
+                          if nome.startswith('dependencies.')]
+    try:
+        return impressao(*[(m.__name__, inspect.getsource(m)) for m in modulos])
+    except (OSError, TypeError):
+        return None
+
+
+def ler_chave_cubo(caminho_cubo):
+    """Chave do cache que gerou o cubo gravado no armazenamento de agregados.
+
+    :param caminho_cubo: Diretório do cubo.
+    :return: Chave ou None (cubo ausente ou gravado sem o cache, como no
+        modo incremental).
+    """
+    caminho = os.path.join(caminho_cubo, ARQUIVO_CHAVE_CUBO)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r') as arquivo:
+        return arquivo.read().strip()
+
+
+def gravar_chave_cubo(caminho_cubo, chave):
+    """Grava ao lado do cubo a chave do cache que o gerou, de forma atômica.
+
+    O arquivo começa com '_', então é ignorado pelas leituras do Parquet
+    (Spark e pyarrow); cada gravação do cubo troca o diretório e o descarta.
+
+    :param caminho_cubo: Diretório do cubo.
+    :param chave: Chave da entrada do cache com o cubo.
+    :return: None
+    """
+    caminho = os.path.join(caminho_cubo, ARQUIVO_CHAVE_CUBO)
+    with open(caminho + '.tmp', 'w') as arquivo:
+        arquivo.write(chave)
+    os.replace(caminho + '.tmp', caminho)
+    return None
+
+
+class Cache(object):
+    """Cache de resultados com remoção por uso menos recente e limite de tamanho.
+
+    :param caminho: Diretório do cache.
+    :param limite_bytes: Tamanho máximo somado das entradas.
+    :param entradas_maximas: Número máximo de entradas.
+    :param ativo: Se False, nenhuma entrada é lida ou gravada.
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE, limite_bytes=LIMITE_BYTES_CACHE,
+                 entradas_maximas=ENTRADAS_MAXIMAS, ativo=True):
+        self.caminho = caminho
+        self.limite_bytes = limite_bytes
+        self.entradas_maximas = entradas_maximas
+        self.ativo = ativo
+        self.indice = self._carregar_indice() if ativo else {'entradas': {}, 'arquivos': {}}
+
+    def _carregar_indice(self):
+        """Lê o índice do cache (vazio se não existir)."""
+        caminho = os.path.join(self.caminho, ARQUIVO_INDICE)
+        if not os.path.exists(caminho):
+            return {'entradas': {}, 'arquivos': {}}
+        with open(caminho, 'r') as arquivo:
+            return json.load(arquivo)
+
+    def _salvar_indice(self):
+        """Grava o índice do cache de forma atômica."""
+        os.makedirs(self.caminho, exist_ok=True)
+        caminho = os.path.join(self.caminho, ARQUIVO_INDICE)
+        with open(caminho + '.tmp', 'w') as arquivo:
+            json.dump(self.indice, arquivo, indent=2, sort_keys=True)
+        os.replace(caminho + '.tmp', caminho)
+
+    def _arquivo(self, chave):
+        """Caminho do arquivo de uma entrada."""
+        return os.path.join(self.caminho, chave + '.pkl')
+
+    def impressao_entradas(self, dir_raw='data/raw', fontes=None):
+        """Impressão do conteúdo dos CSVs brutos do manifesto.
+
+        O SHA-256 de cada arquivo só é recalculado quando o tamanho ou a
+        data de modificação mudam desde a última execução.
+
+        :param dir_raw: Diretório dos CSVs brutos.
+        :param fontes: Fontes consideradas (padrão: `descobrir_fontes(dir_raw)`).
+        :return: Lista de (nome, vírus, ano, apelidos, sha256) das fontes.
+        """
+        if fontes is None:
+            fontes = descobrir_fontes(dir_raw)
+        arquivos = {}
+        impressoes = []
+        for fonte in fontes:
+            stat = os.stat(fonte['caminho'])
+            registro = self.indice['arquivos'].get(fonte['caminho'], {})
+            if registro.get('tamanho') != stat.st_size or registro.get('mtime') != stat.st_mtime:
+                registro = {'tamanho': stat.st_size, 'mtime': stat.st_mtime,
+                            'sha256': hash_arquivo(fonte['caminho'])}
+            arquivos[fonte['caminho']] = registro
+            impressoes.append((fonte['nome'], fonte['virus'], fonte['ano'], fonte['apelidos'], registro['sha256']))
+        self.indice['arquivos'] = arquivos
+        return impressoes
+
+    def obter(self, chave):
+        """Lê uma entrada do cache.
+
+        :param chave: Chave da entrada (ou None).
+        :return: Objeto guardado, ou None se ausente.
+        """
+        if not self.ativo or chave not in self.indice['entradas']:
+            return None
+        try:
+            with open(self._arquivo(chave), 'rb') as arquivo:
+                objeto = pickle.load(arquivo)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self._remover(chave)
+            self._salvar_indice()
+            return None
+        self.indice['entradas'][chave]['acesso'] = time.time()
+        self._salvar_indice()
+        return objeto
+
+    def guardar(self, chave, etapa, objeto):
+        """Grava uma entrada e remove as menos usadas além dos limites.
+
+        :param chave: Chave da entrada (ou None, que não grava nada).
+        :param etapa: Nome da etapa que produziu o objeto.
+        :param objeto: Objeto serializável com pickle.
+        :return: None
+        """
+        if not self.ativo or chave is None:
+            return None
+        os.makedirs(self.caminho, exist_ok=True)
+        caminho = self._arquivo(chave)
+        with open(caminho + '.tmp', 'wb') as arquivo:
+            pickle.dump(objeto, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(caminho + '.tmp', caminho)
+
+        self.indice['entradas'][chave] = {'etapa': etapa, 'tamanho': os.path.getsize(caminho),
+                                          'acesso': time.time()}
+        self._remover_excedentes()
+        self._salvar_indice()
+        return None
+
+    def memorizar(self, chave, funcao, *args):
+        """Lê o resultado de `funcao(*args)` do cache ou o calcula e guarda.
+
+        A entrada é identificada pela chave dos dados combinada com o nome
+        da função, de modo que cada análise sobre o mesmo cubo tem a sua.
+
+        :param chave: Chave dos dados de entrada da função (ou None, que só
+            calcula).
+        :param funcao: Função calculada na falta da entrada.
+        :param args: Argumentos da função.
+        :return: Resultado da função.
+        """
+        chave = impressao(chave, funcao.__name__) if chave is not None else None
+        resultado = self.obter(chave)
+        if resultado is None:
+            resultado = funcao(*args)
+            self.guardar(chave, funcao.__name__, resultado)
+        return resultado
+
+    def _remover(self, chave):
+        """Remove uma entrada do índice e do disco."""
+        self.indice['entradas'].pop(chave, None)
+        if os.path.exists(self._arquivo(chave)):
+            os.remove(self._arquivo(chave))
+
+    def _remover_excedentes(self):
+        """Remove as entradas menos usadas até respeitar os limites."""
+        entradas = self.indice['entradas']
+        por_acesso = sorted(entradas, key=lambda chave: entradas[chave]['acesso'])
+        total = sum(entrada['tamanho'] for entrada in entradas.values())
+        while por_acesso and (total > self.limite_bytes or len(entradas) > self.entradas_maximas):
+            chave = por_acesso.pop(0)
+            total -= entradas[chave]['tamanho']
+            self._remover(chave)
@@ -0,0 +1,105 @@
+"""
+consulta.py
+~~~~~~~~~~~
+
+Módulo de consulta ao armazenamento de agregados gravado pelo job
+(`data/agregados/cubo`). Responde consolidações filtradas do cubo, como
+"casos por bairro de dengue no Q1 de 2020", direto dos arquivos Parquet
+com pyarrow, sem iniciar um SparkContext. Os filtros por vírus e ano
+usam as partições do cubo e só leem os arquivos necessários.
+
+Uso:
+    python -m dependencies.consulta --por no_bairro_residencia \\
+        --filtro virus=DENGUE --filtro notificacao_ano=2020 \\
+        --filtro notificacao_trimestre=Q1
+"""
+
+import argparse
+import os
+from functools import lru_cache, reduce
+
+import pyarrow.dataset as ds
+
+# Diretório padrão do armazenamento de agregados (o mesmo de
+# `dependencies.agregacao.CAMINHO_CUBO`, repetido para não importar o Spark)
+CAMINHO_CUBO = 'data/agregados/cubo'
+
+
+@lru_cache(maxsize=8)
+def abrir_versao_cubo(caminho, inode, modificacao):
+    """Abre uma versão do dataset Parquet do cubo.
+
+    :param caminho: Diretório do cubo.
+    :param inode: Inode do diretório (parte da chave do cache).
+    :param modificacao: Data de modificação do diretório, em ns (parte da
+        chave do cache).
+    :return: pyarrow.dataset.Dataset.
+    """
+    return ds.dataset(caminho, format='parquet', partitioning='hive')
+
+
+def abrir_cubo(caminho=CAMINHO_CUBO):
+    """Abre o dataset Parquet do cubo (reaproveitado entre consultas).
+
+    `salvar_cubo` troca o diretório inteiro a cada gravação e
+    `salvar_particoes_cubo` atualiza a data de modificação dele, então o
+    dataset aberto é reaproveitado só enquanto o diretório for o mesmo
+    (mesmo inode e data de modificação); depois de uma gravação, a lista
+    de arquivos é lida de novo.
+
+    :param caminho: Diretório do cubo.
+    :return: pyarrow.dataset.Dataset.
+    """
+    estado = os.stat(caminho)
+    return abrir_versao_cubo(caminho, estado.st_ino, estado.st_mtime_ns)
+
+
+def consultar(dimensoes, filtros=None, caminho=CAMINHO_CUBO):
+    """Soma os casos do cubo agrupados por algumas dimensões.
+
+    :param dimensoes: Lista de dimensões do resultado (pode ser vazia
+        para o total).
+    :param filtros: Dicionário dimensão -> valor ou lista de valores.
+    :param caminho: Diretório do cubo.
+    :return: pandas DataFrame com as dimensões e `quantidade`, ordenado
+        da maior para a menor quantidade.
+    """
+    dataset = abrir_cubo(caminho)
+
+    condicoes = []
+    for dimensao, valor in (filtros or {}).items():
+        if isinstance(valor, (list, tuple, set)):
+            condicoes.append(ds.field(dimensao).isin(list(valor)))
+        else:
+            condicoes.append(ds.field(dimensao) == valor)
+    filtro = reduce(lambda a, b: a & b, condicoes) if condicoes else None
+
+    tabela = dataset.to_table(columns=list(dimensoes) + ['quantidade'], filter=filtro)
+    resultado = (tabela
+                 .group_by(list(dimensoes))
+                 .aggregate([('quantidade', 'sum')])
+                 .to_pandas()
+                 .rename(columns={'quantidade_sum': 'quantidade'}))
+
+    return (resultado[list(dimensoes) + ['quantidade']]
+            .sort_values(by=['quantidade'], ascending=False)
+            .reset_index(drop=True))
+
+
+def interpretar_filtro(texto):
+    """Converte 'dimensao=valor[,valor...]' no par (dimensão, valor)."""
+    dimensao, _, valores = texto.partition('=')
+    valores = [int(valor) if valor.lstrip('-').isdigit() else valor for valor in valores.split(',')]
+    return dimensao, valores if len(valores) > 1 else valores[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Consulta o armazenamento de agregados do job.')
+    parser.add_argument('--por', nargs='*', default=[], help='dimensões do resultado')
+    parser.add_argument('--filtro', action='append', default=[], help='dimensao=valor[,valor...]')
+    parser.add_argument('--caminho', default=CAMINHO_CUBO)
+    parser.add_argument('--limite', type=int, default=None, help='número máximo de linhas exibidas')
+    args = parser.parse_args()
+
+    resultado = consultar(args.por, dict(map(interpretar_filtro, args.filtro)), args.caminho)
+    print(resultado.head(args.limite).to_string(index=False) if args.limite else resultado.to_string(index=False))
@@ -0,0 +1,80 @@
+"""
+destinos.py
+~~~~~~~~~~~
+
+Módulo com os destinos de execução do job. Um destino é um município,
+opcionalmente restrito a alguns anos e vírus, com seus próprios
+diretórios de staging, estado incremental, agregados, gráficos, cache e
+qualidade, de modo que execuções de destinos diferentes não sobrescrevem
+umas às outras. O destino padrão (Recife, todos os anos e vírus) usa o
+layout original em `data/`.
+"""
+
+import os
+
+# Município padrão do job
+CIDADE_PADRAO = 'recife'
+
+# Diretório base das saídas dos destinos do orquestrador
+DIR_CIDADES = 'data/cidades'
+
+
+def destino(cidade=CIDADE_PADRAO, anos=None, virus=None):
+    """Monta um destino de execução.
+
+    :param cidade: Sufixo de cidade dos arquivos brutos.
+    :param anos: Anos processados (None para todos).
+    :param virus: Vírus processados, como em `FONTES` (None para todos).
+    :return: Dicionário com cidade, anos e virus.
+    """
+    return {
+        'cidade': cidade,
+        'anos': sorted(int(ano) for ano in anos) if anos else None,
+        'virus': sorted(nome.upper() for nome in virus) if virus else None,
+    }
+
+
+def nome_destino(alvo):
+    """Nome do destino usado no diretório de saída e no pool do Spark.
+
+    :param alvo: Destino montado por `destino`.
+    :return: Texto como 'recife', 'olinda_2020-2021' ou 'olinda_dengue'.
+    """
+    partes = [alvo['cidade']]
+    if alvo['anos']:
+        partes.append('-'.join(str(ano) for ano in alvo['anos']))
+    if alvo['virus']:
+        partes.append('-'.join(nome.lower() for nome in alvo['virus']))
+    return '_'.join(partes)
+
+
+def caminhos(base='data', dir_raw='data/raw'):
+    """Diretórios de entrada e saída de uma execução.
+
+    :param base: Diretório base das saídas (`data` no layout original).
+    :param dir_raw: Diretório dos CSVs brutos, compartilhado pelos destinos.
+    :return: Dicionário com raw, staging, estado, cubo, semanas, alertas,
+        plots, cache e qualidade.
+    """
+    return {
+        'raw': dir_raw,
+        'staging': os.path.join(base, 'staging'),
+        'estado': os.path.join(base, 'estado'),
+        'cubo': os.path.join(base, 'agregados', 'cubo'),
+        'semanas': os.path.join(base, 'agregados', 'semanas'),
+        'alertas': os.path.join(base, 'agregados', 'alertas'),
+        'plots': os.path.join(base, 'plots'),
+        'cache': os.path.join(base, 'cache'),
+        'qualidade': os.path.join(base, 'qualidade'),
+    }
+
+
+def caminhos_destino(alvo, dir_cidades=DIR_CIDADES, dir_raw='data/raw'):
+    """Diretórios de um destino do orquestrador, em `dir_cidades/<nome>`.
+
+    :param alvo: Destino montado por `destino`.
+    :param dir_cidades: Diretório base das saídas dos destinos.
+    :param dir_raw: Diretório dos CSVs brutos.
+    :return: Dicionário no formato de `caminhos`.
+    """
+    return caminhos(os.path.join(dir_cidades, nome_destino(alvo)), dir_raw)
@@ -0,0 +1,116 @@
+"""
+esquemas.py
+~~~~~~~~~~~
+
+Registro de esquemas das fontes do SINAN. Declara as colunas que o job
+usa e o tipo de cada uma no staging; os CSVs são lidos com um esquema
+explícito (sem inferência) montado a partir do cabeçalho do arquivo, e
+só as colunas registradas são convertidas e gravadas.
+
+As dimensões de baixa cardinalidade (vírus, sexo, mês e trimestre)
+trafegam como códigos inteiros pequenos na transformação e na
+agregação; os rótulos são aplicados só no cubo, que é pequeno.
+"""
+
+from pyspark.sql import functions as F
+from pyspark.sql.types import (DateType, IntegerType, LongType, StringType, StructField,
+                               StructType)
+
+from dependencies.fontes import FONTES
+from dependencies.rotulos import MESES, TRIMESTRES, codificar, inverter, rotular
+
+# Colunas lidas dos extratos e seu tipo no staging; as demais são descartadas
+COLUNAS_STAGING = [
+    StructField('nu_notificacao', LongType()),
+    StructField('dt_notificacao', DateType()),
+    StructField('ds_semana_notificacao', IntegerType()),
+    StructField('notificacao_ano', IntegerType()),
+    StructField('dt_nascimento', StringType()),
+    StructField('nu_idade', IntegerType()),
+    StructField('tp_sexo', StringType()),
+    StructField('no_bairro_residencia', StringType()),
+]
+
+# Esquema do dataset de staging, com as colunas de partição
+ESQUEMA_STAGING = StructType(COLUNAS_STAGING + [
+    StructField('virus', StringType()),
+    StructField('ano', IntegerType()),
+])
+
+# Códigos dos vírus declarados no manifesto de fontes
+CODIGOS_VIRUS = {codigo: virus for codigo, virus in
+                 enumerate(sorted(fonte['virus'] for fonte in FONTES.values()), start=1)}
+
+# Códigos de sexo do SINAN; valores desconhecidos viram 'I' (não informado)
+CODIGOS_SEXO = {1: 'F', 2: 'I', 3: 'M'}
+
+# Dimensões codificadas na transformação e rotuladas no cubo
+DIMENSOES_CODIFICADAS = {
+    'virus': CODIGOS_VIRUS,
+    'tp_sexo': CODIGOS_SEXO,
+    'notificacao_mes': MESES,
+    'notificacao_trimestre': TRIMESTRES,
+}
+
+
+def ler_cabecalho(caminho):
+    """Lê os nomes das colunas da primeira linha de um CSV do SINAN.
+
+    :param caminho: Caminho do CSV.
+    :return: Lista com os nomes das colunas.
+    """
+    # O arquivo é lido em blocos: bytes fora de UTF-8 nas linhas seguintes não podem interromper a leitura
+    with open(caminho, 'r', encoding='utf-8', errors='replace') as arquivo:
+        return arquivo.readline().strip().split(';')
+
+
+def esquema_csv(cabecalho):
+    """Esquema explícito de leitura de um CSV, na ordem do cabeçalho.
+
+    Todas as colunas são lidas como texto e convertidas depois por
+    `projetar`, com a semântica do `cast` do Spark; a leitura não dispara
+    nenhuma passada de inferência.
+
+    :param cabecalho: Lista com os nomes das colunas do arquivo.
+    :return: StructType.
+    """
+    return StructType([StructField(coluna, StringType()) for coluna in cabecalho])
+
+
+def projetar(sdf, apelidos):
+    """Reduz um DataFrame lido de um CSV às colunas registradas, já tipadas.
+
+    Colunas registradas ausentes no arquivo entram como nulas.
+
+    :param sdf: DataFrame Spark lido com `esquema_csv`.
+    :param apelidos: Apelidos de colunas da fonte (nome no arquivo -> nome no job).
+    :return: DataFrame Spark com as colunas de `COLUNAS_STAGING`.
+    """
+    nomes = {apelidos.get(coluna, coluna): coluna for coluna in sdf.columns}
+    return sdf.select(*[(F.col(nomes[campo.name]) if campo.name in nomes else F.lit(None))
+                        .cast(campo.dataType).alias(campo.name)
+                        for campo in COLUNAS_STAGING])
+
+
+def codificar_dimensoes(sdf):
+    """Troca os rótulos de vírus e sexo pelos códigos do registro.
+
+    :param sdf: DataFrame Spark com `virus` e `tp_sexo` como texto.
+    :return: DataFrame Spark com as duas colunas como `tinyint`.
+    """
+    sexo_nao_informado = F.lit(inverter(CODIGOS_SEXO)['I'])
+    return (sdf
+            .withColumn('virus', codificar(CODIGOS_VIRUS, 'virus').cast('tinyint'))
+            .withColumn('tp_sexo', F.coalesce(codificar(CODIGOS_SEXO, 'tp_sexo'), sexo_nao_informado).cast('tinyint')))
+
+
+def rotular_dimensoes(sdf):
+    """Troca os códigos das dimensões codificadas pelos rótulos.
+
+    :param sdf: DataFrame Spark (em geral, o cubo) com as dimensões codificadas.
+    :return: DataFrame Spark com as dimensões como texto.
+    """
+    for coluna, mapa in DIMENSOES_CODIFICADAS.items():
+        if coluna in sdf.columns:
+            sdf = sdf.withColumn(coluna, rotular(mapa, coluna))
+    return sdf
@@ -0,0 +1,90 @@
+"""
+fontes.py
+~~~~~~~~~
+
+Manifesto declarativo das fontes de dados brutas do SINAN. Cada doença
+declara o prefixo dos seus arquivos, o valor da coluna `virus` e o mapa
+de apelidos de colunas que corrige as divergências de esquema entre os
+extratos. Os arquivos são descobertos no diretório bruto, de modo que
+incluir um ano ou uma doença não exige alterar o job.
+"""
+
+import glob
+import os
+import re
+
+# Doenças conhecidas: prefixo do arquivo -> metadados da fonte
+FONTES = {
+    'dengue': {
+        'virus': 'DENGUE',
+        'apelidos': {},
+    },
+    'chikungunya': {
+        'virus': 'CHIKUNGUNYA',
+        'apelidos': {},
+    },
+    'zika': {
+        'virus': 'ZIKA',
+        'apelidos': {'ano_notificacao': 'notificacao_ano'},
+    },
+}
+
+# Padrão de nome dos arquivos brutos: <doenca>_<ano>_<cidade>.csv
+PADRAO_ARQUIVO = re.compile(
+    r'^(?P<doenca>[a-z]+)_(?P<ano>\d{4})_(?P<cidade>[a-z_]+)\.csv$')
+
+
+def descobrir_fontes(dir_raw='data/raw', cidade='recife', anos=None, virus=None):
+    """Lista os arquivos brutos presentes que pertencem ao manifesto.
+
+    Arquivos de doenças não declaradas em `FONTES` ou de outras cidades
+    são ignorados; fontes ausentes simplesmente não aparecem na lista.
+
+    :param dir_raw: Diretório dos CSVs brutos.
+    :param cidade: Sufixo de cidade dos arquivos.
+    :param anos: Anos mantidos (None para todos).
+    :param virus: Vírus mantidos, como em `FONTES` (None para todos).
+    :return: Lista de dicionários com nome, caminho, doenca, virus, ano e
+        apelidos de cada fonte, ordenada por nome.
+    """
+    fontes = []
+    padrao = os.path.join(dir_raw, '*_' + cidade + '.csv')
+
+    for caminho in sorted(glob.glob(padrao)):
+        nome = os.path.basename(caminho)
+        casamento = PADRAO_ARQUIVO.match(nome)
+        if casamento is None or casamento.group('cidade') != cidade:
+            continue
+
+        doenca = casamento.group('doenca')
+        if doenca not in FONTES:
+            continue
+
+        ano = int(casamento.group('ano'))
+        if (anos is not None and ano not in anos) or (virus is not None and FONTES[doenca]['virus'] not in virus):
+            continue
+
+        fontes.append({
+            'nome': nome,
+            'caminho': caminho,
+            'doenca': doenca,
+            'virus': FONTES[doenca]['virus'],
+            'ano': ano,
+            'apelidos': dict(FONTES[doenca]['apelidos']),
+        })
+
+    return fontes
+
+
+def descobrir_cidades(dir_raw='data/raw'):
+    """Lista as cidades com ao menos um arquivo bruto de uma doença do manifesto.
+
+    :param dir_raw: Diretório dos CSVs brutos.
+    :return: Lista ordenada com os sufixos de cidade.
+    """
+    cidades = set()
+    for caminho in glob.glob(os.path.join(dir_raw, '*.csv')):
+        casamento = PADRAO_ARQUIVO.match(os.path.basename(caminho))
+        if casamento is not None and casamento.group('doenca') in FONTES:
+            cidades.add(casamento.group('cidade'))
+    return sorted(cidades)
@@ -0,0 +1,182 @@
+"""
+graficos.py
+~~~~~~~~~~~
+
+Módulo com a renderização dos gráficos do job. As análises descrevem
+cada gráfico como um dicionário (arquivo, tipo, dados agregados e
+opções) e este módulo os desenha em um pool de processos com o backend
+Agg, sem estado global do pyplot entre gráficos: cada figura é fechada
+explicitamente depois de salva. Um gráfico só é redesenhado quando o
+hash dos seus dados ou das suas opções muda.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import matplotlib
+import pandas as pd
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+# Arquivo com os hashes dos gráficos já renderizados, no diretório de saída
+ARQUIVO_HASHES = '_hashes.json'
+
+
+def grafico(arquivo, tipo, dados, tamanho=(10, 6), **opcoes):
+    """Monta a descrição de um gráfico a renderizar.
+
+    :param arquivo: Caminho do PNG de saída.
+    :param tipo: Chave de `TIPOS` com a função de desenho.
+    :param dados: pandas DataFrame (pequeno) com os dados agregados.
+    :param tamanho: Tamanho da figura em polegadas.
+    :param opcoes: Opções repassadas à função de desenho.
+    :return: Dicionário com a descrição do gráfico.
+    """
+    return {'arquivo': arquivo, 'tipo': tipo, 'dados': dados,
+            'tamanho': tamanho, 'opcoes': opcoes}
+
+
+def desenhar_barras(ax, dados, x, y, cores, rotulo_x, rotulo_y, titulo, marcas_x=False):
+    """Gráfico de barras verticais."""
+    ax.bar(dados[x], dados[y], color=cores)
+    ax.set_xlabel(rotulo_x)
+    ax.set_ylabel(rotulo_y)
+    ax.set_title(titulo)
+    if marcas_x:
+        ax.set_xticks(dados[x])
+    ax.tick_params(axis='x', labelrotation=45)
+
+
+def desenhar_linhas(ax, dados, serie, rotulo_x, rotulo_y, titulo):
+    """Gráfico de linhas, uma por linha de `dados`; as demais colunas são o eixo x."""
+    eixo_x = [coluna for coluna in dados.columns if coluna != serie]
+    for _, linha in dados.iterrows():
+        ax.plot(eixo_x, linha[eixo_x], marker='o', label=linha[serie])
+    ax.set_title(titulo)
+    ax.set_xlabel(rotulo_x)
+    ax.set_ylabel(rotulo_y)
+    ax.legend()
+    ax.grid(True)
+    ax.set_xticks(eixo_x)
+    ax.tick_params(axis='x', labelrotation=45)
+
+
+def desenhar_barras_horizontais(ax, dados, x, y, rotulo_x, rotulo_y, titulo):
+    """Gráfico de barras horizontais com o valor de cada barra."""
+    dados.plot(kind='barh', x=x, y=y, color='skyblue', ax=ax)
+    ax.bar_label(ax.containers[0])
+    ax.set_title(titulo)
+    ax.set_xlabel(rotulo_x)
+    ax.set_ylabel(rotulo_y)
+
+
+# Funções de desenho por tipo de gráfico
+TIPOS = {
+    'barras': desenhar_barras,
+    'linhas': desenhar_linhas,
+    'barras_horizontais': desenhar_barras_horizontais,
+}
+
+
+def hash_grafico(descricao):
+    """Hash dos dados e das opções de um gráfico.
+
+    :param descricao: Dicionário montado por `grafico`.
+    :return: Hash hexadecimal.
+    """
+    sha = hashlib.sha256()
+    sha.update(pd.util.hash_pandas_object(descricao['dados'], index=False).values.tobytes())
+    sha.update(json.dumps([list(map(str, descricao['dados'].columns)), descricao['tipo'],
+                           descricao['tamanho'], descricao['opcoes']],
+                          sort_keys=True, default=str).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def desenhar(descricao):
+    """Desenha e salva um gráfico, liberando a figura em seguida.
+
+    Executada nos processos do pool.
+
+    :param descricao: Dicionário montado por `grafico`.
+    :return: Caminho do arquivo salvo.
+    """
+    fig, ax = plt.subplots(figsize=descricao['tamanho'])
+    try:
+        TIPOS[descricao['tipo']](ax, descricao['dados'], **descricao['opcoes'])
+        fig.tight_layout()
+        fig.savefig(descricao['arquivo'])
+    finally:
+        plt.close(fig)
+    return descricao['arquivo']
+
+
+def carregar_hashes(diretorio):
+    """Lê os hashes dos gráficos já renderizados em um diretório.
+
+    :param diretorio: Diretório dos gráficos.
+    :return: Dicionário nome do arquivo -> hash.
+    """
+    caminho = os.path.join(diretorio, ARQUIVO_HASHES)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, 'r') as arquivo:
+        return json.load(arquivo)
+
+
+def salvar_hashes(diretorio, hashes):
+    """Grava os hashes dos gráficos renderizados de forma atômica.
+
+    :param diretorio: Diretório dos gráficos.
+    :param hashes: Dicionário nome do arquivo -> hash.
+    :return: None
+    """
+    caminho = os.path.join(diretorio, ARQUIVO_HASHES)
+    with open(caminho + '.tmp', 'w') as arquivo:
+        json.dump(hashes, arquivo, indent=2, sort_keys=True)
+    os.replace(caminho + '.tmp', caminho)
+    return None
+
+
+def renderizar(graficos, processos=None):
+    """Renderiza em paralelo os gráficos cujos dados mudaram.
+
+    Os gráficos são agrupados pelo diretório de saída, onde fica o
+    arquivo de hashes. O pool usa processos iniciados com `spawn`, que
+    não herdam o estado do driver (JVM, figuras abertas).
+
+    :param graficos: Lista de descrições montadas por `grafico`.
+    :param processos: Número de processos do pool (padrão: CPUs).
+    :return: Lista com os arquivos efetivamente renderizados.
+    """
+    hashes_por_diretorio = {}
+    pendentes = []
+
+    for descricao in graficos:
+        diretorio, nome = os.path.split(descricao['arquivo'])
+        if diretorio not in hashes_por_diretorio:
+            hashes_por_diretorio[diretorio] = carregar_hashes(diretorio)
+        hashes = hashes_por_diretorio[diretorio]
+
+        novo_hash = hash_grafico(descricao)
+        if hashes.get(nome) == novo_hash and os.path.exists(descricao['arquivo']):
+            continue
+        hashes[nome] = novo_hash
+        pendentes.append(descricao)
+
+    if not pendentes:
+        return []
+
+    for diretorio in hashes_por_diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+
+    processos = min(processos or os.cpu_count() or 1, len(pendentes))
+    with ProcessPoolExecutor(max_workers=processos, mp_context=get_context('spawn')) as pool:
+        renderizados = list(pool.map(desenhar, pendentes))
+
+    for diretorio, hashes in hashes_por_diretorio.items():
+        salvar_hashes(diretorio, hashes)
+    return renderizados
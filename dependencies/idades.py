@@ -0,0 +1,114 @@
+"""
+idades.py
+~~~~~~~~~
+
+Módulo com a etapa de idade do job. A idade vem do campo `nu_idade` do
+SINAN, codificado como unidade + valor (o primeiro dígito é a unidade:
+1 = horas, 2 = dias, 3 = meses, 4 = anos; ex.: 4012 = 12 anos, 3006 = 6
+meses). Quando o código está ausente ou é inválido, a idade é calculada
+com precisão de mês entre `dt_nascimento` (que chega como `yyyy-mm` ou
+`yyyy-mm-dd`) e `dt_notificacao`.
+
+A idade é agrupada em faixas etárias configuráveis e idades impossíveis
+são sinalizadas, tudo em expressões nativas do Spark avaliadas em uma
+única projeção.
+"""
+
+from pyspark.sql import functions as F
+
+# Limite inferior de cada faixa etária (a última faixa é aberta)
+FAIXAS_ETARIAS = [0, 5, 10, 15, 20, 30, 40, 50, 60, 70, 80]
+
+# Maior idade aceita; acima dela (ou negativa) a idade é impossível
+IDADE_MAXIMA = 120
+
+# Divisor que converte o valor de cada unidade de `nu_idade` em anos
+UNIDADES_IDADE = {
+    1: None,  # horas
+    2: 365,   # dias
+    3: 12,    # meses
+    4: 1,     # anos
+}
+
+# Rótulos das idades fora das faixas
+FAIXA_NAO_INFORMADA = 'NÃO INFORMADA'
+FAIXA_INVALIDA = 'INVÁLIDA'
+
+
+def rotulos_faixas(faixas=FAIXAS_ETARIAS):
+    """Monta os rótulos das faixas etárias a partir dos limites inferiores.
+
+    :param faixas: Lista crescente com o limite inferior de cada faixa.
+    :return: Lista de rótulos (ex.: '0-4', '5-9', ..., '80+').
+    """
+    rotulos = ['%d-%d' % (inicio, fim - 1) for inicio, fim in zip(faixas, faixas[1:])]
+    return rotulos + ['%d+' % faixas[-1]]
+
+
+def inicio_faixa(rotulo):
+    """Limite inferior de uma faixa pelo rótulo (None fora das faixas)."""
+    inicio = rotulo.split('-')[0].rstrip('+')
+    return int(inicio) if inicio.isdigit() else None
+
+
+def decodificar_nu_idade(coluna='nu_idade'):
+    """Expressão com a idade em anos decodificada de `nu_idade`.
+
+    :param coluna: Nome da coluna com o código de idade (inteiro).
+    :return: Coluna inteira (nula para códigos inválidos).
+    """
+    unidade = F.floor(F.col(coluna) / 1000)
+    valor = F.col(coluna) % 1000
+
+    expressao = None
+    for codigo, divisor in UNIDADES_IDADE.items():
+        anos = F.lit(0) if divisor is None else F.floor(valor / divisor)
+        expressao = (F.when(unidade == codigo, anos) if expressao is None
+                     else expressao.when(unidade == codigo, anos))
+    return expressao.cast('int')
+
+
+def idade_por_datas(nascimento='dt_nascimento', referencia='dt_notificacao'):
+    """Expressão com a idade em anos completos, com precisão de mês.
+
+    :param nascimento: Coluna com a data de nascimento (texto ou data).
+    :param referencia: Coluna com a data de referência.
+    :return: Coluna inteira (nula sem data de nascimento válida).
+    """
+    data_nascimento = F.col(nascimento).cast('date')
+    data_referencia = F.col(referencia).cast('date')
+    meses = ((F.year(data_referencia) * 12 + F.month(data_referencia))
+             - (F.year(data_nascimento) * 12 + F.month(data_nascimento)))
+    return F.floor(meses / 12).cast('int')
+
+
+def faixa_etaria(idade, invalida, faixas=FAIXAS_ETARIAS):
+    """Expressão com a faixa etária de uma idade.
+
+    :param idade: Coluna com a idade em anos.
+    :param invalida: Coluna booleana que sinaliza idades impossíveis.
+    :param faixas: Limites inferiores das faixas.
+    :return: Coluna de texto com o rótulo da faixa.
+    """
+    expressao = F.when(idade.isNull(), FAIXA_NAO_INFORMADA).when(invalida, FAIXA_INVALIDA)
+    for inicio, rotulo in reversed(list(zip(faixas, rotulos_faixas(faixas)))):
+        expressao = expressao.when(idade >= inicio, rotulo)
+    return expressao
+
+
+def calcular_idade(sdf, faixas=FAIXAS_ETARIAS):
+    """Adiciona idade, faixa etária e sinalização de idade impossível.
+
+    :param sdf: DataFrame Spark com `nu_idade`, `dt_nascimento` e
+        `dt_notificacao`.
+    :param faixas: Limites inferiores das faixas etárias.
+    :return: DataFrame Spark com as colunas `idade`, `idade_invalida` e
+        `faixa_etaria`.
+    """
+    idade = F.coalesce(decodificar_nu_idade(), idade_por_datas())
+    invalida = F.coalesce((idade < 0) | (idade > IDADE_MAXIMA), F.lit(False))
+
+    return sdf.select('*',
+                      idade.alias('idade'),
+                      invalida.alias('idade_invalida'),
+                      faixa_etaria(idade, invalida, faixas).alias('faixa_etaria'))
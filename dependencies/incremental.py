@@ -0,0 +1,255 @@
+"""
+incremental.py
+~~~~~~~~~~~~~~
+
+Módulo com o processamento incremental das notificações. Os extratos do
+SINAN são reemitidos com linhas novas ou alteradas; em vez de reprocessar
+todos os anos, guardamos por fonte uma marca d'água (última semana de
+notificação e hash do extrato) e os registros já contabilizados, com o
+número de ocorrências de cada um. Só os registros novos, alterados ou
+removidos passam por `transform_data`, e suas contagens são somadas (ou
+subtraídas) do cubo persistido. As linhas das fontes reprocessadas passam
+antes pela etapa de qualidade (perfil e quarentena), e só as aceitas são
+contabilizadas.
+
+As marcas guardam também a versão do código e das tabelas de correção
+com que o cubo foi montado; quando ela muda, o cubo e o estado são
+reconstruídos a partir de todas as fontes.
+"""
+
+import json
+import os
+import shutil
+from functools import reduce
+
+from pyspark import StorageLevel
+from pyspark.sql import functions as F
+
+from dependencies.agregacao import (CAMINHO_CUBO, DIMENSOES_CUBO, carregar_cubo, consolidar_bairros,
+                                     contar_casos, mesclar_cubos, salvar_cubo)
+from dependencies.esquemas import ESQUEMA_STAGING
+from dependencies.staging import carregar_manifesto
+
+# Fonte (virus/ano) e número da notificação de um registro. O número não
+# é único dentro de uma fonte (há notificações repetidas nos extratos),
+# então os registros são comparados como multiconjunto: pela chave, pelo
+# hash das colunas e pelo número de ocorrências
+CHAVE_REGISTRO = ['virus', 'ano', 'nu_notificacao']
+
+ARQUIVO_MARCAS = 'marcas_dagua.json'
+
+
+def carregar_marcas(dir_estado, versao):
+    """Lê as marcas d'água por fonte, se gravadas com a mesma versão.
+
+    :param dir_estado: Diretório do estado incremental.
+    :param versao: Impressão do código e das tabelas de correção (None
+        descarta as marcas).
+    :return: Dicionário nome do arquivo -> marca d'água (vazio se não há
+        marcas ou se foram gravadas com outra versão).
+    """
+    caminho = os.path.join(dir_estado, ARQUIVO_MARCAS)
+    if versao is None or not os.path.exists(caminho):
+        return {}
+    with open(caminho, 'r') as arquivo:
+        marcas = json.load(arquivo)
+    if marcas.get('versao') != versao:
+        return {}
+    return marcas['fontes']
+
+
+def salvar_marcas(dir_estado, marcas, versao):
+    """Grava as marcas d'água por fonte de forma atômica.
+
+    :param dir_estado: Diretório do estado incremental.
+    :param marcas: Dicionário nome do arquivo -> marca d'água.
+    :param versao: Impressão do código e das tabelas de correção.
+    :return: None
+    """
+    os.makedirs(dir_estado, exist_ok=True)
+    caminho = os.path.join(dir_estado, ARQUIVO_MARCAS)
+    with open(caminho + '.tmp', 'w') as arquivo:
+        json.dump({'versao': versao, 'fontes': marcas}, arquivo, indent=2, sort_keys=True)
+    os.replace(caminho + '.tmp', caminho)
+    return None
+
+
+def invalidar_estado(dir_estado='data/estado'):
+    """Descarta o estado incremental.
+
+    Usado quando o cubo é regravado por uma execução completa; a próxima
+    execução incremental reconstrói o estado a partir de todas as fontes.
+
+    :param dir_estado: Diretório do estado incremental.
+    :return: None
+    """
+    if os.path.isdir(dir_estado):
+        shutil.rmtree(dir_estado)
+    return None
+
+
+def filtrar_fontes(sdf, fontes):
+    """Restringe um DataFrame particionado por virus/ano a algumas fontes.
+
+    O filtro é feito sobre as colunas de partição, então o Spark só lê
+    as partições das fontes pedidas.
+
+    :param sdf: DataFrame Spark com as colunas `virus` e `ano`.
+    :param fontes: Lista de tuplas (virus, ano).
+    :return: DataFrame Spark filtrado.
+    """
+    condicoes = [(F.col('virus') == virus) & (F.col('ano') == ano) for virus, ano in fontes]
+    return sdf.filter(reduce(lambda a, b: a | b, condicoes))
+
+
+def repetir_registros(saldo, colunas, sinal):
+    """Expande os registros com saldo de um sinal, uma linha por ocorrência.
+
+    :param saldo: DataFrame Spark com os registros e a coluna `saldo`.
+    :param colunas: Colunas mantidas no resultado.
+    :param sinal: 1 para os registros a somar, -1 para os a subtrair.
+    :return: DataFrame Spark com as colunas pedidas.
+    """
+    vezes = (F.col('saldo') * sinal).cast('int')
+    return (saldo
+            .filter(vezes > 0)
+            .withColumn('ocorrencia', F.explode(F.array_repeat(F.lit(1), vezes)))
+            .select(*colunas))
+
+
+def atualizar_incremental(spark, transformar, colunas, dir_staging='data/staging',
+                          dir_estado='data/estado', caminho_cubo=CAMINHO_CUBO, versao=None, verificar=None):
+    """Atualiza o cubo persistido só com as notificações que mudaram.
+
+    Uma fonte é reprocessada quando o hash do seu extrato no manifesto do
+    staging difere do registrado na marca d'água. Dentro dela, os
+    registros são agrupados por `CHAVE_REGISTRO` e por um hash das
+    colunas usadas pelo job, com o número de ocorrências de cada um; o
+    saldo de ocorrências entre o extrato atual e o estado soma ao cubo
+    (registros novos ou repetidos mais vezes) ou é subtraído dele
+    (registros alterados, removidos ou repetidos menos vezes). Sem cubo
+    persistido, ou com outra versão, todas as fontes são processadas.
+
+    :param spark: SparkSession.
+    :param transformar: Função de transformação (`transform_data`).
+    :param colunas: Colunas extraídas que alimentam a transformação.
+    :param dir_staging: Diretório do dataset Parquet de staging.
+    :param dir_estado: Diretório do estado incremental.
+    :param caminho_cubo: Diretório do cubo persistido.
+    :param versao: Impressão do código e das tabelas de correção (ex.:
+        `cache.impressao(cache.tabelas_correcao(), cache.versao_codigo(modulo))`);
+        None reconstrói o cubo a cada execução.
+    :param verificar: Etapa de qualidade das fontes alteradas (ex.:
+        `qualidade.verificar_fontes` com as colunas obrigatórias e o
+        diretório de qualidade), chamada com as linhas dessas fontes (ou
+        None se só houve fontes removidas), a lista das fontes (virus, ano)
+        alteradas e a das fontes do manifesto; devolve as linhas aceitas,
+        as únicas contabilizadas (None contabiliza todas).
+    :return: Tupla (cubo atualizado, conjunto de vírus afetados).
+    """
+    manifesto = carregar_manifesto(dir_staging)
+    cubo = carregar_cubo(spark, caminho_cubo)
+    marcas = carregar_marcas(dir_estado, versao) if cubo is not None else {}
+    caminho_registros = os.path.join(dir_estado, 'registros')
+    if not marcas or sorted(cubo.columns) != sorted(DIMENSOES_CUBO + ['quantidade']):
+        # Cubo sem estado incremental (ex.: gravado por uma execução
+        # completa), com outras dimensões ou montado por outra versão do
+        # código: reconstrói a partir de todas as fontes
+        cubo = None
+        marcas = {}
+        if os.path.isdir(caminho_registros):
+            shutil.rmtree(caminho_registros)
+
+    alteradas = [nome for nome, registro in manifesto.items()
+                 if marcas.get(nome, {}).get('sha256') != registro['sha256']]
+    removidas = [nome for nome in marcas if nome not in manifesto]
+    if not alteradas and not removidas:
+        return cubo, set()
+
+    extras = [c for c in ['ds_semana_notificacao'] + list(colunas) if c not in CHAVE_REGISTRO]
+    colunas_registro = CHAVE_REGISTRO + list(dict.fromkeys(extras)) + ['hash_registro']
+
+    # Linhas das fontes alteradas, lidas uma vez do staging pela etapa de
+    # qualidade e pelo agrupamento dos registros
+    fontes_alteradas = [(manifesto[nome]['virus'], manifesto[nome]['ano']) for nome in alteradas]
+    linhas = None
+    if alteradas:
+        linhas = (filtrar_fontes(spark.read.schema(ESQUEMA_STAGING).parquet(dir_staging), fontes_alteradas)
+                  .select(*colunas_registro[:-1])
+                  .persist(StorageLevel.MEMORY_AND_DISK))
+    aceitas = linhas
+    if verificar is not None:
+        aceitas = verificar(linhas, fontes_alteradas,
+                            [(registro['virus'], registro['ano']) for registro in manifesto.values()])
+
+    # Registros atuais das fontes alteradas, com o número de ocorrências
+    atual = None
+    if aceitas is not None:
+        atual = (aceitas
+                 .withColumn('hash_registro', F.xxhash64(*colunas))
+                 .groupBy(*colunas_registro)
+                 .agg(F.count(F.lit(1)).alias('ocorrencias'))
+                 .persist(StorageLevel.MEMORY_AND_DISK))
+
+    # Registros já contabilizados dessas fontes, com as ocorrências negativas
+    partes = [atual] if atual is not None else []
+    fontes_estado = [(marcas[nome]['virus'], marcas[nome]['ano']) for nome in alteradas + removidas if nome in marcas]
+    if fontes_estado and os.path.isdir(caminho_registros):
+        partes.append(filtrar_fontes(spark.read.parquet(caminho_registros), fontes_estado)
+                      .select(*colunas_registro, (-F.col('ocorrencias')).alias('ocorrencias')))
+
+    saldo = (reduce(lambda a, b: a.unionByName(b), partes)
+             .groupBy(*colunas_registro)
+             .agg(F.sum('ocorrencias').alias('saldo'))
+             .filter(F.col('saldo') != 0)
+             .persist(StorageLevel.MEMORY_AND_DISK))
+
+    # Os bairros do saldo são canonicalizados sobre as contagens, como no cubo completo
+    brutos = (contar_casos(transformar(repetir_registros(saldo, colunas, 1)))
+              .unionByName(contar_casos(transformar(repetir_registros(saldo, colunas, -1)))
+                           .withColumn('quantidade', -F.col('quantidade')))
+              .persist(StorageLevel.MEMORY_AND_DISK))
+    delta = consolidar_bairros(brutos).persist(StorageLevel.MEMORY_AND_DISK)
+
+    virus_afetados = {linha['virus'] for linha in delta.select('virus').distinct().collect()}
+    brutos.unpersist()
+    saldo.unpersist()
+    salvar_cubo(mesclar_cubos(cubo, delta), caminho_cubo)
+    delta.unpersist()
+
+    # Atualiza os registros contabilizados e as marcas d'água
+    if atual is not None:
+        resumo = {(linha['virus'], linha['ano']): linha
+                  for linha in (atual
+                                .groupBy('virus', 'ano')
+                                .agg(F.max('ds_semana_notificacao').alias('ultima_semana'),
+                                     F.sum('ocorrencias').alias('registros'))
+                                .collect())}
+        (atual
+         .write
+         .mode('overwrite')
+         .option('partitionOverwriteMode', 'dynamic')
+         .partitionBy('virus', 'ano')
+         .parquet(caminho_registros))
+        atual.unpersist()
+        linhas.unpersist()
+
+        for nome in alteradas:
+            registro = manifesto[nome]
+            linha = resumo.get((registro['virus'], registro['ano']))
+            marcas[nome] = {
+                'sha256': registro['sha256'],
+                'virus': registro['virus'],
+                'ano': registro['ano'],
+                'ultima_semana': linha['ultima_semana'] if linha else None,
+                'registros': linha['registros'] if linha else 0,
+            }
+
+    for nome in removidas:
+        particao = os.path.join(caminho_registros, 'virus=' + marcas[nome]['virus'], 'ano=' + str(marcas[nome]['ano']))
+        if os.path.isdir(particao):
+            shutil.rmtree(particao)
+        del marcas[nome]
+
+    salvar_marcas(dir_estado, marcas, versao)
+    return carregar_cubo(spark, caminho_cubo), virus_afetados
@@ -0,0 +1,508 @@
+"""
+motor_local.py
+~~~~~~~~~~~~~~
+
+Motor de execução local do job, em processo, com pyarrow e pandas. Para
+entradas pequenas (como os extratos de um único município), iniciar a
+JVM e agendar tarefas custa mais que o próprio trabalho; abaixo de um
+limite de tamanho dos CSVs brutos o job usa este motor, que reproduz
+extract_data, transform_data e o cubo de agregação sem SparkSession.
+Os gráficos (`load_plot_*`) já trabalham sobre o cubo em pandas e são
+compartilhados pelos dois motores.
+
+As conversões seguem a semântica do `cast` do Spark (datas `yyyy`,
+`yyyy-mm` ou `yyyy-mm-dd`, inteiros com parte decimal truncada e valores
+inválidos como nulos), de modo que os dois motores produzem o mesmo cubo.
+"""
+
+import os
+import re
+import shutil
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from dependencies.agregacao import DIMENSOES_CUBO, PARTICOES_CUBO
+from dependencies.bairros import canonicalizar
+from dependencies.esquemas import CODIGOS_SEXO, CODIGOS_VIRUS, DIMENSOES_CODIFICADAS
+from dependencies.fontes import descobrir_fontes
+from dependencies.idades import (FAIXA_INVALIDA, FAIXA_NAO_INFORMADA, FAIXAS_ETARIAS, IDADE_MAXIMA,
+                                 UNIDADES_IDADE, rotulos_faixas)
+from dependencies.qualidade import COLUNAS_PERFIL, COLUNAS_QUANTIS, QUANTIS, montar_relatorio
+from dependencies.rotulos import inverter
+from dependencies.semanas import (ANOS_MINIMOS_CANAL, BAIRRO_TODOS, CAMINHO_ALERTAS, CAMINHO_SEMANAS,
+                                  CASOS_MINIMOS_ALERTA, CHAVE_SEMANA, DESVIOS_CANAL, SEMANAS_MEDIA_MOVEL,
+                                  anos_gravados, calendario_semanas, trocar_anos)
+
+# Tamanho total dos CSVs brutos até o qual o modo automático usa o motor local
+LIMITE_BYTES_LOCAL = 128 * 1024 ** 2
+
+# Motores disponíveis para o job
+MOTORES = ('auto', 'spark', 'local')
+
+# Colunas extraídas cujas linhas nulas não são descartadas
+COLUNAS_OPCIONAIS = ('dt_nascimento', 'nu_idade', 'ds_semana_notificacao')
+
+# Texto aceito pelo cast de string para date do Spark
+PADRAO_DATA = re.compile(r'^(\d{4,7})(?:-(\d{1,2})(?:-(\d{1,2})(?:[ T].*)?)?)?$')
+
+# Texto aceito pelo cast de string para int do Spark
+PADRAO_INTEIRO = re.compile(r'^[+-]?\d+(?:\.\d*)?$')
+
+
+def tamanho_entrada(dir_raw='data/raw', fontes=None):
+    """Soma o tamanho em bytes dos CSVs brutos do manifesto.
+
+    :param dir_raw: Diretório dos CSVs brutos.
+    :param fontes: Fontes consideradas (padrão: `descobrir_fontes(dir_raw)`).
+    :return: Tamanho total em bytes.
+    """
+    if fontes is None:
+        fontes = descobrir_fontes(dir_raw)
+    return sum(os.path.getsize(fonte['caminho']) for fonte in fontes)
+
+
+def escolher_motor(motor='auto', dir_raw='data/raw', limite_bytes=LIMITE_BYTES_LOCAL, incremental=False,
+                   fontes=None):
+    """Resolve o motor de execução do job.
+
+    O modo incremental depende do estado gravado pelo Spark e sempre usa
+    o Spark; no modo automático, o motor local é usado enquanto os CSVs
+    brutos somarem até `limite_bytes`.
+
+    :param motor: 'auto', 'spark' ou 'local'.
+    :param dir_raw: Diretório dos CSVs brutos.
+    :param limite_bytes: Limite de tamanho para o motor local.
+    :param incremental: Se a execução é incremental.
+    :param fontes: Fontes consideradas (padrão: `descobrir_fontes(dir_raw)`).
+    :return: 'spark' ou 'local'.
+    """
+    if motor not in MOTORES:
+        raise ValueError('motor desconhecido: ' + motor)
+    if incremental:
+        return 'spark'
+    if motor == 'auto':
+        return 'local' if tamanho_entrada(dir_raw, fontes) <= limite_bytes else 'spark'
+    return motor
+
+
+@lru_cache(maxsize=None)
+def ler_data(texto):
+    """Converte um texto em data como o cast de string para date do Spark.
+
+    :param texto: Texto (ou None).
+    :return: datetime.date ou None se o texto não for uma data válida.
+    """
+    if texto is None:
+        return None
+    casamento = PADRAO_DATA.match(texto.strip())
+    if casamento is None:
+        return None
+    ano, mes, dia = (int(parte) if parte else 1 for parte in casamento.groups())
+    try:
+        return date(ano, mes, dia)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def ler_inteiro(texto):
+    """Converte um texto em inteiro como o cast de string para int do Spark.
+
+    :param texto: Texto (ou None).
+    :return: int ou None se o texto não for numérico ou não couber em 32 bits.
+    """
+    if texto is None:
+        return None
+    texto = texto.strip()
+    if not PADRAO_INTEIRO.match(texto):
+        return None
+    valor = int(texto.split('.')[0])
+    return valor if -2 ** 31 <= valor < 2 ** 31 else None
+
+
+def converter(serie, funcao):
+    """Aplica uma conversão aos valores distintos de uma série de textos."""
+    valores = serie.dropna().unique()
+    return serie.map(dict(zip(valores, map(funcao, valores))))
+
+
+def decodificar_texto(coluna):
+    """Decodifica uma coluna binária como UTF-8, como o leitor de CSV do Spark.
+
+    Bytes inválidos (ex.: extratos gravados em Latin-1) viram U+FFFD em vez
+    de interromper a leitura. Só os valores distintos são decodificados.
+
+    :param coluna: pyarrow ChunkedArray binário.
+    :return: pyarrow Array de texto.
+    """
+    codificada = coluna.combine_chunks().dictionary_encode()
+    valores = pa.array([valor.decode('utf-8', errors='replace')
+                        for valor in codificada.dictionary.to_pylist()], pa.string())
+    return pa.DictionaryArray.from_arrays(codificada.indices, valores).cast(pa.string())
+
+
+def extrair_local(colunas, dir_raw='data/raw', fontes=None):
+    """Lê os CSVs brutos do manifesto em um único pandas DataFrame.
+
+    Equivale a `extract_data` sobre o staging: só as colunas pedidas são
+    lidas, os apelidos de colunas são aplicados e `virus` e `ano` vêm do
+    manifesto.
+
+    :param colunas: Colunas extraídas (incluindo `virus` e, opcionalmente, `ano`).
+    :param dir_raw: Diretório dos CSVs brutos.
+    :param fontes: Fontes extraídas (padrão: `descobrir_fontes(dir_raw)`).
+    :return: pandas DataFrame com as colunas como texto.
+    """
+    if fontes is None:
+        fontes = descobrir_fontes(dir_raw)
+    partes = []
+    for fonte in fontes:
+        # Nome de cada coluna no arquivo -> nome usado pelo job
+        apelidos = {novo: antigo for antigo, novo in fonte['apelidos'].items()}
+        originais = {apelidos.get(coluna, coluna): coluna for coluna in colunas if coluna not in ('virus', 'ano')}
+        tabela = pv.read_csv(
+            fonte['caminho'],
+            parse_options=pv.ParseOptions(delimiter=';'),
+            convert_options=pv.ConvertOptions(
+                include_columns=list(originais),
+                include_missing_columns=True,
+                column_types={nome: pa.binary() for nome in originais},
+                strings_can_be_null=True,
+                null_values=['']))
+        tabela = pa.table([decodificar_texto(tabela[nome]) for nome in tabela.column_names],
+                          names=tabela.column_names)
+        parte = tabela.to_pandas().rename(columns=originais)
+        parte['virus'] = fonte['virus']
+        parte['ano'] = fonte['ano']
+        partes.append(parte[colunas])
+
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+    return pd.concat(partes, ignore_index=True)
+
+
+def tipar_local(df):
+    """Converte as colunas extraídas para os tipos do staging.
+
+    :param df: pandas DataFrame retornado por `extrair_local`.
+    :return: pandas DataFrame com datas e inteiros convertidos (nulos quando
+        o texto não é válido).
+    """
+    df = df.copy()
+    df['dt_notificacao'] = converter(df['dt_notificacao'], ler_data)
+    for coluna in ('notificacao_ano', 'ds_semana_notificacao', 'nu_idade'):
+        df[coluna] = converter(df[coluna], ler_inteiro).astype('Int64')
+    return df
+
+
+def perfilar_local(df, obrigatorias):
+    """Perfil de qualidade e linhas rejeitadas (equivale a `dependencies.qualidade`).
+
+    As contagens de distintos e os quantis são exatos; o quantil p é o
+    menor valor com ao menos p dos valores menores ou iguais a ele, a
+    definição do `percentile_approx`.
+
+    :param df: pandas DataFrame retornado por `extrair_local`, com `ano`.
+    :param obrigatorias: Colunas obrigatórias.
+    :return: Tupla (relatório montado por `montar_relatorio`, pandas
+        DataFrame com as linhas rejeitadas, tipadas, e a coluna `motivo`).
+    """
+    df = tipar_local(df)
+    nulos = df[obrigatorias].isna()
+    rejeitada = nulos.any(axis=1)
+    motivos = [','.join('nulo:' + coluna for coluna in obrigatorias if linha[coluna])
+               for linha in nulos[rejeitada].to_dict('records')]
+
+    unidade = np.floor(df['nu_idade'].astype('float64') / 1000)
+    semana = np.fmod(df['ds_semana_notificacao'].astype('float64'), 100)
+    invalidos = {
+        'tp_sexo': ~df['tp_sexo'].isin(list(CODIGOS_SEXO.values())),
+        'nu_idade': ~unidade.isin(list(UNIDADES_IDADE)),
+        'ds_semana_notificacao': ~((semana >= 1) & (semana <= 53)),
+        'dt_nascimento': converter(df['dt_nascimento'], ler_data).isna(),
+    }
+
+    metricas = {}
+    for (virus, ano), indice in df.groupby(['virus', 'ano']).groups.items():
+        prefixo = '%s/%d/' % (virus, ano)
+        metricas[prefixo + '*/linhas'] = len(indice)
+        metricas[prefixo + '*/rejeitadas'] = int(rejeitada[indice].sum())
+        for nome in COLUNAS_PERFIL:
+            coluna = df.loc[indice, nome]
+            metricas[prefixo + nome + '/nulos'] = int(coluna.isna().sum())
+            metricas[prefixo + nome + '/distintos'] = int(coluna.nunique())
+            if nome in invalidos:
+                metricas[prefixo + nome + '/invalidos'] = int((coluna.notna() & invalidos[nome][indice]).sum())
+            if nome in COLUNAS_QUANTIS:
+                valores = np.sort(coluna.dropna().to_numpy('int64'))
+                posicoes = np.maximum(np.ceil(np.array(QUANTIS) * len(valores)).astype('int64') - 1, 0)
+                metricas[prefixo + nome + '/quantis'] = (
+                    [int(valor) for valor in valores[posicoes]] if len(valores) else None)
+
+    quarentena = df[rejeitada].assign(motivo=motivos)
+    return montar_relatorio(metricas, obrigatorias), quarentena
+
+
+def salvar_quarentena_local(quarentena, caminho):
+    """Grava as linhas rejeitadas no mesmo layout de `salvar_quarentena`.
+
+    :param quarentena: pandas DataFrame retornado por `perfilar_local`.
+    :param caminho: Diretório da quarentena.
+    :return: None
+    """
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+    os.makedirs(caminho)
+    if len(quarentena):
+        pq.write_to_dataset(pa.Table.from_pandas(quarentena, preserve_index=False), caminho,
+                            partition_cols=['virus', 'ano'])
+    return None
+
+
+def calcular_idade_local(df, faixas=FAIXAS_ETARIAS):
+    """Adiciona idade, faixa etária e sinalização de idade impossível.
+
+    Equivale a `dependencies.idades.calcular_idade`, com operações
+    vetorizadas sobre as colunas.
+
+    :param df: pandas DataFrame com `nu_idade` (texto), `dt_nascimento`
+        (texto) e `dt_notificacao` (data).
+    :param faixas: Limites inferiores das faixas etárias.
+    :return: pandas DataFrame com as colunas `idade`, `idade_invalida` e
+        `faixa_etaria`.
+    """
+    codigo = converter(df['nu_idade'], ler_inteiro).astype('float64')
+    unidade = np.floor(codigo / 1000)
+    valor = np.fmod(codigo, 1000)
+
+    decodificada = pd.Series(np.nan, index=df.index)
+    for codigo_unidade, divisor in UNIDADES_IDADE.items():
+        anos = 0 if divisor is None else np.floor(valor / divisor)
+        decodificada = decodificada.mask(unidade == codigo_unidade, anos)
+
+    def meses(datas):
+        return datas.map(lambda data: data.year * 12 + data.month if isinstance(data, date) else np.nan).astype('float64')
+
+    nascimento = converter(df['dt_nascimento'], ler_data)
+    por_datas = np.floor((meses(df['dt_notificacao']) - meses(nascimento)) / 12)
+
+    df['idade'] = decodificada.fillna(por_datas)
+    df['idade_invalida'] = (df['idade'] < 0) | (df['idade'] > IDADE_MAXIMA)
+
+    faixa = pd.cut(df['idade'], bins=list(faixas) + [np.inf], right=False, labels=rotulos_faixas(faixas))
+    df['faixa_etaria'] = (faixa.astype(object)
+                          .where(~df['idade_invalida'], FAIXA_INVALIDA)
+                          .where(df['idade'].notna(), FAIXA_NAO_INFORMADA))
+    return df
+
+
+def transformar_local(df, faixas=FAIXAS_ETARIAS, obrigatorias=None):
+    """Aplica ao DataFrame extraído as mesmas regras de `transform_data`.
+
+    :param df: pandas DataFrame retornado por `extrair_local`.
+    :param faixas: Limites inferiores das faixas etárias.
+    :param obrigatorias: Colunas cujas linhas nulas são descartadas
+        (padrão: todas, exceto `COLUNAS_OPCIONAIS`).
+    :return: pandas DataFrame com as colunas de `transform_data`.
+    """
+    if obrigatorias is None:
+        obrigatorias = [coluna for coluna in df.columns if coluna not in COLUNAS_OPCIONAIS]
+    df = df.copy()
+    df['dt_notificacao'] = converter(df['dt_notificacao'], ler_data)
+    df['notificacao_ano'] = converter(df['notificacao_ano'], ler_inteiro)
+    df = df.dropna(subset=obrigatorias)
+
+    # Vírus, sexo, mês e trimestre seguem como códigos até o cubo, onde são rotulados
+    codigos_sexo = inverter(CODIGOS_SEXO)
+    df['virus'] = df['virus'].map(inverter(CODIGOS_VIRUS)).astype('int8')
+    df['tp_sexo'] = df['tp_sexo'].map(codigos_sexo).fillna(codigos_sexo['I']).astype('int8')
+
+    notificacao = pd.to_datetime(df['dt_notificacao'])
+    df['notificacao_mes'] = notificacao.dt.month.astype('int8')
+    df['notificacao_trimestre'] = notificacao.dt.quarter.astype('int8')
+    df['notificacao_semana'] = converter(df['ds_semana_notificacao'], ler_inteiro)
+
+    # Canonicalização dos bairros, resolvida uma vez por nome distinto
+    df['no_bairro_residencia'] = converter(df['no_bairro_residencia'], canonicalizar)
+
+    df['notificacao_ano'] = df['notificacao_ano'].astype('int32')
+    df = calcular_idade_local(df, faixas)
+
+    return df[['dt_notificacao', 'notificacao_mes', 'notificacao_trimestre', 'notificacao_semana', 'notificacao_ano',
+               'dt_nascimento', 'idade', 'idade_invalida', 'faixa_etaria', 'tp_sexo',
+               'no_bairro_residencia', 'virus']]
+
+
+def construir_cubo_local(df):
+    """Conta os casos por todas as dimensões do cubo (equivale a `construir_cubo`).
+
+    O agrupamento é feito sobre os códigos das dimensões codificadas e os
+    rótulos são aplicados nas linhas do cubo. Os tipos seguem os do cubo
+    do Spark coletado com `toPandas`: a semana só é inteira se não houver
+    semanas nulas.
+
+    :param df: pandas DataFrame retornado por `transformar_local`.
+    :return: pandas DataFrame com as dimensões e `quantidade`.
+    """
+    cubo = (df
+            .groupby(DIMENSOES_CUBO, dropna=False)
+            .size()
+            .rename('quantidade')
+            .reset_index())
+    for coluna, mapa in DIMENSOES_CODIFICADAS.items():
+        cubo[coluna] = cubo[coluna].map(mapa)
+    if not cubo['notificacao_semana'].isna().any():
+        cubo['notificacao_semana'] = cubo['notificacao_semana'].astype('int32')
+    cubo['quantidade'] = cubo['quantidade'].astype('int64')
+    return cubo
+
+
+def salvar_cubo_local(cubo, caminho):
+    """Grava o cubo no armazenamento de agregados no mesmo layout do Spark.
+
+    :param cubo: pandas DataFrame com o cubo.
+    :param caminho: Diretório do cubo.
+    :return: None
+    """
+    temporario = caminho + '.tmp'
+    if os.path.isdir(temporario):
+        shutil.rmtree(temporario)
+    pq.write_to_dataset(pa.Table.from_pandas(cubo, preserve_index=False), temporario,
+                        partition_cols=PARTICOES_CUBO)
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+    os.rename(temporario, caminho)
+    return None
+
+
+def casos_semanais_local(cubo):
+    """Soma os casos do cubo por vírus, bairro e semana, com zeros.
+
+    Equivale a `dependencies.semanas.casos_semanais`.
+
+    :param cubo: pandas DataFrame com o cubo de agregação.
+    :return: pandas DataFrame com a chave, `ano`, `semana_ano` e `casos`.
+    """
+    por_bairro = (cubo
+                  .dropna(subset=['notificacao_semana'])
+                  .groupby(CHAVE_SEMANA)['quantidade']
+                  .sum()
+                  .rename('casos')
+                  .reset_index())
+    municipio = (por_bairro
+                 .groupby(['virus', 'notificacao_semana'])['casos']
+                 .sum()
+                 .reset_index()
+                 .assign(no_bairro_residencia=BAIRRO_TODOS))
+    semanal = pd.concat([por_bairro, municipio], ignore_index=True)
+
+    # Calendário contínuo da primeira à última semana, mais as semanas dos dados fora dele
+    semanas = sorted(set(int(semana) for semana in semanal['notificacao_semana']))
+    if semanas:
+        semanas = sorted(set(semanas) | set(calendario_semanas(semanas[0], semanas[-1])))
+    calendario = pd.DataFrame({'notificacao_semana': pd.Series(semanas, dtype=semanal['notificacao_semana'].dtype)})
+    grade = semanal[['virus', 'no_bairro_residencia']].drop_duplicates().merge(calendario, how='cross')
+
+    df = grade.merge(semanal, on=CHAVE_SEMANA, how='left')
+    df['notificacao_semana'] = df['notificacao_semana'].astype('int32')
+    df['casos'] = df['casos'].fillna(0).astype('int64')
+    df['ano'] = (df['notificacao_semana'] // 100).astype('int32')
+    df['semana_ano'] = (df['notificacao_semana'] % 100).astype('int32')
+    return df
+
+
+def calcular_series_local(cubo, semanas_media=SEMANAS_MEDIA_MOVEL, desvios=DESVIOS_CANAL,
+                          anos_minimos=ANOS_MINIMOS_CANAL, casos_minimos=CASOS_MINIMOS_ALERTA):
+    """Calcula as séries semanais (equivale a `dependencies.semanas.calcular_series`).
+
+    :param cubo: pandas DataFrame com o cubo de agregação.
+    :param semanas_media: Número de semanas da média móvel.
+    :param desvios: Desvios padrão acima da média do canal endêmico.
+    :param anos_minimos: Anos anteriores exigidos pelo canal endêmico.
+    :param casos_minimos: Casos mínimos na semana para emitir alerta.
+    :return: pandas DataFrame com uma linha por vírus, bairro e semana.
+    """
+    df = casos_semanais_local(cubo).sort_values(CHAVE_SEMANA, ignore_index=True)
+    df['media_movel'] = (df
+                         .groupby(['virus', 'no_bairro_residencia'])['casos']
+                         .rolling(semanas_media, min_periods=1)
+                         .mean()
+                         .reset_index(level=[0, 1], drop=True))
+
+    # Anos anteriores da mesma semana do ano (sem o próprio ano), com
+    # somas acumuladas em vez de uma janela por grupo
+    df = df.sort_values(['virus', 'no_bairro_residencia', 'semana_ano', 'ano'])
+    chave = ['virus', 'no_bairro_residencia', 'semana_ano']
+    casos = df['casos'].astype('float64')
+    anos_base = df.groupby(chave).cumcount()
+    soma = df.assign(casos=casos).groupby(chave)['casos'].cumsum() - casos
+    soma_quadrados = df.assign(casos=casos ** 2).groupby(chave)['casos'].cumsum() - casos ** 2
+    variancia = ((soma_quadrados - soma ** 2 / anos_base) / (anos_base - 1)).clip(lower=0)
+
+    df['anos_base'] = anos_base.astype('int64')
+    df['media_historica'] = (soma / anos_base).where(anos_base > 0)
+    df['desvio_historico'] = np.sqrt(variancia).where(anos_base > 1)
+    df['limite_superior'] = df['media_historica'] + desvios * df['desvio_historico'].fillna(0.0)
+
+    df['alerta'] = ((df['anos_base'] >= anos_minimos)
+                    & (df['casos'] >= casos_minimos)
+                    & (df['casos'] > df['limite_superior']))
+    return df.sort_values(CHAVE_SEMANA).reset_index(drop=True)
+
+
+def salvar_series_local(series, caminho_semanas=CAMINHO_SEMANAS, caminho_alertas=CAMINHO_ALERTAS):
+    """Atualiza as séries semanais e os alertas (equivale a `salvar_series`).
+
+    :param series: pandas DataFrame retornado por `calcular_series_local`.
+    :param caminho_semanas: Diretório das séries.
+    :param caminho_alertas: Diretório dos alertas.
+    :return: Lista com os anos regravados.
+    """
+    anos_series = {int(ano) for ano in series['ano'].unique()}
+    anos = sorted(anos_series)
+    if os.path.isdir(caminho_semanas):
+        anterior = pq.read_table(caminho_semanas, columns=CHAVE_SEMANA + ['ano', 'casos']).to_pandas()
+        comparacao = series[CHAVE_SEMANA + ['ano', 'casos']].merge(
+            anterior.astype({'ano': 'int32'}), on=CHAVE_SEMANA, how='outer', suffixes=('', '_anterior'))
+        diferentes = comparacao[comparacao['casos'].ne(comparacao['casos_anterior'])]
+        if diferentes.empty:
+            return []
+        inicio = int(diferentes['ano'].fillna(diferentes['ano_anterior']).min())
+        anos = [ano for ano in anos if ano >= inicio]
+    if not anos and not anos_gravados(caminho_semanas) - anos_series:
+        return []
+
+    manter = anos_series - set(anos)
+    for caminho, dados in ((caminho_semanas, series), (caminho_alertas, series[series['alerta']])):
+        temporario = caminho + '.tmp'
+        if os.path.isdir(temporario):
+            shutil.rmtree(temporario)
+        if anos:
+            pq.write_to_dataset(pa.Table.from_pandas(dados[dados['ano'].isin(anos)], preserve_index=False),
+                                temporario, partition_cols=['ano'])
+        trocar_anos(caminho, temporario, manter)
+    return anos
+
+
+def cubos_iguais(cubo, outro):
+    """Compara dois cubos em pandas, independentemente da ordem das linhas.
+
+    :param cubo: pandas DataFrame com um cubo.
+    :param outro: pandas DataFrame com outro cubo.
+    :return: True se os dois têm as mesmas células e quantidades.
+    """
+    colunas = DIMENSOES_CUBO + ['quantidade']
+
+    def ordenar(df):
+        tipos = {coluna: object for coluna in DIMENSOES_CUBO}
+        tipos.update({'notificacao_ano': 'int64', 'notificacao_semana': 'float64', 'quantidade': 'int64'})
+        df = df[colunas].astype(tipos)
+        return df.sort_values(colunas, na_position='first').reset_index(drop=True)
+
+    return ordenar(cubo).equals(ordenar(outro))
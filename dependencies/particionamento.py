@@ -0,0 +1,141 @@
+"""
+particionamento.py
+~~~~~~~~~~~~~~~~~~
+
+Módulo com o ajuste de particionamento do job. Os dados são muito
+desbalanceados (a dengue de 2021 tem dezenas de vezes mais notificações
+que a zika de 2019), então o número de partições de shuffle é estimado
+a partir do tamanho do staging, em vez dos 200 padrão. O tamanho em
+disco é o do Parquet comprimido; ele é multiplicado por um fator de
+expansão para estimar o volume das linhas em memória, que é o que o
+shuffle move. Quando alguma fonte passa do volume de uma partição, os
+dados extraídos são reparticionados por virus/ano com um sal
+proporcional ao tamanho de cada fonte: fontes grandes são espalhadas em
+vários baldes e fontes pequenas ficam em um só. Sem fontes grandes não
+há reparticionamento (o groupBy do cubo já faz o seu shuffle).
+
+As opções de execução adaptativa (AQE, coalescência de partições e
+junções com desbalanceamento) vêm da configuração do job
+(`configs/etl_config.json`, carregada por `dependencies.spark.start_spark`).
+"""
+
+import math
+import os
+
+from pyspark.sql import functions as F
+
+from dependencies.staging import carregar_manifesto
+
+# Volume de dados desejado por partição
+BYTES_POR_PARTICAO = 64 * 1024 ** 2
+
+# Razão entre o volume das linhas em memória e o Parquet comprimido do
+# staging (cerca de 13 bytes por linha em disco e 130 em memória nas
+# colunas extraídas)
+FATOR_EXPANSAO = 10
+
+# Limites do número de partições de shuffle
+PARTICOES_MINIMAS = 1
+PARTICOES_MAXIMAS = 2000
+
+
+def aplicar_configuracao(spark, config):
+    """Aplica as opções SQL da configuração do job à sessão.
+
+    As opções de AQE podem ser alteradas em tempo de execução, então
+    valem também quando o job roda por `spark-submit`.
+
+    :param spark: SparkSession.
+    :param config: Dicionário da configuração do job (ou None).
+    :return: None
+    """
+    for chave, valor in (config or {}).get('spark_sql', {}).items():
+        spark.conf.set(chave, valor)
+    return None
+
+
+def tamanho_fontes(dir_staging='data/staging'):
+    """Mede o tamanho em disco de cada fonte do staging.
+
+    :param dir_staging: Diretório do dataset Parquet.
+    :return: Dicionário (virus, ano) -> bytes.
+    """
+    tamanhos = {}
+    for registro in carregar_manifesto(dir_staging).values():
+        total = 0
+        for raiz, _, arquivos in os.walk(registro['particao']):
+            total += sum(os.path.getsize(os.path.join(raiz, arquivo)) for arquivo in arquivos)
+        chave = (registro['virus'], registro['ano'])
+        tamanhos[chave] = tamanhos.get(chave, 0) + total
+    return tamanhos
+
+
+def estimar_particoes(bytes_entrada, bytes_por_particao=BYTES_POR_PARTICAO,
+                      particoes_minimas=PARTICOES_MINIMAS, particoes_maximas=PARTICOES_MAXIMAS,
+                      fator_expansao=FATOR_EXPANSAO):
+    """Estima o número de partições para um volume de dados.
+
+    :param bytes_entrada: Volume de dados em disco (Parquet) em bytes.
+    :param bytes_por_particao: Volume em memória desejado por partição.
+    :param particoes_minimas: Menor número de partições.
+    :param particoes_maximas: Maior número de partições.
+    :param fator_expansao: Razão entre o volume em memória e em disco.
+    :return: Número de partições.
+    """
+    particoes = math.ceil(bytes_entrada * fator_expansao / bytes_por_particao)
+    return max(particoes_minimas, min(particoes_maximas, particoes))
+
+
+def ajustar_particoes(spark, tamanhos, **particionamento):
+    """Dimensiona as partições de shuffle pelo tamanho da entrada.
+
+    Com a AQE ligada, o valor é o ponto de partida que a coalescência
+    reduz conforme o tamanho real de cada shuffle.
+
+    :param spark: SparkSession.
+    :param tamanhos: Dicionário (virus, ano) -> bytes de `tamanho_fontes`.
+    :param particionamento: Opções de `estimar_particoes`.
+    :return: Número de partições de shuffle.
+    """
+    particoes = estimar_particoes(sum(tamanhos.values()), **particionamento)
+    spark.conf.set('spark.sql.shuffle.partitions', str(particoes))
+    spark.conf.set('spark.sql.adaptive.coalescePartitions.initialPartitionNum', str(particoes))
+    return particoes
+
+
+def repartir_por_fonte(sdf, tamanhos, bytes_por_particao=BYTES_POR_PARTICAO, fator_expansao=FATOR_EXPANSAO,
+                       **limites):
+    """Reparticiona um DataFrame por virus/ano com sal por fonte.
+
+    Cada fonte recebe `ceil(tamanho * fator_expansao / bytes_por_particao)`
+    baldes; o balde de uma linha é um hash das suas colunas, de modo que a
+    distribuição é determinística (reexecuções de tarefas geram as mesmas
+    partições). A fonte de uma linha é a partição `ano` do staging, não o
+    ano da notificação, que pode ser outro. Se nenhuma fonte precisa de
+    mais de um balde, o DataFrame é devolvido sem shuffle.
+
+    :param sdf: DataFrame Spark com `virus` e `ano`.
+    :param tamanhos: Dicionário (virus, ano) -> bytes de `tamanho_fontes`.
+    :param bytes_por_particao: Volume em memória desejado por partição.
+    :param fator_expansao: Razão entre o volume em memória e em disco.
+    :param limites: `particoes_minimas` e `particoes_maximas`.
+    :return: DataFrame Spark reparticionado (ou o próprio `sdf`).
+    """
+    baldes = {fonte: math.ceil(tamanho * fator_expansao / bytes_por_particao)
+              for fonte, tamanho in tamanhos.items()}
+    grandes = {fonte: quantidade for fonte, quantidade in baldes.items() if quantidade > 1}
+    if not grandes:
+        return sdf
+
+    particoes = estimar_particoes(sum(tamanhos.values()), bytes_por_particao, fator_expansao=fator_expansao,
+                                  **limites)
+    quantidade_baldes = F.lit(1)
+    for (virus, ano), quantidade in grandes.items():
+        quantidade_baldes = F.when((F.col('virus') == virus) & (F.col('ano') == ano),
+                                   quantidade).otherwise(quantidade_baldes)
+    sal = F.pmod(F.xxhash64(*sdf.columns), quantidade_baldes)
+
+    return (sdf
+            .withColumn('_sal', sal)
+            .repartition(particoes, 'virus', 'ano', '_sal')
+            .drop('_sal'))
@@ -0,0 +1,152 @@
+"""
+perfil.py
+~~~~~~~~~
+
+Módulo com a instrumentação das etapas do job. Cada etapa é executada
+dentro de `Perfil.etapa`, que marca os jobs Spark disparados com um
+grupo próprio e registra o tempo de parede. Ao final, o relatório
+consulta a API REST da UI do Spark para obter, por etapa, os jobs e
+stages, os registros lidos e escritos e os bytes de shuffle, e grava
+tudo em JSON junto com o pico de memória do driver.
+
+Como o Spark é preguiçoso, o trabalho de uma transformação aparece na
+etapa que dispara a ação (por exemplo, a coleta do cubo). Execuções do
+motor local (sem SparkSession) registram apenas tempos e memória.
+"""
+
+import json
+import logging as logging_python
+import os
+import resource
+import time
+from contextlib import contextmanager
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from dependencies import logging
+
+# Registro das mensagens do motor local, que não tem o Log4j do Spark
+LOGGER_LOCAL = logging_python.getLogger(__name__)
+
+
+class Perfil(object):
+    """Coletor das métricas das etapas de uma execução.
+
+    :param spark: SparkSession (None no motor local).
+    :param prefixo: Prefixo dos grupos de jobs, que distingue as etapas de
+        execuções simultâneas sobre o mesmo SparkContext.
+    """
+
+    def __init__(self, spark, prefixo=''):
+        self.spark = spark
+        self.prefixo = prefixo
+        self.sc = spark.sparkContext if spark is not None else None
+        self.logger = logging.Log4j(spark) if spark is not None else LOGGER_LOCAL
+        self.etapas = []
+        self.inicio = time.time()
+
+    @contextmanager
+    def etapa(self, nome):
+        """Mede uma etapa do job.
+
+        O dicionário devolvido pode receber métricas conhecidas pelo
+        chamador (por exemplo, `linhas_saida` de um resultado coletado).
+
+        :param nome: Nome da etapa.
+        :return: Dicionário com o registro da etapa.
+        """
+        grupo = '%setapa-%d-%s' % (self.prefixo, len(self.etapas), nome)
+        registro = {'etapa': nome, 'grupo': grupo}
+        self._marcar_grupo(grupo, nome)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['duracao_s'] = round(time.perf_counter() - inicio, 3)
+            registro['rss_pico_driver_python_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self._marcar_grupo(None, None)
+            self.etapas.append(registro)
+            self._registrar('etapa %s concluida em %.3fs' % (nome, registro['duracao_s']))
+
+    def _marcar_grupo(self, grupo, descricao):
+        """Marca os jobs Spark disparados a seguir com o grupo da etapa."""
+        if self.sc is not None:
+            self.sc.setLocalProperty('spark.jobGroup.id', grupo)
+            self.sc.setLocalProperty('spark.job.description', descricao)
+
+    def _registrar(self, mensagem):
+        """Registra uma mensagem no Log4j (ou no `logging` do Python, sem Spark)."""
+        self.logger.info(mensagem)
+
+    def _consultar_api(self, recurso):
+        """Consulta a API REST da UI do Spark (None se indisponível)."""
+        url = self.sc.uiWebUrl if self.sc is not None else None
+        if not url:
+            return None
+        try:
+            with urlopen('%s/api/v1/applications/%s/%s' % (url, self.sc.applicationId, recurso), timeout=5) as resposta:
+                return json.load(resposta)
+        except (URLError, OSError, ValueError):
+            return None
+
+    def _metricas_etapa(self, registro):
+        """Soma as métricas dos stages dos jobs de uma etapa."""
+        if self.sc is None:
+            return {}
+        rastreador = self.sc.statusTracker()
+        jobs = sorted(rastreador.getJobIdsForGroup(registro['grupo']))
+        stages = []
+        for job in jobs:
+            info = rastreador.getJobInfo(job)
+            if info is not None:
+                stages.extend(info.stageIds)
+
+        metricas = {'jobs': jobs, 'stages': sorted(stages)}
+        campos = {
+            'inputRecords': 'linhas_entrada',
+            'outputRecords': 'linhas_escritas',
+            'inputBytes': 'bytes_entrada',
+            'shuffleReadBytes': 'bytes_shuffle_leitura',
+            'shuffleWriteBytes': 'bytes_shuffle_escrita',
+        }
+        for nome in campos.values():
+            metricas[nome] = 0
+
+        for stage in stages:
+            tentativas = self._consultar_api('stages/%d' % stage)
+            if not tentativas:
+                continue
+            for campo, nome in campos.items():
+                metricas[nome] += tentativas[0].get(campo, 0)
+        return metricas
+
+    def salvar_relatorio(self, caminho='data/plots/relatorio_execucao.json'):
+        """Grava o relatório JSON da execução.
+
+        Deve ser chamado antes de `spark.stop()`, enquanto a UI do Spark
+        ainda responde.
+
+        :param caminho: Caminho do arquivo JSON.
+        :return: Dicionário com o relatório.
+        """
+        etapas = [dict(registro, **self._metricas_etapa(registro)) for registro in self.etapas]
+
+        driver = None
+        for executor in self._consultar_api('executors') or []:
+            if executor.get('id') == 'driver':
+                driver = executor.get('peakMemoryMetrics')
+
+        relatorio = {
+            'aplicacao': self.sc.applicationId if self.sc is not None else 'local',
+            'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.inicio)),
+            'duracao_total_s': round(time.time() - self.inicio, 3),
+            'rss_pico_driver_python_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'memoria_pico_driver_jvm': driver,
+            'etapas': etapas,
+        }
+
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
+        self._registrar('relatorio de execucao gravado em ' + caminho)
+        return relatorio
@@ -0,0 +1,281 @@
+"""
+qualidade.py
+~~~~~~~~~~~~
+
+Módulo com a etapa de qualidade de dados do job. Em vez de descartar em
+silêncio as linhas sem as colunas obrigatórias, a etapa registra, por
+fonte (virus/ano) e por coluna:
+
+- linhas lidas e rejeitadas, com o motivo (coluna obrigatória nula ou
+  com valor que não pôde ser convertido no staging);
+- valores nulos e valores inválidos (códigos de sexo, de idade e de
+  semana epidemiológica fora do dicionário do SINAN);
+- número aproximado de valores distintos (HyperLogLog) e quantis
+  aproximados das colunas numéricas.
+
+As métricas são um único groupBy por virus/ano com um conjunto fixo de
+agregações de memória limitada (esboços de tamanho fixo), de modo que o
+plano não cresce com o número de fontes; só uma linha por fonte chega ao
+driver. O job persiste a extração antes do perfil: o perfil é a única
+leitura do staging, e a quarentena das linhas rejeitadas e o cubo das
+demais leem a extração persistida.
+
+Os caminhos que reprocessam só algumas fontes (modo incremental e fluxo
+contínuo) usam `verificar_fontes`, que perfila só as linhas dessas
+fontes e troca apenas as entradas delas no relatório e as partições
+delas na quarentena.
+"""
+
+import json
+import os
+import shutil
+from functools import reduce
+
+from pyspark.sql import functions as F
+
+from dependencies.esquemas import CODIGOS_SEXO
+from dependencies.idades import decodificar_nu_idade
+
+# Diretório padrão da quarentena e do relatório de qualidade
+DIR_QUALIDADE = 'data/qualidade'
+
+# Nome do relatório de qualidade, no diretório da etapa
+ARQUIVO_RELATORIO = 'relatorio_qualidade.json'
+
+# Colunas perfiladas
+COLUNAS_PERFIL = [
+    'dt_notificacao',
+    'notificacao_ano',
+    'ds_semana_notificacao',
+    'dt_nascimento',
+    'nu_idade',
+    'tp_sexo',
+    'no_bairro_residencia',
+]
+
+# Colunas numéricas com quantis aproximados
+COLUNAS_QUANTIS = ['notificacao_ano', 'ds_semana_notificacao', 'nu_idade']
+
+# Quantis calculados e precisão do percentile_approx
+QUANTIS = [0.05, 0.25, 0.5, 0.75, 0.95]
+PRECISAO_QUANTIS = 1000
+
+# Valores preenchidos fora do dicionário do SINAN: coluna -> expressão
+# verdadeira para um valor não nulo inválido
+VALORES_INVALIDOS = {
+    'tp_sexo': lambda nome: ~F.col(nome).isin(*CODIGOS_SEXO.values()),
+    'nu_idade': lambda nome: decodificar_nu_idade(nome).isNull(),
+    'ds_semana_notificacao': lambda nome: ~(F.col(nome) % 100).between(1, 53),
+    'dt_nascimento': lambda nome: F.col(nome).cast('date').isNull(),
+}
+
+
+def condicao_rejeicao(obrigatorias):
+    """Expressão verdadeira nas linhas com alguma coluna obrigatória nula.
+
+    :param obrigatorias: Colunas obrigatórias.
+    :return: Column booleana.
+    """
+    return reduce(lambda a, b: a | b, [F.col(coluna).isNull() for coluna in obrigatorias])
+
+
+def motivo_rejeicao(obrigatorias):
+    """Expressão com os motivos de rejeição de uma linha (ex.: 'nulo:tp_sexo').
+
+    :param obrigatorias: Colunas obrigatórias.
+    :return: Column de texto, com os motivos separados por vírgula.
+    """
+    return F.concat_ws(',', *[F.when(F.col(coluna).isNull(), F.lit('nulo:' + coluna))
+                              for coluna in obrigatorias])
+
+
+def metricas_qualidade(obrigatorias):
+    """Agregações do perfil de qualidade, calculadas por fonte.
+
+    :param obrigatorias: Colunas obrigatórias.
+    :return: Lista de Column nomeadas '<coluna>/<métrica>' ('*' para as
+        métricas da linha inteira).
+    """
+    metricas = [
+        F.count(F.lit(1)).alias('*/linhas'),
+        F.count(F.when(condicao_rejeicao(obrigatorias), 1)).alias('*/rejeitadas'),
+    ]
+    for nome in COLUNAS_PERFIL:
+        coluna = F.col(nome)
+        metricas.append(F.count(F.when(coluna.isNull(), 1)).alias(nome + '/nulos'))
+        metricas.append(F.approx_count_distinct(coluna).alias(nome + '/distintos'))
+        if nome in VALORES_INVALIDOS:
+            invalido = coluna.isNotNull() & VALORES_INVALIDOS[nome](nome)
+            metricas.append(F.count(F.when(invalido, 1)).alias(nome + '/invalidos'))
+        if nome in COLUNAS_QUANTIS:
+            metricas.append(F.percentile_approx(coluna, QUANTIS, PRECISAO_QUANTIS).alias(nome + '/quantis'))
+    return metricas
+
+
+def perfilar(sdf, obrigatorias):
+    """Calcula o perfil de qualidade por fonte.
+
+    :param sdf: DataFrame Spark com as colunas de extração e `ano`
+        (persistido, já que a quarentena e o cubo também o leem).
+    :param obrigatorias: Colunas obrigatórias.
+    :return: Dicionário montado por `montar_relatorio`.
+    """
+    metricas = {}
+    for linha in sdf.groupBy('virus', 'ano').agg(*metricas_qualidade(obrigatorias)).collect():
+        valores = linha.asDict()
+        prefixo = '%s/%d/' % (valores.pop('virus'), valores.pop('ano'))
+        metricas.update({prefixo + nome: valor for nome, valor in valores.items()})
+    return montar_relatorio(metricas, obrigatorias)
+
+
+def descartar_rejeitadas(sdf, obrigatorias):
+    """Mantém só as linhas com todas as colunas obrigatórias.
+
+    :param sdf: DataFrame Spark.
+    :param obrigatorias: Colunas obrigatórias.
+    :return: DataFrame Spark sem as linhas rejeitadas.
+    """
+    return sdf.filter(~condicao_rejeicao(obrigatorias))
+
+
+def salvar_quarentena(sdf, obrigatorias, caminho, dinamico=False):
+    """Grava as linhas rejeitadas, com o motivo, particionadas por virus/ano.
+
+    :param sdf: DataFrame Spark com as colunas de extração e `ano`.
+    :param obrigatorias: Colunas obrigatórias.
+    :param caminho: Diretório da quarentena.
+    :param dinamico: Se True, só as partições com linhas rejeitadas em
+        `sdf` são trocadas; as demais são mantidas.
+    :return: None
+    """
+    escrita = (sdf
+               .filter(condicao_rejeicao(obrigatorias))
+               .withColumn('motivo', motivo_rejeicao(obrigatorias))
+               .write
+               .mode('overwrite'))
+    if dinamico:
+        escrita = escrita.option('partitionOverwriteMode', 'dynamic')
+    escrita.partitionBy('virus', 'ano').parquet(caminho)
+    return None
+
+
+def montar_relatorio(metricas, obrigatorias):
+    """Organiza as métricas de qualidade por fonte e por coluna.
+
+    :param metricas: Dicionário '<virus>/<ano>/<coluna>/<métrica>' -> valor.
+    :param obrigatorias: Colunas obrigatórias.
+    :return: Dicionário com o total e as fontes ('<virus>/<ano>').
+    """
+    fontes = {}
+    for nome, valor in metricas.items():
+        virus, ano, coluna, metrica = nome.split('/')
+        fonte = fontes.setdefault(virus + '/' + ano, {'colunas': {}})
+        if coluna == '*':
+            fonte[metrica] = valor
+        elif metrica == 'quantis' and valor is not None:
+            fonte['colunas'].setdefault(coluna, {})[metrica] = list(valor)
+        else:
+            fonte['colunas'].setdefault(coluna, {})[metrica] = valor
+
+    for fonte in fontes.values():
+        fonte['motivos'] = {'nulo:' + coluna: fonte['colunas'][coluna]['nulos']
+                            for coluna in obrigatorias if coluna in fonte['colunas']}
+
+    return totalizar_relatorio(fontes)
+
+
+def totalizar_relatorio(fontes):
+    """Monta o relatório de qualidade a partir das entradas por fonte.
+
+    :param fontes: Dicionário '<virus>/<ano>' -> métricas da fonte.
+    :return: Dicionário com o total e as fontes.
+    """
+    return {
+        'linhas': sum(fonte['linhas'] for fonte in fontes.values()),
+        'rejeitadas': sum(fonte['rejeitadas'] for fonte in fontes.values()),
+        'quantis': QUANTIS,
+        'fontes': fontes,
+    }
+
+
+def salvar_relatorio_qualidade(relatorio, dir_qualidade=DIR_QUALIDADE):
+    """Grava o relatório de qualidade de forma atômica.
+
+    :param relatorio: Dicionário montado por `montar_relatorio`.
+    :param dir_qualidade: Diretório da etapa de qualidade.
+    :return: None
+    """
+    os.makedirs(dir_qualidade, exist_ok=True)
+    caminho = os.path.join(dir_qualidade, ARQUIVO_RELATORIO)
+    with open(caminho + '.tmp', 'w') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+    return None
+
+
+def carregar_relatorio_qualidade(dir_qualidade=DIR_QUALIDADE):
+    """Lê o relatório de qualidade gravado.
+
+    :param dir_qualidade: Diretório da etapa de qualidade.
+    :return: Dicionário montado por `montar_relatorio` ou None se ainda
+        não existir.
+    """
+    caminho = os.path.join(dir_qualidade, ARQUIVO_RELATORIO)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r') as arquivo:
+        return json.load(arquivo)
+
+
+def verificar_fontes(sdf, fontes, vigentes=None, obrigatorias=(), dir_qualidade=DIR_QUALIDADE):
+    """Perfila e põe em quarentena só as linhas de algumas fontes.
+
+    As entradas do relatório e as partições da quarentena das fontes
+    reprocessadas são trocadas pelas novas (uma fonte sem linhas
+    rejeitadas perde sua partição); as das fontes fora de `vigentes` são
+    descartadas e as das demais fontes, mantidas.
+
+    :param sdf: DataFrame Spark com as colunas de extração e `ano`, só com
+        as linhas das fontes reprocessadas (persistido), ou None quando
+        nenhuma fonte foi reprocessada.
+    :param fontes: Lista de tuplas (virus, ano) reprocessadas.
+    :param vigentes: Lista de tuplas (virus, ano) das fontes existentes
+        (None mantém todas as não reprocessadas).
+    :param obrigatorias: Colunas obrigatórias.
+    :param dir_qualidade: Diretório da etapa de qualidade.
+    :return: DataFrame Spark sem as linhas rejeitadas (None se `sdf` for
+        None).
+    """
+    parcial = perfilar(sdf, obrigatorias)['fontes'] if sdf is not None else {}
+    reprocessadas = {'%s/%d' % fonte for fonte in fontes}
+    existentes = {'%s/%d' % fonte for fonte in vigentes} if vigentes is not None else None
+
+    anterior = carregar_relatorio_qualidade(dir_qualidade) or {'fontes': {}}
+    entradas = {nome: fonte for nome, fonte in anterior['fontes'].items()
+                if nome not in reprocessadas and (existentes is None or nome in existentes)}
+    entradas.update(parcial)
+    relatorio = totalizar_relatorio(entradas)
+    salvar_relatorio_qualidade(relatorio, dir_qualidade)
+
+    caminho = os.path.join(dir_qualidade, 'quarentena')
+    if sdf is not None:
+        salvar_quarentena(sdf, obrigatorias, caminho, dinamico=True)
+    particoes = [(nome_virus, nome_ano)
+                 for nome_virus in (os.listdir(caminho) if os.path.isdir(caminho) else [])
+                 if nome_virus.startswith('virus=')
+                 for nome_ano in os.listdir(os.path.join(caminho, nome_virus))]
+    for nome_virus, nome_ano in particoes:
+        nome = '%s/%s' % (nome_virus[len('virus='):], nome_ano[len('ano='):])
+        if nome in reprocessadas:
+            remover = not parcial.get(nome, {}).get('rejeitadas')
+        else:
+            remover = existentes is not None and nome not in existentes
+        if remover:
+            shutil.rmtree(os.path.join(caminho, nome_virus, nome_ano))
+            if not os.listdir(os.path.join(caminho, nome_virus)):
+                os.rmdir(os.path.join(caminho, nome_virus))
+
+    if sdf is None:
+        return None
+    return descartar_rejeitadas(sdf, obrigatorias)
+
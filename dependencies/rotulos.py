@@ -0,0 +1,90 @@
+"""
+rotulos.py
+~~~~~~~~~~
+
+Módulo com os mapeamentos código -> rótulo usados pelo job (meses,
+trimestres e sexo). Os dicionários são definidos uma única vez e
+compilados em expressões nativas do Spark (mapas literais), evitando
+UDFs Python que serializam cada linha para os workers.
+"""
+
+from itertools import chain
+
+from pyspark.sql import functions as F
+
+# Mapeamento de números para nomes de meses
+MESES = {
+    1: "Janeiro",
+    2: "Fevereiro",
+    3: "Março",
+    4: "Abril",
+    5: "Maio",
+    6: "Junho",
+    7: "Julho",
+    8: "Agosto",
+    9: "Setembro",
+    10: "Outubro",
+    11: "Novembro",
+    12: "Dezembro"
+}
+
+# Mapeamento de números para os trimestres
+TRIMESTRES = {
+    1: "Q1",
+    2: "Q2",
+    3: "Q3",
+    4: "Q4"
+}
+
+# Mapeamento dos códigos de sexo do SINAN
+SEXOS = {
+    "I": "NÃO INFORMADO",
+    "M": "MASCULINO",
+    "F": "FEMININO"
+}
+
+
+def inverter(mapa):
+    """Índice reverso rótulo -> código de um mapeamento.
+
+    :param mapa: Dicionário código -> rótulo.
+    :return: Dicionário rótulo -> código.
+    """
+    return {rotulo: codigo for codigo, rotulo in mapa.items()}
+
+
+def mapa_literal(mapa):
+    """Compila um dicionário em um mapa literal do Spark.
+
+    :param mapa: Dicionário chave -> valor.
+    :return: Column do tipo map.
+    """
+    return F.create_map(*[F.lit(valor) for valor in chain(*mapa.items())])
+
+
+def rotular(mapa, coluna):
+    """Expressão que troca os códigos de uma coluna pelos rótulos.
+
+    Códigos fora do mapeamento resultam em nulo.
+
+    :param mapa: Dicionário código -> rótulo (ex.: `MESES`).
+    :param coluna: Nome da coluna ou Column com os códigos.
+    :return: Column com os rótulos.
+    """
+    coluna = F.col(coluna) if isinstance(coluna, str) else coluna
+    return mapa_literal(mapa)[coluna]
+
+
+def codificar(mapa, coluna):
+    """Expressão que volta dos rótulos para os códigos do mapeamento.
+
+    Usada para codificar o vírus e o sexo das linhas extraídas (ver
+    `dependencies.esquemas.codificar_dimensoes`); valores fora do
+    mapeamento viram nulos.
+
+    :param mapa: Dicionário código -> rótulo (ex.: `MESES`).
+    :param coluna: Nome da coluna ou Column com os rótulos.
+    :return: Column com os códigos.
+    """
+    coluna = F.col(coluna) if isinstance(coluna, str) else coluna
+    return mapa_literal(inverter(mapa))[coluna]
@@ -0,0 +1,316 @@
+"""
+semanas.py
+~~~~~~~~~~
+
+Módulo com as séries semanais de incidência por semana epidemiológica
+(`ds_semana_notificacao`, no formato aaaass). As séries são derivadas do
+cubo de agregação, por vírus e bairro e para o município inteiro, e
+calculadas no Spark com funções de janela:
+
+- média móvel dos casos nas últimas semanas;
+- canal endêmico: média e desvio padrão dos casos da mesma semana do
+  ano nos anos anteriores, com o limite superior média + Z desvios;
+- alerta quando os casos da semana passam o limite superior.
+
+As semanas sem casos de um vírus/bairro entram com zero, a partir de um
+calendário contínuo de semanas epidemiológicas entre a primeira e a
+última semana dos dados (a semana 1 começa no domingo da semana que
+contém 4 de janeiro, de modo que um ano tem 52 ou 53 semanas). O resultado é gravado em
+Parquet particionado pelo ano da semana; a cada execução só os anos a
+partir da primeira semana alterada são regravados, e os anos que saíram
+das séries são descartados.
+"""
+
+import os
+import shutil
+from datetime import date, timedelta
+
+from pyspark import StorageLevel
+from pyspark.sql import Window
+from pyspark.sql import functions as F
+
+# Diretórios das séries semanais e da tabela de alertas
+CAMINHO_SEMANAS = 'data/agregados/semanas'
+CAMINHO_ALERTAS = 'data/agregados/alertas'
+
+# Bairro usado nas séries do município inteiro
+BAIRRO_TODOS = 'TODOS'
+
+# Número de semanas da média móvel
+SEMANAS_MEDIA_MOVEL = 4
+
+# Número de desvios padrão acima da média histórica do canal endêmico
+DESVIOS_CANAL = 2.0
+
+# Anos anteriores necessários para que a semana tenha canal endêmico
+ANOS_MINIMOS_CANAL = 2
+
+# Casos mínimos na semana para emitir um alerta
+CASOS_MINIMOS_ALERTA = 3
+
+# Chave de uma linha das séries
+CHAVE_SEMANA = ['virus', 'no_bairro_residencia', 'notificacao_semana']
+
+
+def inicio_semanas(ano):
+    """Data de início da semana epidemiológica 1 de um ano.
+
+    :param ano: Ano (int ou coluna Spark).
+    :return: date ou coluna Spark com o domingo da semana de 4 de janeiro.
+    """
+    if isinstance(ano, int):
+        quatro_janeiro = date(ano, 1, 4)
+        return quatro_janeiro - timedelta(days=(quatro_janeiro.weekday() + 1) % 7)
+    quatro_janeiro = F.make_date(ano, F.lit(1), F.lit(4))
+    return F.date_sub(quatro_janeiro, F.dayofweek(quatro_janeiro) - 1)
+
+
+def semanas_no_ano(ano):
+    """Número de semanas epidemiológicas de um ano (52 ou 53).
+
+    :param ano: Ano (int ou coluna Spark).
+    :return: int ou coluna Spark.
+    """
+    if isinstance(ano, int):
+        return (inicio_semanas(ano + 1) - inicio_semanas(ano)).days // 7
+    return (F.datediff(inicio_semanas(ano + 1), inicio_semanas(ano)) / 7).cast('int')
+
+
+def semana_epidemiologica(data):
+    """Semana epidemiológica (aaaass) de uma data.
+
+    A semana vai de domingo a sábado e pertence ao ano da sua quarta-feira
+    (o da semana de 4 de janeiro); o número conta a partir de
+    `inicio_semanas` desse ano.
+
+    :param data: date ou coluna Spark de data.
+    :return: int ou coluna Spark.
+    """
+    if isinstance(data, date):
+        ano = (data + timedelta(days=3 - (data.weekday() + 1) % 7)).year
+        return ano * 100 + (data - inicio_semanas(ano)).days // 7 + 1
+    ano = F.year(F.date_add(F.date_sub(data, F.dayofweek(data) - 1), 3))
+    return (ano * 100 + F.floor(F.datediff(data, inicio_semanas(ano)) / 7) + 1).cast('int')
+
+
+def calendario_semanas(inicio, fim):
+    """Semanas epidemiológicas (aaaass) de `inicio` a `fim`, inclusive.
+
+    :param inicio: Primeira semana.
+    :param fim: Última semana.
+    :return: Lista de semanas em ordem.
+    """
+    return [ano * 100 + semana
+            for ano in range(inicio // 100, fim // 100 + 1)
+            for semana in range(1, semanas_no_ano(ano) + 1)
+            if inicio <= ano * 100 + semana <= fim]
+
+
+def calendario_semanas_spark(semanal):
+    """Calendário de semanas entre a primeira e a última semana de um DataFrame.
+
+    Equivale a `calendario_semanas`, sem coletar os limites. Semanas dos
+    dados fora do calendário (ex.: semana 53 em um ano de 52) são mantidas.
+
+    :param semanal: DataFrame Spark com a coluna `notificacao_semana`.
+    :return: DataFrame Spark com a coluna `notificacao_semana`.
+    """
+    limites = semanal.agg(F.min('notificacao_semana').alias('inicio'),
+                          F.max('notificacao_semana').alias('fim'))
+    ano = (F.col('inicio') / 100).cast('int')
+    anos = limites.select('inicio', 'fim', F.explode(F.sequence(ano, (F.col('fim') / 100).cast('int'))).alias('ano'))
+    semanas = F.explode(F.sequence(F.lit(1), semanas_no_ano(F.col('ano')))).alias('semana')
+    return (anos
+            .select('inicio', 'fim', 'ano', semanas)
+            .withColumn('notificacao_semana', (F.col('ano') * 100 + F.col('semana')).cast('int'))
+            .filter(F.col('notificacao_semana').between(F.col('inicio'), F.col('fim')))
+            .select('notificacao_semana')
+            .unionByName(semanal.select('notificacao_semana'))
+            .distinct())
+
+
+def casos_semanais(cubo, calendario=None):
+    """Soma os casos do cubo por vírus, bairro e semana, com zeros.
+
+    Inclui o total do município (bairro `BAIRRO_TODOS`) e preenche com
+    zero as semanas do calendário epidemiológico, da primeira à última
+    semana dos dados, sem casos de cada vírus/bairro.
+
+    :param cubo: DataFrame Spark com o cubo de agregação.
+    :param calendario: Calendário de `calendario_semanas_spark` (padrão:
+        o do próprio cubo); com um cubo restrito a alguns vírus, o do
+        cubo inteiro mantém as séries iguais às calculadas sobre ele.
+    :return: DataFrame Spark com a chave, `ano`, `semana_ano` e `casos`.
+    """
+    por_bairro = (cubo
+                  .filter(F.col('notificacao_semana').isNotNull())
+                  .groupBy(*CHAVE_SEMANA)
+                  .agg(F.sum('quantidade').alias('casos')))
+    municipio = (por_bairro
+                 .groupBy('virus', 'notificacao_semana')
+                 .agg(F.sum('casos').alias('casos'))
+                 .withColumn('no_bairro_residencia', F.lit(BAIRRO_TODOS)))
+    semanal = por_bairro.unionByName(municipio)
+
+    if calendario is None:
+        calendario = calendario_semanas_spark(semanal)
+    grade = (semanal
+             .select('virus', 'no_bairro_residencia')
+             .distinct()
+             .crossJoin(F.broadcast(calendario)))
+
+    return (grade
+            .join(semanal, CHAVE_SEMANA, 'left')
+            .fillna(0, ['casos'])
+            .withColumn('ano', (F.col('notificacao_semana') / 100).cast('int'))
+            .withColumn('semana_ano', (F.col('notificacao_semana') % 100).cast('int')))
+
+
+def calcular_series(cubo, semanas_media=SEMANAS_MEDIA_MOVEL, desvios=DESVIOS_CANAL,
+                    anos_minimos=ANOS_MINIMOS_CANAL, casos_minimos=CASOS_MINIMOS_ALERTA, calendario=None):
+    """Calcula as séries semanais com média móvel, canal endêmico e alerta.
+
+    :param cubo: DataFrame Spark com o cubo de agregação.
+    :param semanas_media: Número de semanas da média móvel.
+    :param desvios: Desvios padrão acima da média do canal endêmico.
+    :param anos_minimos: Anos anteriores exigidos pelo canal endêmico.
+    :param casos_minimos: Casos mínimos na semana para emitir alerta.
+    :param calendario: Calendário de semanas (ver `casos_semanais`).
+    :return: DataFrame Spark com uma linha por vírus, bairro e semana.
+    """
+    serie = Window.partitionBy('virus', 'no_bairro_residencia').orderBy('notificacao_semana')
+    mesma_semana = (Window
+                    .partitionBy('virus', 'no_bairro_residencia', 'semana_ano')
+                    .orderBy('ano')
+                    .rowsBetween(Window.unboundedPreceding, -1))
+
+    series = (casos_semanais(cubo, calendario)
+              .withColumn('media_movel', F.avg('casos').over(serie.rowsBetween(1 - semanas_media, 0)))
+              .withColumn('anos_base', F.count('casos').over(mesma_semana))
+              .withColumn('media_historica', F.avg('casos').over(mesma_semana))
+              .withColumn('desvio_historico', F.stddev_samp('casos').over(mesma_semana))
+              .withColumn('limite_superior',
+                          F.col('media_historica') + desvios * F.coalesce(F.col('desvio_historico'), F.lit(0.0))))
+
+    alerta = ((F.col('anos_base') >= anos_minimos)
+              & (F.col('casos') >= casos_minimos)
+              & (F.col('casos') > F.col('limite_superior')))
+    return series.withColumn('alerta', alerta)
+
+
+def anos_alterados(series, anterior):
+    """Anos a regravar: a partir do primeiro ano com casos diferentes.
+
+    A média móvel atravessa a virada do ano e o canal endêmico usa os
+    anos anteriores, então todos os anos seguintes também mudam.
+
+    :param series: DataFrame Spark com as séries novas.
+    :param anterior: DataFrame Spark com as séries gravadas (ou None).
+    :return: Lista com os anos a regravar (vazia se nada mudou).
+    """
+    anos = sorted(linha['ano'] for linha in series.select('ano').distinct().collect())
+    if anterior is None:
+        return anos
+
+    diferencas = (series.select(*CHAVE_SEMANA, 'ano', 'casos')
+                  .join(anterior.select(*CHAVE_SEMANA, F.col('ano').alias('ano_anterior'),
+                                        F.col('casos').alias('casos_anterior')),
+                        CHAVE_SEMANA, 'full_outer')
+                  .filter(~F.col('casos').eqNullSafe(F.col('casos_anterior')))
+                  .agg(F.min(F.coalesce('ano', 'ano_anterior')).alias('ano'))
+                  .first()['ano'])
+    if diferencas is None:
+        return []
+    return [ano for ano in anos if ano >= diferencas]
+
+
+def anos_gravados(caminho):
+    """Anos das partições de um dataset particionado por ano.
+
+    :param caminho: Diretório do dataset.
+    :return: Conjunto de anos (vazio se o dataset não existir).
+    """
+    if not os.path.isdir(caminho):
+        return set()
+    return {int(nome[len('ano='):]) for nome in os.listdir(caminho) if nome.startswith('ano=')}
+
+
+def trocar_anos(caminho, temporario, manter):
+    """Troca um dataset particionado por ano pela versão gravada em `temporario`.
+
+    As partições dos anos mantidos são movidas do dataset atual para o
+    temporário antes da troca; as dos demais anos (regravados ou que não
+    existem mais) são descartadas com o dataset atual.
+
+    :param caminho: Diretório do dataset.
+    :param temporario: Diretório com as partições regravadas.
+    :param manter: Anos cujas partições atuais são mantidas.
+    :return: None
+    """
+    os.makedirs(temporario, exist_ok=True)
+    for ano in anos_gravados(caminho) & set(manter):
+        particao = 'ano=%d' % ano
+        os.rename(os.path.join(caminho, particao), os.path.join(temporario, particao))
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+    os.rename(temporario, caminho)
+    return None
+
+
+def gravar_anos(sdf, caminho, anos, manter):
+    """Regrava as partições de alguns anos de um dataset particionado por ano.
+
+    Os anos regravados vão para um diretório temporário, que só então
+    substitui o dataset (ver `trocar_anos`): uma falha na escrita não deixa
+    o dataset pela metade. Partições fora de `anos` e de `manter` (ex.: de
+    anos que saíram das séries, ou sem alertas) são descartadas.
+
+    :param sdf: DataFrame Spark com a coluna `ano`.
+    :param caminho: Diretório do dataset.
+    :param anos: Anos regravados.
+    :param manter: Anos cujas partições atuais são mantidas.
+    :return: None
+    """
+    temporario = caminho + '.tmp'
+    if os.path.isdir(temporario):
+        shutil.rmtree(temporario)
+    if anos:
+        (sdf
+         .filter(F.col('ano').isin(anos))
+         .repartition('ano')
+         .write
+         .mode('overwrite')
+         .partitionBy('ano')
+         .parquet(temporario))
+    trocar_anos(caminho, temporario, manter)
+    return None
+
+
+def salvar_series(spark, series, caminho_semanas=CAMINHO_SEMANAS, caminho_alertas=CAMINHO_ALERTAS,
+                  virus=None):
+    """Atualiza o armazenamento das séries semanais e da tabela de alertas.
+
+    :param spark: SparkSession.
+    :param series: DataFrame Spark retornado por `calcular_series`.
+    :param caminho_semanas: Diretório das séries.
+    :param caminho_alertas: Diretório dos alertas.
+    :param virus: Vírus de `series` (None para todos); as séries gravadas
+        dos demais vírus são mantidas.
+    :return: Lista com os anos regravados.
+    """
+    anterior = spark.read.parquet(caminho_semanas) if os.path.isdir(caminho_semanas) else None
+    if virus is not None and anterior is not None:
+        # As séries gravadas dos demais vírus são copiadas (o checkpoint
+        # local corta a leitura dos arquivos que serão trocados)
+        series = series.unionByName(anterior.filter(~F.col('virus').isin(*virus))).localCheckpoint()
+    series = series.persist(StorageLevel.MEMORY_AND_DISK)
+    anos = anos_alterados(series, anterior)
+
+    # Anos gravados que saíram das séries (ex.: fontes removidas) também são descartados
+    anos_series = {linha['ano'] for linha in series.select('ano').distinct().collect()}
+    if anos or anos_gravados(caminho_semanas) - anos_series:
+        manter = anos_series - set(anos)
+        gravar_anos(series, caminho_semanas, anos, manter)
+        gravar_anos(series.filter(F.col('alerta')), caminho_alertas, anos, manter)
+    series.unpersist()
+    return anos
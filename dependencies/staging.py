@@ -0,0 +1,179 @@
+"""
+staging.py
+~~~~~~~~~~
+
+Módulo com a camada de staging colunar (Parquet) dos CSVs brutos do
+SINAN. Cada fonte declarada em `dependencies.fontes` é convertida uma
+única vez para um dataset Parquet tipado e particionado por virus/ano;
+execuções seguintes só reconvertem os arquivos que mudaram.
+
+Os CSVs são lidos com o esquema explícito do cabeçalho (sem inferência)
+e só as colunas do registro de `dependencies.esquemas` são gravadas.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from pyspark.sql import functions as F
+
+from dependencies.esquemas import COLUNAS_STAGING, esquema_csv, ler_cabecalho, projetar
+from dependencies.fontes import descobrir_fontes
+
+# Arquivo com o estado da conversão (ignorado pelo leitor de Parquet
+# por começar com '_')
+ARQUIVO_MANIFESTO = '_manifesto.json'
+
+# Extrai o ano do caminho completo do arquivo lido pelo Spark
+PADRAO_ANO_ARQUIVO = r'_(\d{4})_[a-z_]+\.csv$'
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 do conteúdo de um arquivo.
+
+    :param caminho: Caminho do arquivo.
+    :param tamanho_bloco: Tamanho dos blocos lidos por vez.
+    :return: Hash hexadecimal do conteúdo.
+    """
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def carregar_manifesto(dir_staging):
+    """Lê o manifesto de conversão do staging.
+
+    :param dir_staging: Diretório do dataset Parquet.
+    :return: Dicionário nome do arquivo -> registro da última conversão.
+    """
+    caminho = os.path.join(dir_staging, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, 'r') as arquivo:
+        return json.load(arquivo)
+
+
+def salvar_manifesto(dir_staging, manifesto):
+    """Grava o manifesto de conversão de forma atômica.
+
+    :param dir_staging: Diretório do dataset Parquet.
+    :param manifesto: Dicionário nome do arquivo -> registro.
+    :return: None
+    """
+    os.makedirs(dir_staging, exist_ok=True)
+    caminho = os.path.join(dir_staging, ARQUIVO_MANIFESTO)
+    with open(caminho + '.tmp', 'w') as arquivo:
+        json.dump(manifesto, arquivo, indent=2, sort_keys=True)
+    os.replace(caminho + '.tmp', caminho)
+    return None
+
+
+def detectar_alteracao(fonte, registro):
+    """Verifica se uma fonte bruta mudou desde a última conversão.
+
+    Tamanho e data de modificação são comparados primeiro; o hash do
+    conteúdo só é calculado quando um deles diverge, de modo que um
+    `touch` ou uma cópia idêntica não disparam a reconversão. Uma mudança
+    nos apelidos de colunas declarados no manifesto ou nas colunas do
+    registro de esquemas também reconverte.
+
+    :param fonte: Fonte descoberta por `descobrir_fontes`.
+    :param registro: Registro da última conversão (ou None).
+    :return: Tupla (alterado, registro atualizado).
+    """
+    stat = os.stat(fonte['caminho'])
+    atual = {'tamanho': stat.st_size, 'mtime': stat.st_mtime,
+             'apelidos': fonte['apelidos'],
+             'colunas': [campo.name for campo in COLUNAS_STAGING]}
+
+    if registro and all(registro.get(k) == v for k, v in atual.items()):
+        return False, registro
+
+    atual['sha256'] = hash_arquivo(fonte['caminho'])
+    if (registro and registro.get('sha256') == atual['sha256']
+            and registro.get('apelidos') == atual['apelidos']
+            and registro.get('colunas') == atual['colunas']):
+        return False, dict(registro, **atual)
+
+    return True, atual
+
+
+def converter_fontes(spark, fontes, dir_staging):
+    """Converte um grupo de fontes com o mesmo cabeçalho em uma única leitura.
+
+    Os arquivos do grupo são lidos juntos com o esquema explícito do
+    cabeçalho e reduzidos às colunas registradas; `virus` vem do
+    manifesto e `ano` do nome do arquivo. A escrita usa sobrescrita
+    dinâmica de partições, substituindo apenas as partições virus/ano das
+    fontes convertidas.
+
+    :param spark: SparkSession.
+    :param fontes: Lista de fontes de uma mesma doença e mesmo cabeçalho.
+    :param dir_staging: Diretório do dataset Parquet.
+    :return: None
+    """
+    sdf = (spark
+           .read
+           .schema(esquema_csv(ler_cabecalho(fontes[0]['caminho'])))
+           .csv([fonte['caminho'] for fonte in fontes], sep=';', header=True))
+
+    sdf = (projetar(sdf, fontes[0]['apelidos'])
+           .withColumn('virus', F.lit(fontes[0]['virus']))
+           .withColumn('ano', F.regexp_extract(F.input_file_name(), PADRAO_ANO_ARQUIVO, 1).cast('int')))
+
+    (sdf
+     .write
+     .mode('overwrite')
+     .option('partitionOverwriteMode', 'dynamic')
+     .partitionBy('virus', 'ano')
+     .parquet(dir_staging))
+    return None
+
+
+def preparar_staging(spark, dir_raw='data/raw', dir_staging='data/staging', fontes=None):
+    """Sincroniza o dataset Parquet de staging com os CSVs brutos.
+
+    Converte as fontes novas ou alteradas (uma leitura por doença e
+    cabeçalho, já que o esquema é aplicado por posição), remove as
+    partições cuja fonte deixou de existir e atualiza o manifesto.
+
+    :param spark: SparkSession.
+    :param dir_raw: Diretório dos CSVs brutos.
+    :param dir_staging: Diretório do dataset Parquet.
+    :param fontes: Fontes mantidas no staging (padrão:
+        `descobrir_fontes(dir_raw)`); as partições de outras são removidas.
+    :return: Lista com os nomes dos arquivos reconvertidos.
+    """
+    manifesto = carregar_manifesto(dir_staging)
+    novo_manifesto = {}
+    pendentes = {}
+
+    if fontes is None:
+        fontes = descobrir_fontes(dir_raw)
+    for fonte in fontes:
+        particao = os.path.join(dir_staging, 'virus=' + fonte['virus'], 'ano=' + str(fonte['ano']))
+
+        alterado, registro = detectar_alteracao(fonte, manifesto.get(fonte['nome']))
+        if alterado or not os.path.isdir(particao):
+            grupo = (fonte['doenca'], tuple(ler_cabecalho(fonte['caminho'])))
+            pendentes.setdefault(grupo, []).append(fonte)
+
+        novo_manifesto[fonte['nome']] = dict(
+            registro, virus=fonte['virus'], ano=fonte['ano'], particao=particao)
+
+    for fontes in pendentes.values():
+        converter_fontes(spark, fontes, dir_staging)
+
+    # Remove partições de arquivos que saíram do diretório bruto
+    for nome, registro in manifesto.items():
+        if nome not in novo_manifesto and os.path.isdir(registro['particao']):
+            shutil.rmtree(registro['particao'])
+            pasta_virus = os.path.dirname(registro['particao'])
+            if not os.listdir(pasta_virus):
+                os.rmdir(pasta_virus)
+
+    salvar_manifesto(dir_staging, novo_manifesto)
+    return sorted(fonte['nome'] for fontes in pendentes.values() for fonte in fontes)
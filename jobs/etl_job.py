@@ -8,116 +8,340 @@ Script para execução do job Spark:
 
 $SPARK_HOME/bin/spark-submit --master local[*] --py-files packages.zip $HOME/projects/pyspark-virus-mosquito-analysis/jobs/etl_job.py
 
-"""
-
-from pyspark import SparkContext
-import pyspark.pandas as pspd
-from pyspark.sql.functions import year
-import matplotlib.pyplot as plt
+A configuração do job (AQE e particionamento) é enviada com `--files`:
+    $SPARK_HOME/bin/spark-submit --master local[*] --py-files packages.zip \
+        --files configs/etl_config.json jobs/etl_job.py
 
+Entradas pequenas usam o motor local (pyarrow/pandas, sem JVM); o motor
+pode ser forçado com `--motor spark` ou `--motor local`:
+    PYTHONPATH=. python jobs/etl_job.py --motor local
 
-def main():
-    spark = SparkContext(appName="my_etl_job")
+Se os CSVs brutos, as tabelas de correção e o código não mudaram desde a
+última execução, o cubo e as análises vêm do cache de resultados em
+`data/cache`, sem extração nem transformação; `--sem-cache` o ignora.
 
-    # Execução do pipeline ETL
-    data = extract_data(spark)
+As linhas rejeitadas (sem alguma coluna obrigatória) vão para a
+quarentena em `data/qualidade/quarentena`, e o perfil de qualidade de
+cada fonte (nulos, inválidos, distintos e quantis por coluna) para
+`data/qualidade/relatorio_qualidade.json`.
 
-    psdf = transform_data(data)
-
-    # Análise 1: Distribuição de casos ao longo dos anos
-    load_plot_1(psdf)
-    # Análise 2: Identificação dos meses com maior incidência de casos
-    load_plot_2(psdf)
-    # Análise 3: Comparação de casos entre os diferentes vírus ao longo dos anos
-    load_plot_3(psdf)
-    # Analise 4: Distribuição de casos por faixa etária
-    load_plot_4(psdf)        
-    # Analise 5: Comparar a distribuição de casos por sexo (tp_sexo) e vírus.
-    load_plot_5(psdf)
-    #Análise 6: Agrupar os dados pelo nome do bairro e verificar a distribuição de casos em cada bairro 
-    load_plot_6(psdf)    
+Outro município (ou um recorte de anos e vírus) é processado com
+`--cidade`, `--anos` e `--virus`, com as saídas em `data/cidades/<destino>`;
+vários destinos em paralelo sobre uma única SparkSession são processados
+por `jobs/orquestrador_job.py`.
 
+"""
 
-    spark.stop()
+import argparse
+import os
+import sys
+from functools import partial
+
+from pyspark import StorageLevel
+from pyspark.sql import functions as F
+
+from dependencies.agregacao import construir_cubo, salvar_cubo, somar
+from dependencies.cache import Cache, gravar_chave_cubo, impressao, ler_chave_cubo, tabelas_correcao, versao_codigo
+from dependencies.destinos import CIDADE_PADRAO, caminhos, caminhos_destino, destino, nome_destino
+from dependencies.esquemas import ESQUEMA_STAGING, codificar_dimensoes
+from dependencies.fontes import descobrir_fontes
+from dependencies.graficos import grafico, renderizar
+from dependencies.idades import FAIXAS_ETARIAS, calcular_idade, inicio_faixa
+from dependencies.incremental import atualizar_incremental, invalidar_estado
+from dependencies.motor_local import (LIMITE_BYTES_LOCAL, MOTORES, calcular_series_local, construir_cubo_local,
+                                      escolher_motor, extrair_local, perfilar_local, salvar_cubo_local,
+                                      salvar_quarentena_local, salvar_series_local, transformar_local)
+from dependencies.particionamento import ajustar_particoes, aplicar_configuracao, repartir_por_fonte, tamanho_fontes
+from dependencies.perfil import Perfil
+from dependencies.qualidade import (carregar_relatorio_qualidade, descartar_rejeitadas, perfilar, salvar_quarentena,
+                                    salvar_relatorio_qualidade, verificar_fontes)
+from dependencies.rotulos import MESES, SEXOS, inverter
+from dependencies.semanas import calcular_series, salvar_series
+from dependencies.spark import start_spark
+from dependencies.staging import preparar_staging
+
+# Colunas dos extratos do SINAN usadas pelo job
+COLUNAS_EXTRACAO = ['dt_notificacao', 'notificacao_ano', 'ds_semana_notificacao', 'dt_nascimento', 'nu_idade', 'tp_sexo', 'no_bairro_residencia', 'virus']
+
+# Colunas obrigatórias: a idade tem fallback entre nu_idade e dt_nascimento
+COLUNAS_OBRIGATORIAS = ['dt_notificacao', 'notificacao_ano', 'tp_sexo', 'no_bairro_residencia', 'virus']
+
+# Gráficos gerados por vírus: sufixo do arquivo, nome no título e cores das barras por sexo
+GRAFICOS_POR_VIRUS = {
+    'CHIKUNGUNYA': ('chikun', 'Chikungunya', ['lightcoral', 'lightgreen', 'skyblue']),
+    'DENGUE': ('dengue', 'Dengue', ['lightcoral', 'lightgreen', 'skyblue']),
+    'ZIKA': ('zika', 'Zika', ['skyblue', 'lightcoral']),
+}
+
+
+def main(incremental=False, motor='auto', limite_local=LIMITE_BYTES_LOCAL, usar_cache=True,
+         cidade=CIDADE_PADRAO, anos=None, virus=None):
+    alvo = destino(cidade, anos, virus)
+    # O destino padrão mantém o layout original em data/; os demais têm
+    # diretórios próprios, como os do orquestrador
+    dirs = caminhos() if alvo == destino() else caminhos_destino(alvo)
+    executar(alvo, dirs, incremental, motor, limite_local, usar_cache)
     return None
 
 
-def extract_data(spark):
-    psdf_dengue_2019 = pspd.read_csv('data/raw/dengue_2019_recife.csv', sep=';')
-    psdf_dengue_2020 = pspd.read_csv('data/raw/dengue_2020_recife.csv', sep=';')
-    psdf_dengue_2021 = pspd.read_csv('data/raw/dengue_2021_recife.csv', sep=';')
-
-    psdf_chikun_2019 = pspd.read_csv('data/raw/chikungunya_2019_recife.csv', sep=';')
-    psdf_chikun_2020 = pspd.read_csv('data/raw/chikungunya_2020_recife.csv', sep=';')
-    psdf_chikun_2021 = pspd.read_csv('data/raw/chikungunya_2021_recife.csv', sep=';')
-
-    psdf_zika_2019 = pspd.read_csv('data/raw/zika_2019_recife.csv', sep=';')
-    psdf_zika_2020 = pspd.read_csv('data/raw/zika_2020_recife.csv', sep=';')
-    psdf_zika_2021 = pspd.read_csv('data/raw/zika_2021_recife.csv', sep=';')
-
-    psdf_dengue_2019['virus']='DENGUE'
-    psdf_dengue_2020['virus']='DENGUE'
-    psdf_dengue_2021['virus']='DENGUE'
-    psdf_chikun_2019['virus']='CHIKUNGUNYA'
-    psdf_chikun_2020['virus']='CHIKUNGUNYA'
-    psdf_chikun_2021['virus']='CHIKUNGUNYA'    
-    psdf_zika_2019.rename(columns={"ano_notificacao": "notificacao_ano"}, inplace=True)
-    psdf_zika_2019['virus']='ZIKA'
-    psdf_zika_2020.rename(columns={"ano_notificacao": "notificacao_ano"}, inplace=True)
-    psdf_zika_2020['virus']='ZIKA'
-    psdf_zika_2021.rename(columns={"ano_notificacao": "notificacao_ano"}, inplace=True)
-    psdf_zika_2021['virus']='ZIKA'
-
-    psdf_dengue_2019 = psdf_dengue_2019[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia','virus']]
-    psdf_dengue_2020 = psdf_dengue_2020[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-    psdf_dengue_2021 = psdf_dengue_2021[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-    psdf_chikun_2019 = psdf_chikun_2019[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-    psdf_chikun_2020 = psdf_chikun_2020[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-    psdf_chikun_2021 = psdf_chikun_2021[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-    psdf_zika_2019 = psdf_zika_2019[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-    psdf_zika_2020 = psdf_zika_2020[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-    psdf_zika_2021 = psdf_zika_2021[['dt_notificacao', 'notificacao_ano', 'dt_nascimento', 'tp_sexo', 'no_bairro_residencia', 'virus']]
-
-    psdf = pspd.concat([psdf_dengue_2019,psdf_chikun_2019,psdf_zika_2019, psdf_dengue_2020,psdf_chikun_2020,psdf_zika_2020, psdf_dengue_2021,psdf_chikun_2021,psdf_zika_2021])
-
-    return psdf
-
-
-def transform_data(df):
-    psdf = df.dropna()
-
-### Granularizando registros da data de notificação
-    psdf["notificacao_mes"] = psdf["dt_notificacao"].dt.month
-    psdf["notificacao_trimestre"] = psdf["dt_notificacao"].dt.quarter
-
-
-    psdf['notificacao_mes_nome'] = psdf["notificacao_mes"].apply(aplicar_mes)
-    psdf['notificacao_trimestre_nome'] = psdf["notificacao_trimestre"].apply(aplicar_trimestre)    
-
-    #Removendo as colunas númericas do mês e do trimestre
-    psdf = psdf[['dt_notificacao','notificacao_mes_nome','notificacao_trimestre_nome','notificacao_ano','dt_nascimento','tp_sexo','no_bairro_residencia','virus']]
-    psdf.rename(columns={"notificacao_mes_nome": "notificacao_mes"}, inplace=True)
-    psdf.rename(columns={"notificacao_trimestre_nome": "notificacao_trimestre"}, inplace=True)
-
-    
-    pd = psdf.to_pandas()
-
-    pd["no_bairro_residencia_novo"] = pd["no_bairro_residencia"].map(aplicar_correcao)
+def executar(alvo, dirs, incremental=False, motor='auto', limite_local=LIMITE_BYTES_LOCAL, usar_cache=True,
+             spark=None, config=None):
+    """Executa o job para um destino, com as saídas nos diretórios do destino.
 
-    #Removendo e renomeando coluna
-    pd = pd[['dt_notificacao','notificacao_mes','notificacao_trimestre','notificacao_ano','dt_nascimento','tp_sexo','no_bairro_residencia_novo','virus']]
-    pd.rename(columns={"no_bairro_residencia_novo": "no_bairro_residencia"}, inplace=True)
+    Sem `spark`, a SparkSession é iniciada (e encerrada) aqui quando o
+    motor escolhido é o Spark; o orquestrador passa a sessão
+    compartilhada, que não é encerrada.
 
-    psdf = pspd.DataFrame(pd)
+    :param alvo: Destino montado por `dependencies.destinos.destino`.
+    :param dirs: Diretórios montados por `dependencies.destinos.caminhos`.
+    :param incremental: Se True, atualiza só as notificações alteradas.
+    :param motor: 'auto', 'spark' ou 'local'.
+    :param limite_local: Tamanho máximo dos CSVs para o motor local no modo auto.
+    :param usar_cache: Se False, ignora o cache de resultados.
+    :param spark: SparkSession compartilhada (ou None).
+    :param config: Configuração do job que acompanha `spark` (ou None).
+    :return: None
+    """
+    fontes = descobrir_fontes(dirs['raw'], **alvo)
+    if not fontes:
+        raise ValueError('nenhum extrato do destino ' + nome_destino(alvo) + ' em ' + dirs['raw'])
+
+    # Com as entradas, as tabelas de correção e o código inalterados, o cubo
+    # e as análises vêm do cache de resultados (o modo incremental mantém
+    # estado próprio e não usa o cache)
+    versao = versao_codigo(sys.modules[__name__])
+    cache = Cache(dirs['cache'], ativo=usar_cache and not incremental and versao is not None)
+    chave = (impressao(cache.impressao_entradas(fontes=fontes), tabelas_correcao(), versao, dirs)
+             if cache.ativo else None)
+    cubo = cache.obter(chave)
+
+    # Entradas pequenas são processadas em processo, sem iniciar a JVM
+    if cubo is not None:
+        motor = 'cache'
+    else:
+        motor = escolher_motor(motor, limite_bytes=limite_local, incremental=incremental, fontes=fontes)
+    encerrar = False
+    if motor == 'spark' and spark is None:
+        spark, _, config = start_spark(app_name='my_etl_job', files=['configs/etl_config.json'])
+        aplicar_configuracao(spark, config)
+        encerrar = True
+    sessao = spark if motor == 'spark' else None
+    perfil = Perfil(sessao, prefixo=nome_destino(alvo) + '-')
+    relatorio = os.path.join(dirs['plots'], 'relatorio_execucao.json')
+
+    if motor == 'cache':
+        # Restaura o cubo e as séries no armazenamento de agregados, caso
+        # tenham sido apagados ou regravados por outra execução (ex.: com
+        # entradas que depois voltaram ao estado do cache)
+        with perfil.etapa('cache') as etapa:
+            etapa['chave'] = chave
+            etapa['cubo_regravado'] = ler_chave_cubo(dirs['cubo']) != chave
+            if etapa['cubo_regravado']:
+                salvar_cubo_local(cubo, dirs['cubo'])
+                gravar_chave_cubo(dirs['cubo'], chave)
+                invalidar_estado(dirs['estado'])
+            etapa['anos_regravados'] = salvar_series_local(calcular_series_local(cubo),
+                                                           dirs['semanas'], dirs['alertas'])
+        cubo_sdf = None
+        virus = None
+    elif motor == 'local':
+        with perfil.etapa('extract_data'):
+            data = extrair_local(COLUNAS_EXTRACAO + ['ano'], fontes=fontes)
+
+        # Perfil de qualidade por fonte e quarentena das linhas rejeitadas
+        with perfil.etapa('qualidade') as etapa:
+            qualidade, quarentena = perfilar_local(data, COLUNAS_OBRIGATORIAS)
+            salvar_quarentena_local(quarentena, os.path.join(dirs['qualidade'], 'quarentena'))
+            salvar_relatorio_qualidade(qualidade, dirs['qualidade'])
+            etapa['linhas_rejeitadas'] = qualidade['rejeitadas']
+
+        with perfil.etapa('transform_data'):
+            df = transformar_local(data, obrigatorias=COLUNAS_OBRIGATORIAS)
+
+        with perfil.etapa('construir_cubo') as etapa:
+            cubo = construir_cubo_local(df)
+            etapa['linhas_saida'] = len(cubo)
+
+        with perfil.etapa('salvar_cubo'):
+            salvar_cubo_local(cubo, dirs['cubo'])
+            invalidar_estado(dirs['estado'])
+
+        with perfil.etapa('semanas') as etapa:
+            etapa['anos_regravados'] = salvar_series_local(calcular_series_local(cubo),
+                                                           dirs['semanas'], dirs['alertas'])
+        cubo_sdf = None
+        virus = None
+    else:
+        cubo_sdf, virus = executar_spark(sessao, perfil, incremental, config, dirs, fontes)
+        if cubo_sdf is None:
+            perfil.salvar_relatorio(relatorio)
+            if encerrar:
+                spark.stop()
+            return None
+
+        # O cubo já foi materializado por `construir_cubo`; a coleta só o lê
+        with perfil.etapa('coletar_cubo') as etapa:
+            cubo = cubo_sdf.toPandas()
+            etapa['linhas_saida'] = len(cubo)
+
+        # Séries por semana epidemiológica, canal endêmico e alertas,
+        # calculados no Spark com funções de janela sobre o cubo
+        with perfil.etapa('semanas') as etapa:
+            etapa['anos_regravados'] = salvar_series(sessao, calcular_series(cubo_sdf),
+                                                     dirs['semanas'], dirs['alertas'])
+
+    if motor != 'cache' and chave is not None:
+        cache.guardar(chave, 'cubo', cubo)
+        gravar_chave_cubo(dirs['cubo'], chave)
+
+    # Gráficos por vírus só dos vírus do destino
+    if virus is None:
+        virus = alvo['virus']
+
+    graficos = []
+    # Análise 1: Distribuição de casos ao longo dos anos
+    with perfil.etapa('load_plot_1'):
+        graficos += cache.memorizar(chave, load_plot_1, cubo, dirs['plots'])
+    # Análise 2: Identificação dos meses com maior incidência de casos
+    with perfil.etapa('load_plot_2'):
+        graficos += cache.memorizar(chave, load_plot_2, cubo, dirs['plots'])
+    # Análise 3: Comparação de casos entre os diferentes vírus ao longo dos anos
+    with perfil.etapa('load_plot_3'):
+        graficos += cache.memorizar(chave, load_plot_3, cubo, dirs['plots'])
+    # Analise 4: Distribuição de casos por faixa etária (só dos vírus afetados)
+    with perfil.etapa('load_plot_4'):
+        graficos += cache.memorizar(chave, load_plot_4, cubo, virus, dirs['plots'])
+    # Analise 5: Comparar a distribuição de casos por sexo (tp_sexo) e vírus (só dos vírus afetados)
+    with perfil.etapa('load_plot_5'):
+        graficos += cache.memorizar(chave, load_plot_5, cubo, virus, dirs['plots'])
+    #Análise 6: Agrupar os dados pelo nome do bairro e verificar a distribuição de casos em cada bairro 
+    with perfil.etapa('load_plot_6'):
+        graficos += cache.memorizar(chave, load_plot_6, cubo, dirs['plots'])
+
+    # Renderiza em paralelo apenas os gráficos cujos dados mudaram
+    with perfil.etapa('renderizar') as etapa:
+        etapa['graficos_renderizados'] = len(renderizar(graficos))
+
+    perfil.salvar_relatorio(relatorio)
+    if sessao is not None:
+        cubo_sdf.unpersist()
+    if encerrar:
+        spark.stop()
+    return None
 
-    ## Criar coluna com a idade
-    psdf['ano_nasc'] = year('dt_nascimento')
-    psdf['idade'] = psdf['notificacao_ano'] - psdf['ano_nasc']
 
-    #Removendo a coluna ano_nasc
-    psdf = psdf[['dt_notificacao','notificacao_mes','notificacao_trimestre','notificacao_ano','dt_nascimento', 'idade', 'tp_sexo','no_bairro_residencia','virus']]
+def executar_spark(spark, perfil, incremental=False, config=None, dirs=None, fontes=None):
+    """Executa as etapas do job no Spark até o cubo de agregação.
 
-    return psdf
+    :param spark: SparkSession.
+    :param perfil: Instância de `Perfil`.
+    :param incremental: Se True, atualiza só as notificações alteradas.
+    :param config: Configuração do job carregada por `start_spark` (ou None).
+    :param dirs: Diretórios do destino (padrão: `caminhos()`).
+    :param fontes: Fontes do destino (padrão: todas as do diretório bruto).
+    :return: Tupla (cubo persistido, vírus afetados ou None para todos);
+        o cubo é None quando nenhuma fonte mudou no modo incremental.
+    """
+    dirs = dirs or caminhos()
+
+    # Converte para Parquet apenas os CSVs novos ou alterados
+    with perfil.etapa('staging') as etapa:
+        etapa['arquivos_convertidos'] = len(preparar_staging(spark, dirs['raw'], dirs['staging'], fontes))
+
+    # Partições de shuffle dimensionadas pelo tamanho do staging, não os 200 padrão
+    particionamento = (config or {}).get('particionamento', {})
+    tamanhos = tamanho_fontes(dirs['staging'])
+    ajustar_particoes(spark, tamanhos, **particionamento)
+
+    if incremental:
+        # Só as notificações novas, alteradas ou removidas passam pela
+        # transformação; o cubo persistido é atualizado com o saldo
+        with perfil.etapa('incremental') as etapa:
+            # O estado vale só para o código e as tabelas de correção que o gravaram
+            versao = versao_codigo(sys.modules[__name__])
+            versao = impressao(tabelas_correcao(), versao) if versao is not None else None
+            # As fontes alteradas passam pelo perfil de qualidade e pela
+            # quarentena; só as linhas aceitas entram no saldo
+            verificar = partial(verificar_fontes, obrigatorias=COLUNAS_OBRIGATORIAS, dir_qualidade=dirs['qualidade'])
+            cubo_sdf, virus = atualizar_incremental(spark, transform_data, COLUNAS_EXTRACAO, dirs['staging'],
+                                                    dirs['estado'], dirs['cubo'], versao, verificar)
+            etapa['virus_afetados'] = sorted(virus)
+            qualidade = carregar_relatorio_qualidade(dirs['qualidade'])
+            etapa['linhas_rejeitadas'] = qualidade['rejeitadas'] if qualidade else 0
+        return (cubo_sdf if virus else None), virus
+
+    # Execução do pipeline ETL; a extração é persistida e lida uma única
+    # vez do staging, pelo perfil de qualidade
+    with perfil.etapa('extract_data'):
+        data = extract_data(spark, dirs['staging'], particionamento=particionamento)
+        data = data.persist(StorageLevel.MEMORY_AND_DISK)
+
+    # Perfil de qualidade por fonte, em um groupBy por virus/ano
+    with perfil.etapa('qualidade') as etapa:
+        qualidade = perfilar(data, COLUNAS_OBRIGATORIAS)
+        salvar_relatorio_qualidade(qualidade, dirs['qualidade'])
+        etapa['linhas_rejeitadas'] = qualidade['rejeitadas']
+
+    # Linhas sem alguma coluna obrigatória vão para a quarentena, com o motivo
+    with perfil.etapa('quarentena'):
+        salvar_quarentena(data, COLUNAS_OBRIGATORIAS, os.path.join(dirs['qualidade'], 'quarentena'))
+
+    with perfil.etapa('transform_data'):
+        sdf = transform_data(descartar_rejeitadas(data, COLUNAS_OBRIGATORIAS))
+
+    # Cubo de agregação calculado em uma única passada, com os bairros
+    # canonicalizados sobre as contagens; todas as análises derivam seus
+    # números dele
+    with perfil.etapa('construir_cubo'):
+        cubo_sdf = construir_cubo(sdf)
+        data.unpersist()
+
+    # Grava o cubo no armazenamento de agregados, consultado sem Spark
+    # por `dependencies.consulta`; o estado incremental deixa de
+    # corresponder ao cubo e é descartado
+    with perfil.etapa('salvar_cubo'):
+        salvar_cubo(cubo_sdf, dirs['cubo'])
+        invalidar_estado(dirs['estado'])
+    return cubo_sdf, None
+
+
+def extract_data(spark, dir_staging='data/staging', particionamento=None):
+    # Uma única leitura do dataset de staging, que já une todas as fontes do
+    # manifesto com os apelidos de colunas aplicados e as colunas virus e
+    # ano; o esquema vem do registro, sem ler os rodapés para descobri-lo, e
+    # só as colunas usadas são lidas do Parquet
+    sdf = (spark
+           .read
+           .schema(ESQUEMA_STAGING)
+           .parquet(dir_staging)
+           .select(*COLUNAS_EXTRACAO, 'ano'))
+
+    # Só com fontes grandes: reparticiona por virus/ano, espalhando-as em vários baldes
+    sdf = repartir_por_fonte(sdf, tamanho_fontes(dir_staging), **(particionamento or {}))
+
+    return sdf
+
+
+def transform_data(df, faixas=FAIXAS_ETARIAS, extras=()):
+    # Linhas sem data de nascimento são mantidas: a idade vem de nu_idade
+    sdf = df.dropna(subset=COLUNAS_OBRIGATORIAS)
+
+    # Vírus e sexo seguem como códigos pequenos até o cubo, onde são rotulados
+    sdf = codificar_dimensoes(sdf)
+
+### Granularizando registros da data de notificação: mês e trimestre como códigos, rotulados no cubo
+    sdf = (sdf
+           .withColumn('notificacao_mes', F.month('dt_notificacao').cast('tinyint'))
+           .withColumn('notificacao_trimestre', F.quarter('dt_notificacao').cast('tinyint'))
+           .withColumn('notificacao_semana', F.col('ds_semana_notificacao')))
+
+    ## Criar colunas com a idade (nu_idade decodificado ou datas), a faixa etária e a sinalização de idade impossível
+    sdf = calcular_idade(sdf, faixas)
+
+    # `extras`: colunas da extração mantidas no resultado (ex.: o arquivo de origem no streaming)
+    sdf = sdf.select('dt_notificacao','notificacao_mes','notificacao_trimestre','notificacao_semana','notificacao_ano','dt_nascimento', 'idade', 'idade_invalida', 'faixa_etaria', 'tp_sexo','no_bairro_residencia','virus', *extras)
+
+    return sdf
 
 
 def load_data(df):
@@ -133,389 +357,106 @@ def load_data(df):
     return None
 
 
-# Função de mapeamento para substituir os números pelos nomes dos meses
-def aplicar_mes(numero):
-    # Dicionário de mapeamento de números para nomes de meses
-    meses_map = {
-        1: "Janeiro",
-        2: "Fevereiro",
-        3: "Março",
-        4: "Abril",
-        5: "Maio",
-        6: "Junho",
-        7: "Julho",
-        8: "Agosto",
-        9: "Setembro",
-        10: "Outubro",
-        11: "Novembro",
-        12: "Dezembro"
-    }
-    return meses_map[numero]
-
-# Função de mapeamento para substituir os números pelos nomes do trimestre
-def aplicar_trimestre(numero):
-    # Dicionário de mapeamento de números para os trimestres
-    trimestre_map = {
-        1: "Q1",
-        2: "Q2",
-        3: "Q3",
-        4: "Q4"
-    }    
-    return trimestre_map[numero]
-
-# Função de mapeamento para substituir os nomes dos bairros
-def aplicar_correcao(bairro):
-
-    # Dicionário de mapeamento com a correcao dos nomes dos bairros
-    correcao_bairro_residencia = {"SANTO AMARO": "SANTO AMARO",
-    "BOA VIAGEM": "BOA VIAGEM",
-    "IPSEP": "IPSEP",
-    "JORDAO": "JORDAO",
-    "IBURA": "IBURA",
-    "PINA": "PINA",
-    "CAMPO GRANDE": "CAMPO GRANDE",
-    "SAO JOSE": "SAO JOSE",
-    "CAMPINA DO BARRETO": "CAMPINA DO BARRETO",
-    "ARRUDA": "ARRUDA",
-    "BOMBA DO HEMETERIO": "BOMBA DO HEMETERIO",
-    "ALTO JOSE BONIFACIO": "ALTO JOSE BONIFACIO",
-    "VASCO DA GAMA": "VASCO DA GAMA",
-    "NOVA DESCOBERTA": "NOVA DESCOBERTA",
-    "PRADO": "PRADO",
-    "CORDEIRO": "CORDEIRO",
-    "IPUTINGA": "IPUTINGA",
-    "TORROES": "TORROES",
-    "VARZEA": "VARZEA",
-    "AFOGADOS": "AFOGADOS",
-    "BONGI": "BONGI",
-    "SAN MARTIN": "SAN MARTIN",
-    "JARDIM SAO PAULO": "JARDIM SAO PAULO",
-    "COHAB": "COHAB",
-    "COQUEIRAL": "COQUEIRAL",
-    "ESTRADA DOS REMEDIOS": "ESTRADA DOS REMEDIOS",
-    "JAQUEIRA": "JAQUEIRA",
-    "ROSARINHO": "ROSARINHO",
-    "IMBIRIBEIRA": "IMBIRIBEIRA",
-    "AGUA FRIA": "AGUA FRIA",
-    "FUNDAO": "FUNDAO",
-    "LINHA DO TIRO": "LINHA DO TIRO",
-    "GUABIRABA": "GUABIRABA",
-    "CASA AMARELA": "CASA AMARELA",
-    "ALTO DO MANDU": "ALTO DO MANDU",
-    "MACAXEIRA": "MACAXEIRA",
-    "ENGENHO DO MEIO": "ENGENHO DO MEIO",
-    "MANGUEIRA": "MANGUEIRA",
-    "AREIAS": "AREIAS",
-    "ALTO SANTA TEREZINHA": "ALTO SANTA TEREZINHA",
-    "DOIS UNIDOS": "DOIS UNIDOS",
-    "PASSARINHO": "PASSARINHO",
-    "ALTO JOSE DO PINHO": "ALTO JOSE DO PINHO",
-    "MADALENA": "MADALENA",
-    "TORRE": "TORRE",
-    "ILHA DO RETIRO": "ILHA DO RETIRO",
-    "BOA VISTA": "BOA VISTA",
-    "TORREAO": "TORREAO",
-    "CABANGA": "CABANGA",
-    "COELHOS": "COELHOS",
-    "TAMARINEIRA": "TAMARINEIRA",
-    "SITIO DOS PINTOS": "SITIO DOS PINTOS",
-    "ENCRUZILHADA": "ENCRUZILHADA",
-    "BRASILIA TEIMOSA": "BRASILIA TEIMOSA",
-    "CORREGO DO JENIPAPO": "CORREGO DO JENIPAPO",
-    "CURADO": "CURADO",
-    "GRACAS": "GRACAS",
-    "CAJUEIRO": "CAJUEIRO",
-    "PORTO DA MADEIRA": "PORTO DA MADEIRA",
-    "MORRO DA CONCEICAO": "MORRO DA CONCEICAO",
-    "DOIS IRMAOS": "DOIS IRMAOS",
-    "MUSTARDINHA": "MUSTARDINHA",
-    "ESTANCIA": "ESTANCIA",
-    "CACOTE": "CACOTE",
-    "BARRO": "BARRO",
-    "SANCHO": "SANCHO",
-    "BREJO DE BEBERIBE": "BREJO DE BEBERIBE",
-    "CAXANGA": "CAXANGA",
-    "ESPINHEIRO": "ESPINHEIRO",
-    "ILHA JOANA BEZERRA": "ILHA JOANA BEZERRA",
-    "MANGABEIRA": "MANGABEIRA",
-    "BREJO DA GUABIRABA": "BREJO DA GUABIRABA",
-    "TEJIPIO": "TEJIPIO",
-    "AFLITOS": "AFLITOS",
-    "CASA FORTE": "CASA FORTE",
-    "ZUMBI": "ZUMBI",
-    "BEBERIBE": "BEBERIBE",
-    "SANTA ROSA": "SANTA ROSA",
-    "SOLEDADE": "SOLEDADE",
-    "TOTO": "TOTO",
-    "HIPODROMO": "HIPODROMO",
-    "MONTEIRO": "MONTEIRO",
-    "PEIXINHOS": "PEIXINHOS",
-    "JIQUIA": "JIQUIA",
-    "PARNAMIRIM": "PARNAMIRIM",
-    "APIPUCOS": "APIPUCOS",
-    "PAISSANDU": "PAISSANDU",
-    "POCO": "POCO",
-    "CIDADE UNIVERSITARIA": "CIDADE UNIVERSITARIA",
-    "PONTO DE PARADA": "PONTO DE PARADA",
-    "RECIFE": "RECIFE",
-    "DERBY": "DERBY",
-    "BREJO DE GUABIRABA": "BREJO DE GUABIRABA",
-    "ALTO SANTA ISABEL": "ALTO SANTA ISABEL",
-    "ALUIZIO PINTO": "ALUIZIO PINTO",
-    "BREJO": "BREJO",
-    "CENTRO": "CENTRO",
-    "OURO PRETO": "OURO PRETO",
-    "RUA JERONIMO": "RUA JERONIMO",
-    "SANTO ANTONIO": "SANTO ANTONIO",
-    "ILHA DO LEITE": "ILHA DO LEITE",
-    "SANTANA": "SANTANA",
-    "PACHECO": "PACHECO",
-    "GUARARAPES": "GUARARAPES",
-    "JD.JORDAO": "JD.JORDAO",
-    "CHAO DE ESTRELAS": "CHAO DE ESTRELAS",
-    "ALTO DA BONDADE": "ALTO DA BONDADE",
-    "SITIO NOVO": "SITIO NOVO",
-    "CAMPO": "CAMPO GRANDE",
-    "BOA": "BOA VISTA",
-    "P": "PACHECO",
-    "JORDAO ALTO": "JORDAO ALTO",
-    "UR7 VARZEA": "UR7 VARZEA",
-    "RODA DE FOGO": "RODA DE FOGO",
-    "JARDIM S├O PAULO": "JARDIM SAO PAULO",
-    "ENG DO MEIO": "ENGENHO DO MEIO",
-    "CAMPINA": "CAMPINA DO BARRETO",
-    "ChÒo de Estrela": "CHAO DE ESTRELAS",
-    "CAÃOTE": "CACOTE",
-    "CAþOTE": "CACOTE",
-    "IPS": "IPSEP",
-    "BARROI": "BARRO",
-    "GRAþAS": "GRACAS",
-    "ENGE DO MEIO": "ENGENHO DO MEIO",
-    "Recife": "RECIFE",
-    "462": "462",
-    "IPUITINGA": "IPUTINGA",
-    "JIGUIA": "JIGUIA",
-    "PASSSARINHO": "PASSSARINHO",
-    "NI": "SANTO ANTONIO",
-    "BAIRRO NOVO": "BAIRRO NOVO",
-    "JIQUI┴": "JIQUIA",
-    "ALTO DO PASCOAL": "ALTO DO PASCOAL"
-    }
-
-    return correcao_bairro_residencia[bairro]
-
-
-def criar_id_mes(mes):
-    # Dicionário de mapeamento de números para nomes de meses
-    meses_map = {
-        "Janeiro" : 1,
-        "Fevereiro" : 2,
-        "Março" : 3,
-        "Abril" : 4,
-        "Maio" : 5,
-        "Junho" : 6,
-        "Julho" : 7,
-        "Agosto" : 8,
-        "Setembro" : 9,
-        "Outubro" : 10,
-        "Novembro" : 11,
-        "Dezembro" : 12
-    }    
-    return meses_map[mes]
-
-def correcao_sexo(caracter):
-    correcao = {
-    "I": "NÃO INFORMADO",
-    "M": "MASCULINO",
-    "F": "FEMININO"
-    }
-    return correcao[caracter]
-
-
 # Análise 1: Distribuição de casos ao longo dos anos
-def load_plot_1(psdf):
-    casos_por_ano_df = pspd.DataFrame(psdf.groupby("notificacao_ano").size()).to_pandas()
-    casos_por_ano_df = casos_por_ano_df.reset_index()
-    casos_por_ano_df.rename(columns={0: "quantidade"}, inplace=True)
-
-    # Plota um gráfico de barras com a distribuição de casos ao longo dos anos
-    colors = ['skyblue', 'skyblue', 'skyblue']
-    plt.figure(figsize=(10, 6))
-    plt.bar(casos_por_ano_df['notificacao_ano'], casos_por_ano_df['quantidade'], color=colors )
-    plt.xlabel('Ano da notificação')
-    plt.ylabel('Quantidade')
-    plt.title(' Distribuição de casos ao longo dos anos.')
-    plt.xticks(casos_por_ano_df['notificacao_ano'], rotation=45) 
-    plt.tight_layout()
-    plt.savefig("data/plots/dist_casos_anos.png")    
+def load_plot_1(cubo, dir_plots='data/plots'):
+    casos_por_ano_df = somar(cubo, ['notificacao_ano'])
 
-    return None
+    # Gráfico de barras com a distribuição de casos ao longo dos anos
+    return [grafico(os.path.join(dir_plots, "dist_casos_anos.png"), 'barras', casos_por_ano_df,
+                    x='notificacao_ano', y='quantidade', cores=['skyblue'],
+                    rotulo_x='Ano da notificação', rotulo_y='Quantidade',
+                    titulo=' Distribuição de casos ao longo dos anos.', marcas_x=True)]
 
 # Análise 2: Identificação dos meses com maior incidência de casos
-def load_plot_2(psdf):
-    incidencia_casos_meses = pspd.DataFrame(psdf.groupby("notificacao_mes").size().sort_values()).to_pandas()
-    incidencia_casos_meses = incidencia_casos_meses.reset_index()
-    incidencia_casos_meses.rename(columns={0: "quantidade"}, inplace=True)
-    incidencia_casos_meses["id_mes"] = incidencia_casos_meses["notificacao_mes"].apply(criar_id_mes)
+def load_plot_2(cubo, dir_plots='data/plots'):
+    incidencia_casos_meses = somar(cubo, ['notificacao_mes'])
+    incidencia_casos_meses["id_mes"] = incidencia_casos_meses["notificacao_mes"].map(inverter(MESES))
     incidencia_casos_meses = incidencia_casos_meses.sort_values(by=['id_mes'], ascending=True)
 
-    # Plota um gráfico de barras com a identificação dos meses com maior incidência de casos
-    # colors = ['b', 'g', 'r', 'c', 'm', 'y', 'k', 'purple', 'orange', 'pink', 'brown', 'gray']
-    colors = ['skyblue']
-    plt.figure(figsize=(10, 6))
-    plt.bar(incidencia_casos_meses['notificacao_mes'], incidencia_casos_meses['quantidade'], color=colors )
-    plt.xlabel('Mês da notificação')
-    plt.ylabel('Quantidade')
-    plt.title('Identificação dos meses com maior incidência de casos.')
-    plt.xticks(rotation=45) 
-    plt.tight_layout()
-    plt.savefig("data/plots/meses_maior_incidencia.png") 
-
-    return None
+    # Gráfico de barras com a identificação dos meses com maior incidência de casos
+    return [grafico(os.path.join(dir_plots, "meses_maior_incidencia.png"), 'barras', incidencia_casos_meses,
+                    x='notificacao_mes', y='quantidade', cores=['skyblue'],
+                    rotulo_x='Mês da notificação', rotulo_y='Quantidade',
+                    titulo='Identificação dos meses com maior incidência de casos.')]
 
 # Análise 3: Comparação de casos entre os diferentes vírus ao longo dos anos
-def load_plot_3(psdf):
-    virus_ano_df = psdf.groupby(["virus", "notificacao_ano"]).size().unstack()
+def load_plot_3(cubo, dir_plots='data/plots'):
+    virus_ano_df = somar(cubo, ['virus', 'notificacao_ano']).pivot(index='virus', columns='notificacao_ano', values='quantidade')
     virus_ano_df = virus_ano_df.reset_index()
-    virus_ano_df = virus_ano_df.to_pandas()
-    #virus_ano_df.set_index('virus', inplace=True)  # Define a coluna 'virus' como índice
-    virus_ano_df
-
-    # Definindo os anos para o eixo x
-    anos = [2019, 2020, 2021]
-
-    # Plotando o gráfico de linhas
-    plt.figure(figsize=(10, 6))
-    for index, row in virus_ano_df.iterrows():
-        plt.plot(anos, row[1:], marker='o', label=row['virus'])
-
-    # Configurando o gráfico
-    plt.title('Comparação de casos entre os diferentes vírus ao longo dos anos')
-    plt.xlabel('Ano')
-    plt.ylabel('Número de Casos')
-    plt.legend()
-    plt.grid(True)
-    plt.xticks(anos, rotation=45) 
-    plt.tight_layout()
-    plt.savefig("data/plots/virus_durante_os_anos.png") 
-    return None
+    virus_ano_df.columns.name = None
+
+    # Gráfico de linhas, uma por vírus, com os anos no eixo x
+    return [grafico(os.path.join(dir_plots, "virus_durante_os_anos.png"), 'linhas', virus_ano_df,
+                    serie='virus', rotulo_x='Ano', rotulo_y='Número de Casos',
+                    titulo='Comparação de casos entre os diferentes vírus ao longo dos anos')]
 
 # Analise 4: Distribuição de casos por faixa etária
-def load_plot_4(psdf):
-    # Calcula a distribuição de casos por faixa etária
-    group_dengue = psdf[psdf['virus'] == "DENGUE"]
-    group_chikun = psdf[psdf['virus'] == "CHIKUNGUNYA"]
-    group_zika = psdf[psdf['virus'] == "ZIKA"]
-
-    group_dengue = group_dengue.sort_values(by=['idade'], ascending=False).groupby('idade').count()
-    group_dengue = group_dengue['dt_notificacao']
-    group_dengue.rename(columns={"dt_notificacao": "quantidade (dengue)"}, inplace=True)
-    group_dengue = group_dengue.reset_index()
-
-    group_chikun = group_chikun.sort_values(by=['idade'], ascending=False).groupby('idade').count()
-    group_chikun = group_chikun['dt_notificacao']
-    group_chikun.rename(columns={"dt_notificacao": "quantidade (chikun)"}, inplace=True)
-    group_chikun = group_chikun.reset_index()
-
-    group_zika = group_zika.sort_values(by=['idade'], ascending=False).groupby('idade').count()
-    group_zika = group_zika['dt_notificacao']
-    group_zika.rename(columns={"dt_notificacao": "quantidade (zika)"}, inplace=True)
-    group_zika = group_zika.reset_index()
-
-    # Plotando o gráfico de distribuição de casos por idade (Zika)
-    plt.figure(figsize=(10, 6))
-    plt.hist(group_zika['idade'], bins=20, color='skyblue', edgecolor='black')
-    plt.title('Distribuição de Casos por Idade (Zika)')
-    plt.xlabel('Idade')
-    plt.ylabel('Número de Casos')
-    plt.grid(True)
-    plt.savefig("data/plots/casos_faixa_etaria_zika.png")
-
-    # Plotando o gráfico de distribuição de casos por idade (Dengue)
-    plt.figure(figsize=(10, 6))
-    plt.hist(group_dengue['idade'], bins=20, color='skyblue', edgecolor='black')
-    plt.title('Distribuição de Casos por Idade (Dengue)')
-    plt.xlabel('Idade')
-    plt.ylabel('Número de Casos')
-    plt.grid(True)
-    plt.savefig("data/plots/casos_faixa_etaria_dengue.png")
-
-    # Plotando o gráfico de distribuição de casos por idade (Chikungunya)
-    plt.figure(figsize=(10, 6))
-    plt.hist(group_chikun['idade'], bins=20, color='skyblue', edgecolor='black')
-    plt.title('Distribuição de Casos por Idade (Chikungunya)')
-    plt.xlabel('Idade')
-    plt.ylabel('Número de Casos')
-    plt.grid(True)
-    plt.savefig("data/plots/casos_faixa_etaria_chikun.png")    
+def load_plot_4(cubo, virus=None, dir_plots='data/plots'):
+    # Histograma já agrupado no cubo: uma única consolidação por vírus e
+    # faixa, sem as idades não informadas ou impossíveis
+    casos_faixa = somar(cubo, ['virus', 'faixa_etaria'])
+    casos_faixa['inicio_faixa'] = casos_faixa['faixa_etaria'].map(inicio_faixa)
+    casos_faixa = casos_faixa.dropna(subset=['inicio_faixa']).sort_values(by=['inicio_faixa'])
+
+    graficos = []
+    for nome_virus, (sufixo, titulo, _) in GRAFICOS_POR_VIRUS.items():
+        if virus is not None and nome_virus not in virus:
+            continue
+        grupo = casos_faixa[casos_faixa['virus'] == nome_virus][['faixa_etaria', 'quantidade']]
+
+        # Gráfico de barras com a distribuição de casos por faixa etária do vírus
+        graficos.append(grafico(os.path.join(dir_plots, "casos_faixa_etaria_" + sufixo + ".png"), 'barras', grupo,
+                                x='faixa_etaria', y='quantidade', cores=['skyblue'],
+                                rotulo_x='Faixa etária', rotulo_y='Número de Casos',
+                                titulo='Distribuição de Casos por Faixa Etária (' + titulo + ')'))
+
+    return graficos
 
-    return None
 # Analise 5: Comparar a distribuição de casos por sexo (tp_sexo) e vírus.
-def load_plot_5(psdf):
-    group_sexo_virus = psdf.groupby(['virus', 'tp_sexo']).count()
-    group_sexo_virus = group_sexo_virus['dt_notificacao']
-    group_sexo_virus = pspd.DataFrame(group_sexo_virus)
-    group_sexo_virus.rename(columns={"dt_notificacao": "quantidade"}, inplace=True)  
-    group_sexo_virus = group_sexo_virus.reset_index()
-    group_sexo_virus['sexo'] = group_sexo_virus["tp_sexo"].apply(correcao_sexo)
-
-    # Converte o resultado para um pandas DataFrame para visualização
-    group_sexo_virus_df = group_sexo_virus.to_pandas()
-
-    # Plota um gráfico de barras com a distribuição de casos por sexo
-    colors = ['lightcoral', 'lightgreen','skyblue',]
-    plt.figure(figsize=(10, 6))
-    plt.bar(group_sexo_virus_df['sexo'], group_sexo_virus_df['quantidade'].where(group_sexo_virus_df['virus'] == 'CHIKUNGUNYA'), color=colors )
-    plt.xlabel('Sexo')
-    plt.ylabel('Quantidade')
-    plt.title('Distribuição de casos Chikungunya.')
-    plt.xticks(rotation=45) 
-    plt.tight_layout()
-    plt.savefig("data/plots/casos_por_sexo_chikun.png") 
-
-    # Plota um gráfico de barras com a distribuição de casos por sexo
-    plt.figure(figsize=(10, 6))
-    plt.bar(group_sexo_virus_df['sexo'], group_sexo_virus_df['quantidade'].where(group_sexo_virus_df['virus'] != 'DENGUE'), color=colors)
-    plt.xlabel('Sexo')
-    plt.ylabel('Quantidade')
-    plt.title('Distribuição de casos Dengue.')
-    plt.xticks(rotation=45) 
-    plt.tight_layout()
-    plt.savefig("data/plots/casos_por_sexo_dengue.png")
-
-    # Plota um gráfico de barras com a distribuição de casos por sexo
-    colors = ['skyblue', 'lightcoral']
-    plt.figure(figsize=(10, 6))
-    plt.bar(group_sexo_virus_df['sexo'], group_sexo_virus_df['quantidade'].where(group_sexo_virus_df['virus'] == 'ZIKA'), color=colors )
-    plt.xlabel('Sexo')
-    plt.ylabel('Quantidade')
-    plt.title('Distribuição de casos Zika.')
-    plt.xticks(rotation=45) 
-    plt.tight_layout() 
-    plt.savefig("data/plots/casos_por_sexo_zika.png")    
+def load_plot_5(cubo, virus=None, dir_plots='data/plots'):
+    group_sexo_virus_df = somar(cubo, ['virus', 'tp_sexo'])
+    group_sexo_virus_df['sexo'] = group_sexo_virus_df['tp_sexo'].map(SEXOS)
 
-    return None
+    graficos = []
+    for nome_virus, (sufixo, titulo, colors) in GRAFICOS_POR_VIRUS.items():
+        if virus is not None and nome_virus not in virus:
+            continue
+        grupo = group_sexo_virus_df[group_sexo_virus_df['virus'] == nome_virus][['sexo', 'quantidade']]
+
+        # Gráfico de barras com a distribuição de casos por sexo
+        graficos.append(grafico(os.path.join(dir_plots, "casos_por_sexo_" + sufixo + ".png"), 'barras', grupo,
+                                x='sexo', y='quantidade', cores=colors,
+                                rotulo_x='Sexo', rotulo_y='Quantidade',
+                                titulo='Distribuição de casos ' + titulo + '.'))
+
+    return graficos
 
 ## Analise 6: Agrupar os dados pelo nome do bairro e verificar a distribuição de casos em cada bairro 
-def load_plot_6(psdf):
-    df_incidencia_bairro = pspd.DataFrame(psdf.sort_values(by=['no_bairro_residencia'], ascending=False).groupby(['no_bairro_residencia'])['dt_notificacao'].count())
-    df_incidencia_bairro = df_incidencia_bairro.reset_index()
-    df_incidencia_bairro.rename(columns={"dt_notificacao": "quantidade"}, inplace=True)
-    df_incidencia_bairro = df_incidencia_bairro.to_pandas()
+def load_plot_6(cubo, dir_plots='data/plots'):
+    df_incidencia_bairro = somar(cubo, ['no_bairro_residencia'])
     df_incidencia_bairro = df_incidencia_bairro.sort_values(by=['quantidade'], ascending=False)
 
-    # Plotar o gráfico
-    plt.figure(figsize=(10, 8))
-    ax = df_incidencia_bairro.head(20).plot(kind='barh', x='no_bairro_residencia', y='quantidade', color='skyblue')
-    plt.title('Distribuição dos 20 bairros com mais incidência')
-    ax.bar_label(ax.containers[0])
-    plt.xlabel('Bairro')
-    plt.ylabel('Total de Casos')
-    plt.tight_layout()
-    plt.savefig("data/plots/vinte_bairros_com_maior_incidencia.png")    
-
-    return None
+    # Gráfico de barras horizontais com os 20 bairros de maior incidência
+    return [grafico(os.path.join(dir_plots, "vinte_bairros_com_maior_incidencia.png"), 'barras_horizontais',
+                    df_incidencia_bairro.head(20), tamanho=(10, 8),
+                    x='no_bairro_residencia', y='quantidade',
+                    rotulo_x='Bairro', rotulo_y='Total de Casos',
+                    titulo='Distribuição dos 20 bairros com mais incidência')]
 
 # entry point for PySpark ETL application
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Job ETL dos casos de dengue, chikungunya e zika.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='processa apenas as notificações novas ou alteradas desde a última execução')
+    parser.add_argument('--motor', choices=MOTORES, default='auto',
+                        help='motor de execução (auto: local para entradas pequenas)')
+    parser.add_argument('--limite-local', type=int, default=LIMITE_BYTES_LOCAL,
+                        help='tamanho máximo em bytes dos CSVs brutos para o motor local no modo auto')
+    parser.add_argument('--sem-cache', action='store_true',
+                        help='recalcula tudo, sem ler nem gravar o cache de resultados')
+    parser.add_argument('--cidade', default=CIDADE_PADRAO, help='sufixo de cidade dos CSVs brutos')
+    parser.add_argument('--anos', type=int, nargs='+', help='anos processados (padrão: todos)')
+    parser.add_argument('--virus', nargs='+', help='vírus processados (padrão: todos)')
+    args = parser.parse_args()
+    main(incremental=args.incremental, motor=args.motor, limite_local=args.limite_local,
+         usar_cache=not args.sem_cache, cidade=args.cidade, anos=args.anos, virus=args.virus)
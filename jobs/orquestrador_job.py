@@ -0,0 +1,150 @@
+"""
+orquestrador_job.py
+~~~~~~~~~~~~~~~~~~~
+
+Orquestrador de vários destinos do job ETL (município, opcionalmente
+restrito a alguns anos e vírus) sobre uma única SparkSession. Os
+destinos são submetidos ao mesmo tempo por um pool de threads; cada um
+usa uma sessão derivada (`newSession`, com configuração SQL própria,
+como o número de partições de shuffle ajustado ao seu staging) e um pool
+próprio do escalonador FAIR, de modo que os jobs de um município grande
+não bloqueiam os dos pequenos. As saídas de cada destino ficam em
+`data/cidades/<destino>` (staging, estado, agregados, gráficos, cache e
+qualidade).
+
+Os destinos vêm de um JSON com uma lista de objetos `cidade`, `anos` e
+`virus` (os dois últimos opcionais):
+    [{"cidade": "recife"}, {"cidade": "olinda", "anos": [2020, 2021], "virus": ["DENGUE"]}]
+Sem o arquivo, é processado um destino por cidade presente em `data/raw`.
+
+Uso:
+    $SPARK_HOME/bin/spark-submit --master local[*] \\
+        --conf spark.scheduler.mode=FAIR \\
+        --py-files packages.zip,jobs/etl_job.py \\
+        --files configs/etl_config.json \\
+        jobs/orquestrador_job.py --alvos alvos.json --paralelos 4
+"""
+
+import argparse
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import etl_job
+from dependencies.destinos import DIR_CIDADES, caminhos_destino, destino, nome_destino
+from dependencies.fontes import descobrir_cidades
+from dependencies.motor_local import LIMITE_BYTES_LOCAL, MOTORES
+from dependencies.particionamento import aplicar_configuracao
+from dependencies.spark import start_spark
+
+# Número de destinos processados ao mesmo tempo
+DESTINOS_PARALELOS = 4
+
+# Relatório com a situação de cada destino, em `dir_cidades`
+ARQUIVO_RESUMO = 'resumo_orquestrador.json'
+
+
+def carregar_alvos(arquivo=None, dir_raw='data/raw'):
+    """Lê os destinos do orquestrador.
+
+    :param arquivo: JSON com a lista de destinos (ou None).
+    :param dir_raw: Diretório dos CSVs brutos, usado sem `arquivo`.
+    :return: Lista de destinos montados por `destino`.
+    """
+    if arquivo is None:
+        return [destino(cidade) for cidade in descobrir_cidades(dir_raw)]
+    with open(arquivo, 'r') as entrada:
+        return [destino(item['cidade'], item.get('anos'), item.get('virus')) for item in json.load(entrada)]
+
+
+def processar_destino(spark, config, alvo, dir_cidades=DIR_CIDADES, dir_raw='data/raw', **opcoes):
+    """Executa o job para um destino, em uma sessão derivada e no pool do destino.
+
+    Falhas são registradas no resultado em vez de propagadas, para que
+    um destino com problema não interrompa os demais.
+
+    :param spark: SparkSession compartilhada.
+    :param config: Configuração do job carregada por `start_spark`.
+    :param alvo: Destino montado por `destino`.
+    :param dir_cidades: Diretório base das saídas dos destinos.
+    :param dir_raw: Diretório dos CSVs brutos.
+    :param opcoes: Demais argumentos de `etl_job.executar` (incremental,
+        motor, limite_local, usar_cache).
+    :return: Dicionário com o destino, a situação e a duração.
+    """
+    nome = nome_destino(alvo)
+    sessao = spark.newSession()
+    aplicar_configuracao(sessao, config)
+    spark.sparkContext.setLocalProperty('spark.scheduler.pool', nome)
+
+    resultado = {'destino': nome, 'alvo': alvo}
+    inicio = time.perf_counter()
+    try:
+        etl_job.executar(alvo, caminhos_destino(alvo, dir_cidades, dir_raw), spark=sessao, config=config, **opcoes)
+        resultado['situacao'] = 'ok'
+    except Exception:
+        resultado['situacao'] = 'falha'
+        resultado['erro'] = traceback.format_exc()
+    finally:
+        spark.sparkContext.setLocalProperty('spark.scheduler.pool', None)
+    resultado['duracao_s'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def salvar_resumo(resultados, dir_cidades=DIR_CIDADES):
+    """Grava o resumo da execução do orquestrador de forma atômica.
+
+    :param resultados: Lista retornada pelas chamadas de `processar_destino`.
+    :param dir_cidades: Diretório base das saídas dos destinos.
+    :return: None
+    """
+    os.makedirs(dir_cidades, exist_ok=True)
+    caminho = os.path.join(dir_cidades, ARQUIVO_RESUMO)
+    with open(caminho + '.tmp', 'w') as arquivo:
+        json.dump(resultados, arquivo, indent=2)
+    os.replace(caminho + '.tmp', caminho)
+    return None
+
+
+def main(arquivo_alvos=None, paralelos=DESTINOS_PARALELOS, dir_raw='data/raw', dir_cidades=DIR_CIDADES,
+         **opcoes):
+    alvos = carregar_alvos(arquivo_alvos, dir_raw)
+    spark, log, config = start_spark(app_name='orquestrador_etl_job', files=['configs/etl_config.json'],
+                                     spark_config={'spark.scheduler.mode': 'FAIR'})
+    log.warn('%d destinos, %d em paralelo' % (len(alvos), paralelos))
+
+    with ThreadPoolExecutor(max_workers=paralelos) as pool:
+        resultados = list(pool.map(
+            lambda alvo: processar_destino(spark, config, alvo, dir_cidades, dir_raw, **opcoes), alvos))
+
+    salvar_resumo(resultados, dir_cidades)
+    falhas = [resultado['destino'] for resultado in resultados if resultado['situacao'] != 'ok']
+    for resultado in resultados:
+        log.warn('destino %s: %s em %.3fs' % (resultado['destino'], resultado['situacao'], resultado['duracao_s']))
+    spark.stop()
+
+    if falhas:
+        raise RuntimeError('destinos com falha: ' + ', '.join(falhas))
+    return None
+
+
+# entry point for PySpark ETL orchestration
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Job ETL de vários municípios sobre uma única SparkSession.')
+    parser.add_argument('--alvos', default=None, help='JSON com a lista de destinos (padrão: todas as cidades)')
+    parser.add_argument('--paralelos', type=int, default=DESTINOS_PARALELOS,
+                        help='número de destinos processados ao mesmo tempo')
+    parser.add_argument('--entrada', default='data/raw', help='diretório dos CSVs brutos')
+    parser.add_argument('--saida', default=DIR_CIDADES, help='diretório base das saídas dos destinos')
+    parser.add_argument('--incremental', action='store_true',
+                        help='processa apenas as notificações novas ou alteradas de cada destino')
+    parser.add_argument('--motor', choices=MOTORES, default='auto',
+                        help='motor de cada destino (auto: local para destinos pequenos)')
+    parser.add_argument('--limite-local', type=int, default=LIMITE_BYTES_LOCAL,
+                        help='tamanho máximo em bytes dos CSVs de um destino para o motor local')
+    parser.add_argument('--sem-cache', action='store_true', help='ignora o cache de resultados')
+    args = parser.parse_args()
+    main(args.alvos, args.paralelos, args.entrada, args.saida, incremental=args.incremental, motor=args.motor,
+         limite_local=args.limite_local, usar_cache=not args.sem_cache)
@@ -0,0 +1,268 @@
+"""
+streaming_job.py
+~~~~~~~~~~~~~~~~
+
+Job de ingestão contínua com Structured Streaming. Observa o diretório
+de chegada dos extratos do SINAN (por padrão `data/raw`) e, a cada novo
+CSV de um município, aplica a mesma projeção, marcação de vírus e
+transformação do `etl_job`. A cada lote, só as fontes (virus/ano) dos
+extratos recebidos são perfiladas (relatório de qualidade e quarentena
+das linhas rejeitadas, como no job em lote) e recontadas: as contagens
+de cada fonte, com os bairros canonicalizados, ficam em um Parquet
+particionado por virus/ano e são substituídas pelas do novo extrato; só as partições do cubo que
+essas fontes alimentam são regravadas, as séries semanais e os alertas
+de `dependencies.semanas` são recalculados só para os vírus recebidos e
+os gráficos cujos dados mudaram são redesenhados, com latência de
+minutos em vez da execução noturna. As saídas ficam em
+`data/streaming/<cidade>` (cubo, séries, alertas, gráficos, qualidade,
+contagens por fonte e checkpoint), separadas das do job em lote.
+
+Cada doença tem seu próprio fluxo, com o esquema lido do cabeçalho dos
+seus arquivos do município já presentes no diretório (descobertos por
+`dependencies.fontes`) e aplicado por posição, como na leitura em lote
+do staging. Arquivos reescritos com o mesmo nome não são relidos pelo
+Structured Streaming: um extrato reemitido deve chegar com um sufixo de
+edição (ex.: `dengue_2021_recife_s32.csv`). Os extratos são cumulativos,
+então o último a chegar de cada fonte substitui os anteriores (em um
+mesmo lote, o de maior edição); o fluxo não guarda estado de agregação,
+só o checkpoint dos arquivos lidos.
+
+Uso:
+    $SPARK_HOME/bin/spark-submit --master local[*] \\
+        --py-files packages.zip,jobs/etl_job.py \\
+        --files configs/etl_config.json \\
+        jobs/streaming_job.py --entrada data/raw --cidade recife --intervalo '1 minute'
+"""
+
+import argparse
+import os
+import shutil
+from functools import reduce
+
+from pyspark import StorageLevel
+from pyspark.sql import functions as F
+
+import etl_job
+from dependencies.agregacao import DIMENSOES_CUBO, carregar_cubo, salvar_particoes_cubo
+from dependencies.bairros import corrigir_bairros
+from dependencies.destinos import CIDADE_PADRAO, caminhos
+from dependencies.esquemas import esquema_csv, ler_cabecalho, projetar, rotular_dimensoes
+from dependencies.fontes import descobrir_fontes
+from dependencies.graficos import renderizar
+from dependencies.incremental import filtrar_fontes
+from dependencies.particionamento import aplicar_configuracao
+from dependencies.qualidade import verificar_fontes
+from dependencies.semanas import calcular_series, calendario_semanas_spark, salvar_series
+from dependencies.spark import start_spark
+
+# Diretório base das saídas do fluxo, uma pasta por município
+DIR_STREAMING = 'data/streaming'
+
+# Nome de um extrato no fluxo: <doenca>_<ano>_<cidade>[_s<semana da edição>].csv
+PADRAO_EXTRATO = r'/%s_(\d{4})_%s(?:_s\d+)?\.csv$'
+
+# Semana da edição no nome de um extrato reemitido (sem sufixo: edição 0)
+PADRAO_EDICAO = r'_s(\d+)\.csv$'
+
+
+def caminhos_streaming(cidade=CIDADE_PADRAO, dir_entrada='data/raw', dir_streaming=DIR_STREAMING):
+    """Diretórios do fluxo de um município, em `dir_streaming/<cidade>`.
+
+    :param cidade: Sufixo de cidade dos arquivos.
+    :param dir_entrada: Diretório de chegada dos CSVs.
+    :param dir_streaming: Diretório base das saídas do fluxo.
+    :return: Dicionário no formato de `dependencies.destinos.caminhos`,
+        com o diretório do checkpoint.
+    """
+    base = os.path.join(dir_streaming, cidade)
+    return dict(caminhos(base, dir_entrada), checkpoint=os.path.join(base, 'checkpoint'))
+
+
+def ler_fluxo(spark, dir_entrada, cidade=CIDADE_PADRAO, arquivos_por_lote=None):
+    """Abre os fluxos de CSVs de todas as doenças de um município em um único DataFrame.
+
+    Equivale a `extract_data`: os apelidos de colunas são aplicados, só
+    as colunas do registro de esquemas são convertidas e `virus` vem do
+    manifesto de fontes. Cada linha leva também o ano e o nome do arquivo
+    de origem; linhas de arquivos de outros municípios são descartadas.
+
+    :param spark: SparkSession.
+    :param dir_entrada: Diretório de chegada dos CSVs.
+    :param cidade: Sufixo de cidade dos arquivos.
+    :param arquivos_por_lote: Limite de arquivos novos por lote (ou None).
+    :return: DataFrame Spark de streaming com as colunas de extração,
+        `ano` e `arquivo`.
+    """
+    doencas = {}
+    for fonte in descobrir_fontes(dir_entrada, cidade):
+        doencas.setdefault(fonte['doenca'], fonte)
+
+    fluxos = []
+    for doenca, fonte in sorted(doencas.items()):
+        leitor = (spark
+                  .readStream
+                  .schema(esquema_csv(ler_cabecalho(fonte['caminho'])))
+                  .option('sep', ';')
+                  .option('header', True)
+                  .option('pathGlobFilter', '%s_*_%s*.csv' % (doenca, cidade)))
+        if arquivos_por_lote:
+            leitor = leitor.option('maxFilesPerTrigger', arquivos_por_lote)
+        sdf = projetar(leitor.csv(dir_entrada), fonte['apelidos'])
+
+        arquivo = F.input_file_name()
+        ano = F.regexp_extract(arquivo, PADRAO_EXTRATO % (doenca, cidade), 1)
+        fluxos.append(sdf
+                      .withColumn('virus', F.lit(fonte['virus']))
+                      .withColumn('ano', F.when(ano != '', ano.cast('int')))
+                      .withColumn('arquivo', F.regexp_extract(arquivo, r'([^/]+)$', 1))
+                      .filter(F.col('ano').isNotNull())
+                      .select(*etl_job.COLUNAS_EXTRACAO, 'ano', 'arquivo'))
+
+    if not fluxos:
+        raise ValueError('nenhum extrato de ' + cidade + ' em ' + dir_entrada)
+    return reduce(lambda a, b: a.unionByName(b), fluxos)
+
+
+def extratos_vigentes(linhas):
+    """Extrato de cada fonte (virus/ano) recebido em um lote: o de maior edição.
+
+    :param linhas: DataFrame Spark com as linhas de um lote de `ler_fluxo`.
+    :return: Dicionário (virus, ano) -> nome do arquivo.
+    """
+    edicao = F.regexp_extract('arquivo', PADRAO_EDICAO, 1)
+    ultimo = F.max(F.struct(F.coalesce(edicao.cast('int'), F.lit(0)), F.col('arquivo')))
+    return {(linha['virus'], linha['ano']): linha['ultimo']['arquivo']
+            for linha in linhas.groupBy('virus', 'ano').agg(ultimo.alias('ultimo')).collect()}
+
+
+def contar_fontes(linhas):
+    """Conta os casos de extratos pelas dimensões do cubo, por fonte (virus/ano).
+
+    Como no cubo do job em lote, os bairros são canonicalizados sobre as
+    contagens.
+
+    :param linhas: DataFrame Spark com as linhas dos extratos.
+    :return: DataFrame Spark com as dimensões do cubo, `ano` e `quantidade`.
+    """
+    brutos = rotular_dimensoes(etl_job.transform_data(linhas, extras=('ano',))
+                               .groupBy(*DIMENSOES_CUBO, 'ano')
+                               .agg(F.count(F.lit(1)).alias('quantidade')))
+    return (corrigir_bairros(brutos, 'no_bairro_residencia')
+            .groupBy(*DIMENSOES_CUBO, 'ano')
+            .agg(F.sum('quantidade').alias('quantidade')))
+
+
+def processar_lote(linhas, id_lote, dirs):
+    """Substitui as fontes dos extratos de um lote e publica o cubo, as séries e os gráficos.
+
+    As contagens de cada fonte recebida substituem as gravadas; só as
+    partições do cubo alimentadas por essas fontes (antes ou depois da
+    troca) são regravadas, e as séries só dos vírus recebidos, a menos que
+    o calendário de semanas do cubo tenha mudado.
+
+    :param linhas: DataFrame Spark com as linhas dos extratos do lote.
+    :param id_lote: Identificador do lote.
+    :param dirs: Diretórios montados por `caminhos_streaming`.
+    :return: None
+    """
+    spark = linhas.sparkSession
+    linhas = linhas.persist(StorageLevel.MEMORY_AND_DISK)
+    extratos = extratos_vigentes(linhas)
+    if not extratos:
+        linhas.unpersist()
+        return None
+    fontes = sorted(extratos)
+    caminho_contagens = os.path.join(dirs['estado'], 'contagens')
+
+    # Perfil de qualidade e quarentena só das fontes recebidas; só as
+    # linhas aceitas são contadas
+    aceitas = verificar_fontes(linhas.filter(F.col('arquivo').isin(*extratos.values())).drop('arquivo'), fontes,
+                               obrigatorias=etl_job.COLUNAS_OBRIGATORIAS, dir_qualidade=dirs['qualidade'])
+    contagens = contar_fontes(aceitas).persist(StorageLevel.MEMORY_AND_DISK)
+    celulas = contagens.select('virus', 'ano', 'notificacao_ano').distinct().collect()
+    particoes = {(linha['virus'], linha['notificacao_ano']) for linha in celulas}
+    anteriores = carregar_cubo(spark, caminho_contagens)
+    if anteriores is not None:
+        particoes |= {(linha['virus'], linha['notificacao_ano'])
+                      for linha in filtrar_fontes(anteriores, fontes).select('virus', 'notificacao_ano').distinct().collect()}
+
+    # As contagens gravadas das fontes recebidas são trocadas pelas novas;
+    # fontes sem nenhuma linha aceita no novo extrato são removidas
+    (contagens
+     .write
+     .mode('overwrite')
+     .option('partitionOverwriteMode', 'dynamic')
+     .partitionBy('virus', 'ano')
+     .parquet(caminho_contagens))
+    for virus, ano in set(fontes) - {(linha['virus'], linha['ano']) for linha in celulas}:
+        particao = os.path.join(caminho_contagens, 'virus=' + virus, 'ano=' + str(ano))
+        if os.path.isdir(particao):
+            shutil.rmtree(particao)
+    contagens.unpersist()
+    linhas.unpersist()
+
+    cubo_fontes = (carregar_cubo(spark, caminho_contagens)
+                   .groupBy(*DIMENSOES_CUBO)
+                   .agg(F.sum('quantidade').alias('quantidade')))
+    salvar_particoes_cubo(cubo_fontes, dirs['cubo'], sorted(particoes))
+
+    # Séries semanais e alertas só dos vírus recebidos, sobre o calendário
+    # do cubo inteiro; se os limites do calendário mudaram, as séries de
+    # todos os vírus ganham ou perdem semanas e são recalculadas
+    cubo_sdf = carregar_cubo(spark, dirs['cubo']).persist(StorageLevel.MEMORY_AND_DISK)
+    virus = sorted({virus for virus, _ in fontes})
+    limites = tuple(cubo_sdf.agg(F.min('notificacao_semana'), F.max('notificacao_semana')).first())
+    gravados = None
+    if os.path.isdir(dirs['semanas']):
+        gravados = tuple(spark.read.parquet(dirs['semanas'])
+                         .agg(F.min('notificacao_semana'), F.max('notificacao_semana'))
+                         .first())
+    if gravados != limites:
+        virus = None
+    calendario = calendario_semanas_spark(cubo_sdf.filter(F.col('notificacao_semana').isNotNull()))
+    cubo_series = cubo_sdf if virus is None else cubo_sdf.filter(F.col('virus').isin(*virus))
+    salvar_series(spark, calcular_series(cubo_series, calendario=calendario), dirs['semanas'], dirs['alertas'], virus)
+    cubo = cubo_sdf.toPandas()
+    cubo_sdf.unpersist()
+
+    graficos = []
+    for analise in (etl_job.load_plot_1, etl_job.load_plot_2, etl_job.load_plot_3, etl_job.load_plot_6):
+        graficos += analise(cubo, dirs['plots'])
+    for analise in (etl_job.load_plot_4, etl_job.load_plot_5):
+        graficos += analise(cubo, virus, dirs['plots'])
+    renderizar(graficos)
+    return None
+
+
+def main(dir_entrada='data/raw', intervalo='1 minute', arquivos_por_lote=None, cidade=CIDADE_PADRAO,
+         dir_streaming=DIR_STREAMING, uma_vez=False):
+    spark, log, config = start_spark(app_name='streaming_etl_job', files=['configs/etl_config.json'])
+    aplicar_configuracao(spark, config)
+    dirs = caminhos_streaming(cidade, dir_entrada, dir_streaming)
+    os.makedirs(dirs['plots'], exist_ok=True)
+
+    gatilho = {'once': True} if uma_vez else {'processingTime': intervalo}
+    consulta = (ler_fluxo(spark, dir_entrada, cidade, arquivos_por_lote)
+                .writeStream
+                .option('checkpointLocation', dirs['checkpoint'])
+                .foreachBatch(lambda linhas, id_lote: processar_lote(linhas, id_lote, dirs))
+                .trigger(**gatilho)
+                .start())
+    log.warn('fluxo de ' + cidade + ' iniciado sobre ' + dir_entrada)
+
+    consulta.awaitTermination()
+    spark.stop()
+    return None
+
+
+# entry point for PySpark streaming application
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingestão contínua dos extratos de dengue, chikungunya e zika.')
+    parser.add_argument('--entrada', default='data/raw', help='diretório de chegada dos CSVs')
+    parser.add_argument('--intervalo', default='1 minute', help='intervalo entre lotes')
+    parser.add_argument('--arquivos-por-lote', type=int, default=None)
+    parser.add_argument('--cidade', default=CIDADE_PADRAO, help='município acompanhado pelo fluxo')
+    parser.add_argument('--saida', default=DIR_STREAMING, help='diretório base das saídas do fluxo')
+    parser.add_argument('--uma-vez', action='store_true', help='processa os arquivos pendentes e encerra')
+    args = parser.parse_args()
+    main(args.entrada, args.intervalo, args.arquivos_por_lote, args.cidade, args.saida, args.uma_vez)
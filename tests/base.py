@@ -0,0 +1,33 @@
+"""
+base.py
+~~~~~~~
+
+Classe base dos testes que precisam do Spark: uma SparkSession local por
+suíte de testes, criada em `setUpClass` e encerrada em `tearDownClass`.
+As suítes são ignoradas quando o Spark não pode ser iniciado (ex.: sem
+Java).
+"""
+
+import unittest
+
+from pyspark.sql import SparkSession
+
+
+class SparkTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.spark = (SparkSession.builder
+                         .master('local[1]')
+                         .config('spark.ui.enabled', 'false')
+                         .config('spark.ui.showConsoleProgress', 'false')
+                         .config('spark.sql.shuffle.partitions', '2')
+                         .getOrCreate())
+        except Exception as erro:
+            raise unittest.SkipTest('Spark indisponível: %s' % erro)
+        cls.spark.sparkContext.setLogLevel('ERROR')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
@@ -0,0 +1,86 @@
+"""
+test_agregacao.py
+~~~~~~~~~~~~~~~~~
+
+Testes da mesclagem de um cubo de variações (usada pelo modo incremental)
+com o cubo persistido e da regravação de algumas partições do cubo
+(usada pelo fluxo contínuo).
+"""
+
+import os
+import shutil
+import tempfile
+
+from dependencies.agregacao import DIMENSOES_CUBO, mesclar_cubos, salvar_cubo, salvar_particoes_cubo
+from tests.base import SparkTestCase
+
+ESQUEMA_CUBO = ('virus string, notificacao_ano int, notificacao_mes string, notificacao_trimestre string, '
+                'notificacao_semana int, tp_sexo string, faixa_etaria string, no_bairro_residencia string, '
+                'quantidade long')
+
+
+def celula(bairro, quantidade, virus='DENGUE', ano=2020):
+    """Linha do cubo que varia só no vírus, no bairro e no ano."""
+    return (virus, ano, 'Janeiro', 'Q1', ano * 100 + 2, 'F', '20-29', bairro, quantidade)
+
+
+class MesclarCubosTests(SparkTestCase):
+
+    def quantidades(self, cubo):
+        return {(linha['virus'], linha['no_bairro_residencia']): linha['quantidade'] for linha in cubo.collect()}
+
+    def test_variacoes_negativas(self):
+        cubo = self.spark.createDataFrame([celula('VARZEA', 5), celula('IBURA', 2), celula('CORDEIRO', 1)],
+                                          ESQUEMA_CUBO)
+        delta = self.spark.createDataFrame([celula('VARZEA', -3), celula('IBURA', -2), celula('CORDEIRO', 4),
+                                            celula('TORRE', 1, 'ZIKA')], ESQUEMA_CUBO)
+
+        mesclado = mesclar_cubos(cubo, delta)
+
+        self.assertEqual(sorted(mesclado.columns), sorted(DIMENSOES_CUBO + ['quantidade']))
+        # A célula zerada é descartada
+        self.assertEqual(self.quantidades(mesclado),
+                         {('DENGUE', 'VARZEA'): 2, ('DENGUE', 'CORDEIRO'): 5, ('ZIKA', 'TORRE'): 1})
+
+    def test_remocoes_e_reinclusoes_se_anulam(self):
+        cubo = self.spark.createDataFrame([celula('VARZEA', 5)], ESQUEMA_CUBO)
+        delta = self.spark.createDataFrame([celula('VARZEA', -1), celula('VARZEA', 1)], ESQUEMA_CUBO)
+
+        self.assertEqual(self.quantidades(mesclar_cubos(cubo, delta)), {('DENGUE', 'VARZEA'): 5})
+
+    def test_sem_cubo(self):
+        delta = self.spark.createDataFrame([celula('VARZEA', 3), celula('IBURA', 0)], ESQUEMA_CUBO)
+
+        self.assertEqual(self.quantidades(mesclar_cubos(None, delta)), {('DENGUE', 'VARZEA'): 3})
+
+
+class SalvarParticoesCuboTests(SparkTestCase):
+
+    def setUp(self):
+        self.dir_agregados = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.dir_agregados, 'cubo')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_agregados)
+
+    def quantidades(self):
+        return {(linha['virus'], linha['notificacao_ano'], linha['no_bairro_residencia']): linha['quantidade']
+                for linha in self.spark.read.parquet(self.caminho).collect()}
+
+    def test_so_as_particoes_pedidas_sao_trocadas(self):
+        salvar_cubo(self.spark.createDataFrame([celula('VARZEA', 5), celula('IBURA', 2, ano=2021),
+                                                celula('TORRE', 1, 'ZIKA')], ESQUEMA_CUBO), self.caminho)
+
+        # A partição da Zika fica sem linhas e é removida; a de 2021 não é pedida
+        novo = self.spark.createDataFrame([celula('VARZEA', 7), celula('IBURA', 9, ano=2021)], ESQUEMA_CUBO)
+        salvar_particoes_cubo(novo, self.caminho, [('DENGUE', 2020), ('ZIKA', 2020)])
+
+        self.assertEqual(self.quantidades(), {('DENGUE', 2020, 'VARZEA'): 7, ('DENGUE', 2021, 'IBURA'): 2})
+        self.assertEqual(sorted(os.listdir(self.caminho)), ['._SUCCESS.crc', '_SUCCESS', 'virus=DENGUE'])
+        self.assertFalse(os.path.exists(self.caminho + '.tmp'))
+
+    def test_sem_cubo_gravado(self):
+        novo = self.spark.createDataFrame([celula('VARZEA', 7)], ESQUEMA_CUBO)
+        salvar_particoes_cubo(novo, self.caminho, [('DENGUE', 2020)])
+
+        self.assertEqual(self.quantidades(), {('DENGUE', 2020, 'VARZEA'): 7})
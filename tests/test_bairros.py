@@ -0,0 +1,43 @@
+"""
+test_bairros.py
+~~~~~~~~~~~~~~~
+
+Testes da canonicalização dos nomes de bairro.
+"""
+
+import unittest
+
+from dependencies.bairros import BAIRRO_NAO_IDENTIFICADO, BAIRROS_CANONICOS, canonicalizar
+
+
+class CanonicalizarTests(unittest.TestCase):
+
+    def test_nulo(self):
+        self.assertIsNone(canonicalizar(None))
+
+    def test_acentos_caixa_e_espacos(self):
+        self.assertEqual(canonicalizar('várzea'), 'VARZEA')
+        self.assertEqual(canonicalizar('  boa   viagem '), 'BOA VIAGEM')
+
+    def test_apelidos(self):
+        self.assertEqual(canonicalizar('JD.JORDAO'), 'JORDAO')
+        self.assertEqual(canonicalizar('RECIFE ANTIGO'), 'BAIRRO DO RECIFE')
+        self.assertEqual(canonicalizar('RECIFE'), BAIRRO_NAO_IDENTIFICADO)
+
+    def test_erros_de_codificacao(self):
+        self.assertEqual(canonicalizar('JARDIM S├O PAULO'), 'JARDIM SAO PAULO')
+        self.assertEqual(canonicalizar('SÃ£O JOSE'), 'SAO JOSE')
+
+    def test_aproximacao(self):
+        self.assertEqual(canonicalizar('BOA VIAGEN'), 'BOA VIAGEM')
+
+    def test_sem_letras(self):
+        self.assertEqual(canonicalizar('462'), BAIRRO_NAO_IDENTIFICADO)
+        self.assertEqual(canonicalizar(''), BAIRRO_NAO_IDENTIFICADO)
+
+    def test_desconhecido_mantido_normalizado(self):
+        self.assertEqual(canonicalizar('Bairro Inexistente'), 'BAIRRO INEXISTENTE')
+
+    def test_canonicos_sao_pontos_fixos(self):
+        for bairro in BAIRROS_CANONICOS:
+            self.assertEqual(canonicalizar(bairro), bairro)
@@ -0,0 +1,103 @@
+"""
+test_cache.py
+~~~~~~~~~~~~~
+
+Testes do cache de resultados: leitura e gravação de entradas, índice
+persistido, remoção das menos usadas recentemente e chave gravada ao lado
+do cubo.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from itertools import count
+from unittest import mock
+
+from dependencies.cache import Cache, gravar_chave_cubo, impressao, ler_chave_cubo
+
+
+class CacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.caminho = tempfile.mkdtemp()
+        # Relógio crescente: cada leitura ou gravação é mais recente que a anterior
+        relogio = count(1)
+        self.tempo = mock.patch('dependencies.cache.time.time', side_effect=lambda: next(relogio))
+        self.tempo.start()
+
+    def tearDown(self):
+        self.tempo.stop()
+        shutil.rmtree(self.caminho)
+
+    def test_guardar_e_obter(self):
+        cache = Cache(self.caminho)
+        cache.guardar('a', 'cubo', {'casos': 1})
+
+        self.assertEqual(cache.obter('a'), {'casos': 1})
+        self.assertIsNone(cache.obter('b'))
+        # O índice é persistido e lido por uma nova instância
+        self.assertEqual(Cache(self.caminho).obter('a'), {'casos': 1})
+
+    def test_remove_menos_usada_recentemente(self):
+        cache = Cache(self.caminho, entradas_maximas=2)
+        cache.guardar('a', 'cubo', 1)
+        cache.guardar('b', 'cubo', 2)
+        cache.obter('a')
+        cache.guardar('c', 'cubo', 3)
+
+        self.assertEqual(sorted(cache.indice['entradas']), ['a', 'c'])
+        self.assertFalse(os.path.exists(os.path.join(self.caminho, 'b.pkl')))
+        self.assertIsNone(cache.obter('b'))
+
+    def test_limite_de_tamanho(self):
+        cache = Cache(self.caminho)
+        cache.guardar('a', 'cubo', 'x' * 1000)
+        cache.guardar('b', 'cubo', 'x' * 1000)
+        tamanho = cache.indice['entradas']['b']['tamanho']
+
+        cache = Cache(self.caminho, limite_bytes=2 * tamanho)
+        cache.obter('a')
+        cache.guardar('c', 'cubo', 'x' * 1000)
+
+        self.assertEqual(sorted(cache.indice['entradas']), ['a', 'c'])
+
+    def test_inativo(self):
+        cache = Cache(self.caminho, ativo=False)
+        cache.guardar('a', 'cubo', 1)
+
+        self.assertIsNone(cache.obter('a'))
+        self.assertEqual(os.listdir(self.caminho), [])
+
+    def test_memorizar(self):
+        cache = Cache(self.caminho)
+        chamadas = []
+
+        def somar(a, b):
+            chamadas.append((a, b))
+            return a + b
+
+        self.assertEqual(cache.memorizar('dados', somar, 1, 2), 3)
+        self.assertEqual(cache.memorizar('dados', somar, 1, 2), 3)
+        self.assertEqual(chamadas, [(1, 2)])
+        self.assertIn(impressao('dados', 'somar'), cache.indice['entradas'])
+
+
+class ChaveCuboTests(unittest.TestCase):
+
+    def setUp(self):
+        self.caminho = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.caminho)
+
+    def test_chave_ausente(self):
+        self.assertIsNone(ler_chave_cubo(self.caminho))
+        self.assertIsNone(ler_chave_cubo(os.path.join(self.caminho, 'inexistente')))
+
+    def test_gravar_e_ler(self):
+        gravar_chave_cubo(self.caminho, 'abc')
+        gravar_chave_cubo(self.caminho, 'def')
+
+        self.assertEqual(ler_chave_cubo(self.caminho), 'def')
+        self.assertEqual(os.listdir(self.caminho), ['_chave_cache'])
@@ -0,0 +1,75 @@
+"""
+test_consulta.py
+~~~~~~~~~~~~~~~~
+
+Testes das consultas ao armazenamento de agregados sem Spark: filtros
+pelas partições e pelas demais dimensões, total e reaproveitamento do
+dataset aberto enquanto o cubo não é regravado.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dependencies.consulta import abrir_cubo, consultar, interpretar_filtro
+
+LINHAS = [
+    ('DENGUE', 2020, 'Janeiro', 'Q1', 202002, 'F', '20-29', 'VARZEA', 5),
+    ('DENGUE', 2020, 'Abril', 'Q2', 202015, 'M', '20-29', 'VARZEA', 2),
+    ('DENGUE', 2020, 'Janeiro', 'Q1', 202003, 'M', '30-39', 'IBURA', 4),
+    ('DENGUE', 2021, 'Janeiro', 'Q1', 202102, 'F', '20-29', 'VARZEA', 7),
+    ('ZIKA', 2020, 'Fevereiro', 'Q1', 202006, 'F', '0-9', 'TORRE', 1),
+]
+COLUNAS = ['virus', 'notificacao_ano', 'notificacao_mes', 'notificacao_trimestre', 'notificacao_semana',
+           'tp_sexo', 'faixa_etaria', 'no_bairro_residencia', 'quantidade']
+
+
+def gravar_cubo(caminho, linhas):
+    """Grava o cubo particionado por virus/notificacao_ano, como `salvar_cubo`."""
+    tabela = pa.Table.from_pandas(pd.DataFrame(linhas, columns=COLUNAS), preserve_index=False)
+    pq.write_to_dataset(tabela, caminho, partition_cols=['virus', 'notificacao_ano'])
+    return None
+
+
+class ConsultarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_agregados = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.dir_agregados, 'cubo')
+        gravar_cubo(self.caminho, LINHAS)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_agregados)
+
+    def test_filtros_por_particao_e_dimensao(self):
+        resultado = consultar(['no_bairro_residencia'], {'virus': 'DENGUE', 'notificacao_ano': 2020,
+                                                          'notificacao_trimestre': 'Q1'}, self.caminho)
+
+        self.assertEqual(resultado.values.tolist(), [['VARZEA', 5], ['IBURA', 4]])
+
+    def test_filtro_com_lista_de_valores(self):
+        resultado = consultar(['virus'], {'notificacao_ano': [2020, 2021]}, self.caminho)
+
+        self.assertEqual(resultado.values.tolist(), [['DENGUE', 18], ['ZIKA', 1]])
+
+    def test_total(self):
+        self.assertEqual(consultar([], {'tp_sexo': 'F'}, self.caminho)['quantidade'].tolist(), [13])
+
+    def test_dataset_reaberto_depois_da_troca(self):
+        self.assertIs(abrir_cubo(self.caminho), abrir_cubo(self.caminho))
+
+        # Troca do diretório inteiro, como em `salvar_cubo`
+        gravar_cubo(self.caminho + '.tmp', LINHAS[:1])
+        shutil.rmtree(self.caminho)
+        os.rename(self.caminho + '.tmp', self.caminho)
+
+        self.assertEqual(consultar([], None, self.caminho)['quantidade'].tolist(), [5])
+
+    def test_interpretar_filtro(self):
+        self.assertEqual(interpretar_filtro('notificacao_ano=2020'), ('notificacao_ano', 2020))
+        self.assertEqual(interpretar_filtro('virus=DENGUE,ZIKA'), ('virus', ['DENGUE', 'ZIKA']))
@@ -0,0 +1,66 @@
+"""
+test_destinos.py
+~~~~~~~~~~~~~~~~
+
+Testes dos destinos de execução do orquestrador: nomes e diretórios de
+cada destino e leitura da lista de destinos (`jobs/orquestrador_job.py`).
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from dependencies.destinos import caminhos, caminhos_destino, destino, nome_destino
+
+# O job importa `etl_job` pelo nome, como quando enviado com --py-files
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'jobs'))
+
+import orquestrador_job  # noqa: E402
+
+
+class DestinosTests(unittest.TestCase):
+
+    def test_destino_padrao_usa_o_layout_original(self):
+        alvo = destino()
+
+        self.assertEqual(alvo, {'cidade': 'recife', 'anos': None, 'virus': None})
+        self.assertEqual(nome_destino(alvo), 'recife')
+        self.assertEqual(caminhos()['cubo'], os.path.join('data', 'agregados', 'cubo'))
+
+    def test_nome_e_caminhos_do_destino(self):
+        alvo = destino('olinda', ['2021', 2020], ['zika', 'dengue'])
+
+        self.assertEqual(alvo['anos'], [2020, 2021])
+        self.assertEqual(alvo['virus'], ['DENGUE', 'ZIKA'])
+        self.assertEqual(nome_destino(alvo), 'olinda_2020-2021_dengue-zika')
+
+        dirs = caminhos_destino(alvo, dir_cidades='saida', dir_raw='brutos')
+        self.assertEqual(dirs['raw'], 'brutos')
+        self.assertEqual(dirs['staging'], os.path.join('saida', 'olinda_2020-2021_dengue-zika', 'staging'))
+
+
+class CarregarAlvosTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_trabalho = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_trabalho)
+
+    def test_alvos_do_arquivo(self):
+        arquivo = os.path.join(self.dir_trabalho, 'alvos.json')
+        with open(arquivo, 'w') as saida:
+            json.dump([{'cidade': 'recife'}, {'cidade': 'olinda', 'anos': [2021], 'virus': ['DENGUE']}], saida)
+
+        self.assertEqual(orquestrador_job.carregar_alvos(arquivo),
+                         [destino('recife'), destino('olinda', [2021], ['DENGUE'])])
+
+    def test_uma_cidade_por_cidade_do_diretorio_bruto(self):
+        for nome in ['dengue_2020_recife.csv', 'zika_2021_olinda.csv', 'sarampo_2020_paulista.csv']:
+            open(os.path.join(self.dir_trabalho, nome), 'w').close()
+
+        self.assertEqual(orquestrador_job.carregar_alvos(dir_raw=self.dir_trabalho),
+                         [destino('olinda'), destino('recife')])
@@ -0,0 +1,50 @@
+"""
+test_esquemas.py
+~~~~~~~~~~~~~~~~
+
+Testes do registro de esquemas: leitura dos CSVs com o esquema do
+cabeçalho, projeção nas colunas registradas com os apelidos da fonte e
+codificação das dimensões de baixa cardinalidade.
+"""
+
+import os
+
+from dependencies.esquemas import (COLUNAS_STAGING, codificar_dimensoes, esquema_csv, ler_cabecalho,
+                                   projetar, rotular_dimensoes)
+from dependencies.fontes import FONTES
+from tests.base import SparkTestCase
+
+DIR_RAW = os.path.join(os.path.dirname(__file__), 'test_data', 'raw')
+
+
+class EsquemasTests(SparkTestCase):
+
+    def test_projetar_com_apelidos(self):
+        caminho = os.path.join(DIR_RAW, 'zika_2020_recife.csv')
+        cabecalho = ler_cabecalho(caminho)
+        self.assertEqual(cabecalho[3], 'ano_notificacao')
+
+        sdf = projetar(self.spark.read.schema(esquema_csv(cabecalho)).csv(caminho, sep=';', header=True),
+                       FONTES['zika']['apelidos'])
+
+        self.assertEqual(sdf.schema.fields, COLUNAS_STAGING)
+        self.assertEqual({linha['notificacao_ano'] for linha in sdf.collect()}, {2020})
+
+    def test_coluna_ausente_entra_nula(self):
+        sdf = projetar(self.spark.createDataFrame([('7', '2020-03-01')], ['nu_notificacao', 'dt_notificacao']), {})
+
+        linha = sdf.first()
+        self.assertEqual(linha['nu_notificacao'], 7)
+        self.assertEqual(str(linha['dt_notificacao']), '2020-03-01')
+        self.assertIsNone(linha['tp_sexo'])
+
+    def test_codificar_e_rotular_dimensoes(self):
+        sdf = self.spark.createDataFrame([('DENGUE', 'M'), ('ZIKA', 'X'), ('CHIKUNGUNYA', None)],
+                                         ['virus', 'tp_sexo'])
+
+        codificado = codificar_dimensoes(sdf)
+        self.assertEqual([campo.dataType.simpleString() for campo in codificado.schema.fields],
+                         ['tinyint', 'tinyint'])
+
+        linhas = [tuple(linha) for linha in rotular_dimensoes(codificado).collect()]
+        self.assertEqual(linhas, [('DENGUE', 'M'), ('ZIKA', 'I'), ('CHIKUNGUNYA', 'I')])
@@ -0,0 +1,54 @@
+"""
+test_fontes.py
+~~~~~~~~~~~~~~
+
+Testes da descoberta das fontes brutas pelo manifesto declarativo:
+arquivos de doenças não declaradas e de outras cidades são ignorados e
+os filtros de anos e vírus restringem a lista.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dependencies.fontes import descobrir_cidades, descobrir_fontes
+
+ARQUIVOS = [
+    'dengue_2019_recife.csv',
+    'dengue_2020_recife.csv',
+    'zika_2020_recife.csv',
+    'zika_2020_jaboatao_dos_guararapes.csv',
+    'sarampo_2020_olinda.csv',
+    'leia_me.csv',
+]
+
+
+class DescobrirFontesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_raw = tempfile.mkdtemp()
+        for nome in ARQUIVOS:
+            open(os.path.join(self.dir_raw, nome), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_raw)
+
+    def test_fontes_da_cidade(self):
+        fontes = descobrir_fontes(self.dir_raw)
+
+        self.assertEqual([fonte['nome'] for fonte in fontes],
+                         ['dengue_2019_recife.csv', 'dengue_2020_recife.csv', 'zika_2020_recife.csv'])
+        self.assertEqual(fontes[2]['virus'], 'ZIKA')
+        self.assertEqual(fontes[2]['ano'], 2020)
+        self.assertEqual(fontes[2]['apelidos'], {'ano_notificacao': 'notificacao_ano'})
+        self.assertEqual(descobrir_fontes(self.dir_raw, cidade='olinda'), [])
+
+    def test_filtros_de_anos_e_virus(self):
+        self.assertEqual([fonte['nome'] for fonte in descobrir_fontes(self.dir_raw, anos=[2020])],
+                         ['dengue_2020_recife.csv', 'zika_2020_recife.csv'])
+        self.assertEqual([fonte['nome'] for fonte in descobrir_fontes(self.dir_raw, virus=['ZIKA'])],
+                         ['zika_2020_recife.csv'])
+
+    def test_descobrir_cidades(self):
+        self.assertEqual(descobrir_cidades(self.dir_raw), ['jaboatao_dos_guararapes', 'recife'])
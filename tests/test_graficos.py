@@ -0,0 +1,50 @@
+"""
+test_graficos.py
+~~~~~~~~~~~~~~~~
+
+Testes da renderização dos gráficos: só os gráficos cujos dados ou
+opções mudaram (ou cujo PNG sumiu) são redesenhados.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from dependencies.graficos import ARQUIVO_HASHES, grafico, hash_grafico, renderizar
+
+
+class RenderizarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_plots = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_plots)
+
+    def barras(self, nome, quantidades, titulo='Casos'):
+        dados = pd.DataFrame({'virus': ['DENGUE', 'ZIKA'], 'quantidade': quantidades})
+        return grafico(os.path.join(self.dir_plots, nome), 'barras', dados, x='virus', y='quantidade',
+                       cores='steelblue', rotulo_x='Vírus', rotulo_y='Casos', titulo=titulo)
+
+    def test_hash_muda_com_dados_e_opcoes(self):
+        base = hash_grafico(self.barras('plot1.png', [3, 1]))
+
+        self.assertEqual(hash_grafico(self.barras('plot1.png', [3, 1])), base)
+        self.assertNotEqual(hash_grafico(self.barras('plot1.png', [3, 2])), base)
+        self.assertNotEqual(hash_grafico(self.barras('plot1.png', [3, 1], titulo='Notificações')), base)
+
+    def test_redesenha_so_os_graficos_alterados(self):
+        graficos = [self.barras('plot1.png', [3, 1]), self.barras('plot2.png', [5, 2])]
+
+        self.assertEqual(len(renderizar(graficos, processos=1)), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.dir_plots, ARQUIVO_HASHES)))
+        self.assertEqual(renderizar(graficos, processos=1), [])
+
+        graficos[1] = self.barras('plot2.png', [5, 3])
+        self.assertEqual(renderizar(graficos, processos=1), [graficos[1]['arquivo']])
+
+        os.remove(graficos[0]['arquivo'])
+        self.assertEqual(renderizar(graficos, processos=1), [graficos[0]['arquivo']])
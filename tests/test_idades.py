@@ -0,0 +1,76 @@
+"""
+test_idades.py
+~~~~~~~~~~~~~~
+
+Testes da etapa de idade: decodificação de `nu_idade`, idade pelas datas
+quando o código falta ou é inválido, faixas etárias e idades impossíveis,
+no Spark (`dependencies.idades`) e no motor local (`calcular_idade_local`).
+"""
+
+import unittest
+from datetime import date
+
+import pandas as pd
+
+from dependencies.idades import (FAIXA_INVALIDA, FAIXA_NAO_INFORMADA, calcular_idade, inicio_faixa,
+                                 rotulos_faixas)
+from dependencies.motor_local import calcular_idade_local
+from tests.base import SparkTestCase
+
+NOTIFICACAO = date(2020, 4, 10)
+
+# (nu_idade, dt_nascimento, idade, idade_invalida, faixa_etaria esperadas)
+CASOS = [
+    (4012, None, 12, False, '10-14'),
+    (3006, None, 0, False, '0-4'),
+    (2400, None, 1, False, '0-4'),
+    (1005, None, 0, False, '0-4'),
+    (4079, None, 79, False, '70-79'),
+    (4080, None, 80, False, '80+'),
+    (4130, None, 130, True, FAIXA_INVALIDA),
+    (None, '1990-05', 29, False, '20-29'),
+    (None, '1990-04-30', 30, False, '30-39'),
+    (5012, '2000-01-15', 20, False, '20-29'),
+    (None, '2021-01', -1, True, FAIXA_INVALIDA),
+    (None, None, None, False, FAIXA_NAO_INFORMADA),
+]
+
+
+class FaixasTests(unittest.TestCase):
+
+    def test_rotulos_faixas(self):
+        self.assertEqual(rotulos_faixas([0, 5, 20]), ['0-4', '5-19', '20+'])
+
+    def test_inicio_faixa(self):
+        self.assertEqual(inicio_faixa('5-19'), 5)
+        self.assertEqual(inicio_faixa('80+'), 80)
+        self.assertIsNone(inicio_faixa(FAIXA_NAO_INFORMADA))
+
+
+class CalcularIdadeLocalTests(unittest.TestCase):
+
+    def test_calcular_idade_local(self):
+        df = pd.DataFrame({
+            'nu_idade': [None if caso[0] is None else str(caso[0]) for caso in CASOS],
+            'dt_nascimento': [caso[1] for caso in CASOS],
+            'dt_notificacao': [NOTIFICACAO] * len(CASOS),
+        })
+
+        df = calcular_idade_local(df)
+
+        idades = [None if pd.isna(idade) else int(idade) for idade in df['idade']]
+        self.assertEqual(list(zip(idades, df['idade_invalida'], df['faixa_etaria'])),
+                         [caso[2:] for caso in CASOS])
+
+
+class CalcularIdadeSparkTests(SparkTestCase):
+
+    def test_calcular_idade(self):
+        sdf = self.spark.createDataFrame(
+            [(caso[0], caso[1], NOTIFICACAO) for caso in CASOS],
+            'nu_idade int, dt_nascimento string, dt_notificacao date')
+
+        linhas = calcular_idade(sdf).collect()
+
+        self.assertEqual([(linha['idade'], linha['idade_invalida'], linha['faixa_etaria']) for linha in linhas],
+                         [caso[2:] for caso in CASOS])
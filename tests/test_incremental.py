@@ -0,0 +1,90 @@
+"""
+test_incremental.py
+~~~~~~~~~~~~~~~~~~~
+
+Testes do processamento incremental: o cubo atualizado só com o saldo
+dos registros alterados deve ser igual ao cubo reconstruído a partir de
+todas as fontes, sobre cópias dos extratos de `tests/test_data/raw`.
+"""
+
+import os
+import shutil
+import tempfile
+
+from dependencies.agregacao import construir_cubo
+from dependencies.incremental import atualizar_incremental, carregar_marcas
+from dependencies.motor_local import cubos_iguais
+from dependencies.staging import preparar_staging
+from jobs import etl_job
+from tests.base import SparkTestCase
+
+DIR_RAW = os.path.join(os.path.dirname(__file__), 'test_data', 'raw')
+
+
+class AtualizarIncrementalTests(SparkTestCase):
+
+    def setUp(self):
+        self.dir_trabalho = tempfile.mkdtemp()
+        self.dir_raw = os.path.join(self.dir_trabalho, 'raw')
+        self.dir_staging = os.path.join(self.dir_trabalho, 'staging')
+        self.dir_estado = os.path.join(self.dir_trabalho, 'estado')
+        self.caminho_cubo = os.path.join(self.dir_trabalho, 'cubo')
+        shutil.copytree(DIR_RAW, self.dir_raw)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_trabalho)
+
+    def atualizar(self, versao='v1'):
+        preparar_staging(self.spark, self.dir_raw, self.dir_staging)
+        return atualizar_incremental(self.spark, etl_job.transform_data, etl_job.COLUNAS_EXTRACAO,
+                                     self.dir_staging, self.dir_estado, self.caminho_cubo, versao)
+
+    def assertCuboCompleto(self, cubo):
+        completo = construir_cubo(etl_job.transform_data(etl_job.extract_data(self.spark, self.dir_staging)))
+        self.assertTrue(cubos_iguais(cubo.toPandas(), completo.toPandas()))
+
+    def reescrever(self, nome, linhas):
+        """Regrava um extrato com as linhas (em bytes, sem o cabeçalho) dadas por `linhas`."""
+        caminho = os.path.join(self.dir_raw, nome)
+        with open(caminho, 'rb') as arquivo:
+            cabecalho, *dados = arquivo.read().splitlines()
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(b'\n'.join([cabecalho] + linhas(dados)) + b'\n')
+
+    def test_sem_alteracoes(self):
+        cubo, virus = self.atualizar()
+        self.assertEqual(virus, {'DENGUE', 'ZIKA'})
+        self.assertCuboCompleto(cubo)
+
+        cubo, virus = self.atualizar()
+        self.assertEqual(virus, set())
+        self.assertCuboCompleto(cubo)
+
+    def test_registros_repetidos_e_removidos(self):
+        self.atualizar()
+
+        # A primeira notificação passa a aparecer três vezes e a segunda some
+        self.reescrever('dengue_2020_recife.csv', lambda dados: [dados[0]] * 3 + dados[2:])
+        cubo, virus = self.atualizar()
+
+        self.assertEqual(virus, {'DENGUE'})
+        self.assertCuboCompleto(cubo)
+        self.assertEqual(carregar_marcas(self.dir_estado, 'v1')['dengue_2020_recife.csv']['registros'], 6)
+
+    def test_fonte_removida(self):
+        self.atualizar()
+
+        os.remove(os.path.join(self.dir_raw, 'zika_2020_recife.csv'))
+        cubo, virus = self.atualizar()
+
+        self.assertEqual(virus, {'ZIKA'})
+        self.assertCuboCompleto(cubo)
+        self.assertEqual(sorted(carregar_marcas(self.dir_estado, 'v1')), ['dengue_2020_recife.csv'])
+
+    def test_outra_versao_reconstroi(self):
+        self.atualizar()
+
+        cubo, virus = self.atualizar('v2')
+        self.assertEqual(virus, {'DENGUE', 'ZIKA'})
+        self.assertCuboCompleto(cubo)
+        self.assertEqual(carregar_marcas(self.dir_estado, 'v1'), {})
@@ -0,0 +1,48 @@
+"""
+test_motor_local.py
+~~~~~~~~~~~~~~~~~~~
+
+Testes do motor local: leitura de extratos fora de UTF-8 e paridade do
+cubo com o job Spark, sobre os extratos de `tests/test_data/raw` (com
+bairros gravados em Latin-1).
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dependencies.agregacao import construir_cubo
+from dependencies.motor_local import construir_cubo_local, cubos_iguais, extrair_local, transformar_local
+from dependencies.staging import preparar_staging
+from jobs import etl_job
+from tests.base import SparkTestCase
+
+DIR_RAW = os.path.join(os.path.dirname(__file__), 'test_data', 'raw')
+
+
+class ExtrairLocalTests(unittest.TestCase):
+
+    def test_bytes_invalidos_viram_caractere_de_substituicao(self):
+        df = extrair_local(etl_job.COLUNAS_EXTRACAO, DIR_RAW)
+
+        bairros = df.loc[df['virus'] == 'DENGUE', 'no_bairro_residencia'].fillna('').tolist()
+        self.assertEqual(bairros, ['V�RZEA', 'Várzea', 'BOA VIAGEM', '', 'S�O JOS�'])
+
+
+class ParidadeSparkTests(SparkTestCase):
+
+    def setUp(self):
+        self.dir_staging = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_staging)
+
+    def test_cubo_local_igual_ao_spark(self):
+        preparar_staging(self.spark, DIR_RAW, self.dir_staging)
+        cubo = construir_cubo(etl_job.transform_data(etl_job.extract_data(self.spark, self.dir_staging)))
+        local = construir_cubo_local(transformar_local(extrair_local(etl_job.COLUNAS_EXTRACAO, DIR_RAW),
+                                                       obrigatorias=etl_job.COLUNAS_OBRIGATORIAS))
+
+        self.assertEqual(local['quantidade'].sum(), 8)
+        self.assertTrue(cubos_iguais(cubo.toPandas(), local))
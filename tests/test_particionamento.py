@@ -0,0 +1,70 @@
+"""
+test_particionamento.py
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Testes do ajuste de particionamento: estimativa do número de partições
+pelo tamanho do staging, medição do tamanho de cada fonte e
+reparticionamento com sal só quando alguma fonte é grande.
+"""
+
+import os
+import shutil
+import tempfile
+
+from dependencies.particionamento import (ajustar_particoes, estimar_particoes, repartir_por_fonte,
+                                          tamanho_fontes)
+from dependencies.staging import salvar_manifesto
+from tests.base import SparkTestCase
+
+MB = 1024 ** 2
+
+
+class ParticionamentoTests(SparkTestCase):
+
+    def test_estimar_particoes(self):
+        self.assertEqual(estimar_particoes(0), 1)
+        self.assertEqual(estimar_particoes(64 * MB, fator_expansao=1), 1)
+        self.assertEqual(estimar_particoes(64 * MB + 1, fator_expansao=1), 2)
+        self.assertEqual(estimar_particoes(64 * MB), 10)
+        self.assertEqual(estimar_particoes(10 ** 12), 2000)
+
+    def test_tamanho_fontes(self):
+        dir_staging = tempfile.mkdtemp()
+        try:
+            manifesto = {}
+            for nome, virus, ano, tamanho in [('dengue_2020_recife.csv', 'DENGUE', 2020, 300),
+                                              ('zika_2020_recife.csv', 'ZIKA', 2020, 40)]:
+                particao = os.path.join(dir_staging, 'virus=' + virus, 'ano=' + str(ano))
+                os.makedirs(particao)
+                with open(os.path.join(particao, 'part-00000.parquet'), 'wb') as arquivo:
+                    arquivo.write(b'\0' * tamanho)
+                manifesto[nome] = {'virus': virus, 'ano': ano, 'particao': particao}
+            salvar_manifesto(dir_staging, manifesto)
+
+            self.assertEqual(tamanho_fontes(dir_staging), {('DENGUE', 2020): 300, ('ZIKA', 2020): 40})
+        finally:
+            shutil.rmtree(dir_staging)
+
+    def test_ajustar_particoes(self):
+        particoes = ajustar_particoes(self.spark, {('DENGUE', 2020): 64 * MB, ('ZIKA', 2020): 64 * MB},
+                                      fator_expansao=1)
+
+        self.assertEqual(particoes, 2)
+        self.assertEqual(self.spark.conf.get('spark.sql.shuffle.partitions'), '2')
+
+    def test_repartir_por_fonte(self):
+        sdf = self.spark.createDataFrame([('DENGUE', 2020, i) for i in range(40)] + [('ZIKA', 2020, 1)],
+                                         ['virus', 'ano', 'nu_notificacao'])
+
+        # Sem fontes grandes o DataFrame é devolvido sem shuffle
+        self.assertIs(repartir_por_fonte(sdf, {('DENGUE', 2020): MB, ('ZIKA', 2020): MB}), sdf)
+
+        repartido = repartir_por_fonte(sdf, {('DENGUE', 2020): 3 * MB, ('ZIKA', 2020): MB},
+                                       bytes_por_particao=MB, fator_expansao=1)
+        self.assertEqual(repartido.columns, sdf.columns)
+        self.assertEqual(sorted(repartido.collect()), sorted(sdf.collect()))
+
+        # A dengue é espalhada em três baldes e a zika fica em um só
+        virus_por_particao = repartido.rdd.glom().map(lambda linhas: {linha['virus'] for linha in linhas}).collect()
+        self.assertEqual(sum('DENGUE' in virus for virus in virus_por_particao), 3)
+        self.assertEqual(sum('ZIKA' in virus for virus in virus_por_particao), 1)
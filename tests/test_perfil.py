@@ -0,0 +1,47 @@
+"""
+test_perfil.py
+~~~~~~~~~~~~~~
+
+Testes da instrumentação das etapas no motor local (sem SparkSession):
+registro das etapas, mensagens pelo `logging` e relatório JSON.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from dependencies.perfil import Perfil
+
+
+class PerfilLocalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_plots = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_plots)
+
+    def test_etapas_e_relatorio(self):
+        perfil = Perfil(None)
+        with self.assertLogs('dependencies.perfil', 'INFO') as registros:
+            with perfil.etapa('construir_cubo') as etapa:
+                etapa['linhas_saida'] = 3
+            relatorio = perfil.salvar_relatorio(os.path.join(self.dir_plots, 'relatorio_execucao.json'))
+
+        self.assertIn('etapa construir_cubo concluida', registros.output[0])
+        self.assertEqual(relatorio['aplicacao'], 'local')
+        self.assertEqual([(etapa['etapa'], etapa['linhas_saida']) for etapa in relatorio['etapas']],
+                         [('construir_cubo', 3)])
+        with open(os.path.join(self.dir_plots, 'relatorio_execucao.json')) as arquivo:
+            self.assertEqual(json.load(arquivo)['etapas'][0]['grupo'], 'etapa-0-construir_cubo')
+
+    def test_etapa_registrada_mesmo_com_erro(self):
+        perfil = Perfil(None, prefixo='olinda-')
+        with self.assertRaises(ValueError):
+            with perfil.etapa('extract_data'):
+                raise ValueError('extrato ilegível')
+
+        self.assertEqual(perfil.etapas[0]['grupo'], 'olinda-etapa-0-extract_data')
+        self.assertIn('duracao_s', perfil.etapas[0])
@@ -0,0 +1,76 @@
+"""
+test_qualidade.py
+~~~~~~~~~~~~~~~~~
+
+Testes da etapa de qualidade: perfil por fonte e quarentena das linhas
+sem colunas obrigatórias, inclusive quando só algumas fontes são
+reprocessadas (`verificar_fontes`), sobre os extratos de
+`tests/test_data/raw`.
+"""
+
+import os
+import shutil
+import tempfile
+
+from pyspark.sql import functions as F
+
+from dependencies.qualidade import (carregar_relatorio_qualidade, descartar_rejeitadas, perfilar, salvar_quarentena,
+                                    verificar_fontes)
+from dependencies.staging import preparar_staging
+from jobs import etl_job
+from tests.base import SparkTestCase
+
+DIR_RAW = os.path.join(os.path.dirname(__file__), 'test_data', 'raw')
+
+
+class QualidadeTests(SparkTestCase):
+
+    def setUp(self):
+        self.dir_trabalho = tempfile.mkdtemp()
+        self.dir_qualidade = os.path.join(self.dir_trabalho, 'qualidade')
+        self.quarentena = os.path.join(self.dir_qualidade, 'quarentena')
+        dir_staging = os.path.join(self.dir_trabalho, 'staging')
+        preparar_staging(self.spark, DIR_RAW, dir_staging)
+        self.data = etl_job.extract_data(self.spark, dir_staging).cache()
+
+    def tearDown(self):
+        self.data.unpersist()
+        shutil.rmtree(self.dir_trabalho)
+
+    def particoes(self):
+        return sorted(os.path.join(virus, ano) for virus in os.listdir(self.quarentena) if virus.startswith('virus=')
+                      for ano in os.listdir(os.path.join(self.quarentena, virus)))
+
+    def test_perfil_e_quarentena(self):
+        relatorio = perfilar(self.data, etl_job.COLUNAS_OBRIGATORIAS)
+        salvar_quarentena(self.data, etl_job.COLUNAS_OBRIGATORIAS, self.quarentena)
+
+        # Em cada extrato, a linha 4 não tem bairro
+        self.assertEqual((relatorio['linhas'], relatorio['rejeitadas']), (10, 2))
+        self.assertEqual(relatorio['fontes']['DENGUE/2020']['motivos']['nulo:no_bairro_residencia'], 1)
+        self.assertEqual(relatorio['fontes']['ZIKA/2020']['colunas']['tp_sexo']['invalidos'], 0)
+        quarentena = self.spark.read.parquet(self.quarentena)
+        self.assertEqual(sorted(linha['motivo'] for linha in quarentena.collect()),
+                         ['nulo:no_bairro_residencia'] * 2)
+        self.assertEqual(descartar_rejeitadas(self.data, etl_job.COLUNAS_OBRIGATORIAS).count(), 8)
+
+    def test_verificar_so_as_fontes_reprocessadas(self):
+        fontes = [('DENGUE', 2020), ('ZIKA', 2020)]
+        aceitas = verificar_fontes(self.data, fontes, fontes, etl_job.COLUNAS_OBRIGATORIAS, self.dir_qualidade)
+        self.assertEqual(aceitas.count(), 8)
+        self.assertEqual(self.particoes(), ['virus=DENGUE/ano=2020', 'virus=ZIKA/ano=2020'])
+
+        # A Dengue é reprocessada sem a linha rejeitada: sai da quarentena,
+        # e a entrada da Zika no relatório é mantida
+        dengue = self.data.filter((F.col('virus') == 'DENGUE') & F.col('no_bairro_residencia').isNotNull())
+        verificar_fontes(dengue, [('DENGUE', 2020)], fontes, etl_job.COLUNAS_OBRIGATORIAS, self.dir_qualidade)
+        relatorio = carregar_relatorio_qualidade(self.dir_qualidade)
+        self.assertEqual((relatorio['linhas'], relatorio['rejeitadas']), (9, 1))
+        self.assertEqual(self.particoes(), ['virus=ZIKA/ano=2020'])
+
+        # A fonte da Zika deixa de existir
+        self.assertIsNone(verificar_fontes(None, [], [('DENGUE', 2020)], etl_job.COLUNAS_OBRIGATORIAS,
+                                           self.dir_qualidade))
+        relatorio = carregar_relatorio_qualidade(self.dir_qualidade)
+        self.assertEqual(sorted(relatorio['fontes']), ['DENGUE/2020'])
+        self.assertEqual(self.particoes(), [])
@@ -0,0 +1,35 @@
+"""
+test_rotulos.py
+~~~~~~~~~~~~~~~
+
+Testes dos mapeamentos código -> rótulo compilados em mapas literais do
+Spark: rotulação, volta aos códigos e códigos fora do mapeamento.
+"""
+
+from dependencies.rotulos import MESES, SEXOS, TRIMESTRES, codificar, inverter, rotular
+from tests.base import SparkTestCase
+
+
+class RotulosTests(SparkTestCase):
+
+    def test_inverter(self):
+        self.assertEqual(inverter(TRIMESTRES), {'Q1': 1, 'Q2': 2, 'Q3': 3, 'Q4': 4})
+
+    def test_rotular_e_codificar(self):
+        sdf = self.spark.createDataFrame([(1,), (3,), (12,), (13,)], ['mes'])
+
+        linhas = (sdf
+                  .withColumn('rotulo', rotular(MESES, 'mes'))
+                  .withColumn('codigo', codificar(MESES, 'rotulo'))
+                  .orderBy('mes')
+                  .collect())
+
+        self.assertEqual([(linha['rotulo'], linha['codigo']) for linha in linhas],
+                         [('Janeiro', 1), ('Março', 3), ('Dezembro', 12), (None, None)])
+
+    def test_rotular_column(self):
+        sdf = self.spark.createDataFrame([('m',), ('F',), ('X',)], ['tp_sexo'])
+
+        rotulos = [linha[0] for linha in sdf.select(rotular(SEXOS, sdf.tp_sexo)).collect()]
+
+        self.assertEqual(rotulos, [None, 'FEMININO', None])
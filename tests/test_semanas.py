@@ -0,0 +1,192 @@
+"""
+test_semanas.py
+~~~~~~~~~~~~~~~
+
+Testes das séries semanais: calendário de semanas epidemiológicas e
+preenchimento com zero das semanas sem casos e regravação por ano (e
+por vírus) das séries, no Spark (`dependencies.semanas`) e no motor
+local.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+import pandas as pd
+from pyspark.sql import functions as F
+
+from dependencies.motor_local import calcular_series_local, casos_semanais_local, salvar_series_local
+from dependencies.semanas import (BAIRRO_TODOS, CHAVE_SEMANA, anos_gravados, calcular_series, calendario_semanas,
+                                  calendario_semanas_spark, casos_semanais, inicio_semanas, salvar_series,
+                                  semana_epidemiologica, semanas_no_ano)
+from tests.base import SparkTestCase
+
+# Cubo reduzido às colunas usadas pelas séries, com lacunas que cruzam a
+# virada de 2019 para 2020 (um ano de 53 semanas)
+LINHAS = [
+    ('DENGUE', 'VARZEA', 201951, 2),
+    ('DENGUE', 'VARZEA', 202002, 3),
+    ('DENGUE', 'IBURA', 202002, 1),
+    ('ZIKA', 'VARZEA', 202053, 4),
+    ('DENGUE', 'VARZEA', None, 7),
+]
+CUBO = pd.DataFrame(LINHAS, columns=['virus', 'no_bairro_residencia', 'notificacao_semana', 'quantidade'])
+
+SEMANAS = [201951, 201952] + list(range(202001, 202054))
+
+
+def esperado():
+    """Casos esperados por (vírus, bairro, semana); as demais semanas têm zero."""
+    return {
+        ('DENGUE', 'VARZEA', 201951): 2, ('DENGUE', 'VARZEA', 202002): 3,
+        ('DENGUE', 'IBURA', 202002): 1, ('ZIKA', 'VARZEA', 202053): 4,
+        ('DENGUE', BAIRRO_TODOS, 201951): 2, ('DENGUE', BAIRRO_TODOS, 202002): 4,
+        ('ZIKA', BAIRRO_TODOS, 202053): 4,
+    }
+
+
+class CalendarioTests(unittest.TestCase):
+
+    def test_inicio_semanas(self):
+        self.assertEqual(inicio_semanas(2019), date(2018, 12, 30))
+        self.assertEqual(inicio_semanas(2021), date(2021, 1, 3))
+
+    def test_semanas_no_ano(self):
+        self.assertEqual([semanas_no_ano(ano) for ano in (2014, 2015, 2019, 2020, 2021)], [53, 52, 52, 53, 52])
+
+    def test_semana_epidemiologica(self):
+        self.assertEqual(semana_epidemiologica(date(2019, 12, 28)), 201952)
+        self.assertEqual(semana_epidemiologica(date(2019, 12, 29)), 202001)
+        self.assertEqual(semana_epidemiologica(date(2021, 1, 2)), 202053)
+        self.assertEqual(semana_epidemiologica(date(2021, 1, 3)), 202101)
+        self.assertEqual(semana_epidemiologica(date(2015, 1, 3)), 201453)
+
+    def test_calendario_semanas(self):
+        self.assertEqual(calendario_semanas(201951, 202053), SEMANAS)
+        self.assertEqual(calendario_semanas(202010, 202010), [202010])
+
+
+class CasosSemanaisLocalTests(unittest.TestCase):
+
+    def test_preenche_semanas_sem_casos(self):
+        df = casos_semanais_local(CUBO)
+
+        chaves = df[['virus', 'no_bairro_residencia']].drop_duplicates()
+        self.assertEqual(len(chaves), 5)
+        self.assertEqual(len(df), 5 * len(SEMANAS))
+        for _, grupo in df.groupby(['virus', 'no_bairro_residencia']):
+            self.assertEqual(sorted(grupo['notificacao_semana']), SEMANAS)
+
+        casos = {tuple(linha[:3]): linha[3] for linha in df[CHAVE_SEMANA + ['casos']].itertuples(index=False)}
+        self.assertEqual({chave: valor for chave, valor in casos.items() if valor}, esperado())
+        self.assertEqual(casos[('ZIKA', 'VARZEA', 201952)], 0)
+        self.assertTrue((df['ano'] * 100 + df['semana_ano'] == df['notificacao_semana']).all())
+
+
+class CasosSemanaisSparkTests(SparkTestCase):
+
+    def test_igual_ao_motor_local(self):
+        cubo = self.spark.createDataFrame(LINHAS, 'virus string, no_bairro_residencia string, '
+                                          'notificacao_semana int, quantidade long')
+
+        spark = casos_semanais(cubo).toPandas().sort_values(CHAVE_SEMANA, ignore_index=True)
+        local = casos_semanais_local(CUBO).sort_values(CHAVE_SEMANA, ignore_index=True)
+
+        colunas = CHAVE_SEMANA + ['ano', 'semana_ano', 'casos']
+        pd.testing.assert_frame_equal(spark[colunas].astype(str), local[colunas].astype(str))
+
+    def test_semana_epidemiologica_igual_a_do_calendario(self):
+        datas = self.spark.sql("select explode(sequence(date'2014-12-20', date'2021-01-10')) as data")
+
+        semanas = {linha['data']: linha['semana'] for linha in
+                   datas.select('data', semana_epidemiologica(F.col('data')).alias('semana')).collect()}
+        self.assertEqual(semanas, {data: semana_epidemiologica(data) for data in semanas})
+        self.assertEqual(sorted(set(semanas.values())), calendario_semanas(201451, 202102))
+
+
+class SalvarSeriesLocalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_agregados = tempfile.mkdtemp()
+        self.semanas = os.path.join(self.dir_agregados, 'semanas')
+        self.alertas = os.path.join(self.dir_agregados, 'alertas')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_agregados)
+
+    def salvar(self, cubo):
+        return salvar_series_local(calcular_series_local(cubo), self.semanas, self.alertas)
+
+    def test_anos_que_sairam_das_series_sao_descartados(self):
+        self.assertEqual(self.salvar(CUBO), [2019, 2020])
+
+        # Sem as fontes de 2019: 2020 é regravado (a média móvel e o canal
+        # endêmico dependem dos anos anteriores) e a partição de 2019 sai
+        self.assertEqual(self.salvar(CUBO[CUBO['notificacao_semana'] >= 202001]), [2020])
+        self.assertEqual(anos_gravados(self.semanas), {2020})
+        self.assertFalse(os.path.exists(self.semanas + '.tmp'))
+
+    def test_ultimo_ano_removido(self):
+        self.salvar(CUBO)
+
+        self.salvar(CUBO[CUBO['notificacao_semana'] < 202001])
+        self.assertEqual(anos_gravados(self.semanas), {2019})
+        self.assertEqual(anos_gravados(self.alertas) - {2019}, set())
+
+    def test_falha_na_escrita_mantem_o_dataset(self):
+        self.salvar(CUBO)
+        alterado = CUBO.assign(quantidade=CUBO['quantidade'] + 1)
+
+        with mock.patch('dependencies.motor_local.pq.write_to_dataset', side_effect=OSError('disco cheio')):
+            with self.assertRaises(OSError):
+                self.salvar(alterado)
+
+        self.assertEqual(anos_gravados(self.semanas), {2019, 2020})
+        self.assertEqual(self.salvar(alterado), [2019, 2020])
+
+
+class SalvarSeriesSparkTests(SparkTestCase):
+
+    def test_anos_que_sairam_das_series_sao_descartados(self):
+        dir_agregados = tempfile.mkdtemp()
+        semanas = os.path.join(dir_agregados, 'semanas')
+        alertas = os.path.join(dir_agregados, 'alertas')
+        esquema = 'virus string, no_bairro_residencia string, notificacao_semana int, quantidade long'
+        try:
+            cubo = self.spark.createDataFrame(LINHAS, esquema)
+            self.assertEqual(salvar_series(self.spark, calcular_series(cubo), semanas, alertas), [2019, 2020])
+
+            sem_2019 = self.spark.createDataFrame([linha for linha in LINHAS if (linha[2] or 0) >= 202001], esquema)
+            self.assertEqual(salvar_series(self.spark, calcular_series(sem_2019), semanas, alertas), [2020])
+            self.assertEqual(anos_gravados(semanas), {2020})
+            self.assertEqual(self.spark.read.parquet(semanas).filter('ano = 2019').count(), 0)
+        finally:
+            shutil.rmtree(dir_agregados)
+
+    def test_series_de_alguns_virus(self):
+        dir_agregados = tempfile.mkdtemp()
+        semanas = os.path.join(dir_agregados, 'semanas')
+        alertas = os.path.join(dir_agregados, 'alertas')
+        esquema = 'virus string, no_bairro_residencia string, notificacao_semana int, quantidade long'
+        try:
+            salvar_series(self.spark, calcular_series(self.spark.createDataFrame(LINHAS, esquema)), semanas, alertas)
+
+            # Só a Zika muda, sem mudar os limites do calendário: as séries
+            # dela são calculadas sobre o calendário do cubo inteiro e as da
+            # Dengue gravadas são mantidas (o novo bairro da Zika entra com
+            # zeros desde 2019)
+            linhas = LINHAS + [('ZIKA', 'IBURA', 202010, 2)]
+            cubo = self.spark.createDataFrame(linhas, esquema)
+            calendario = calendario_semanas_spark(cubo.filter('notificacao_semana is not null'))
+            series = calcular_series(cubo.filter("virus = 'ZIKA'"), calendario=calendario)
+            self.assertEqual(salvar_series(self.spark, series, semanas, alertas, ['ZIKA']), [2019, 2020])
+
+            gravadas = self.spark.read.parquet(semanas).drop('ano')
+            completas = calcular_series(cubo).drop('ano').select(*gravadas.columns)
+            self.assertEqual(gravadas.exceptAll(completas).count(), 0)
+            self.assertEqual(completas.exceptAll(gravadas).count(), 0)
+        finally:
+            shutil.rmtree(dir_agregados)
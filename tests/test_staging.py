@@ -0,0 +1,70 @@
+"""
+test_staging.py
+~~~~~~~~~~~~~~~
+
+Testes da camada de staging: conversão dos CSVs brutos para o dataset
+Parquet particionado, reconversão só das fontes alteradas e remoção das
+partições de fontes que saíram do diretório bruto.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+from dependencies.esquemas import COLUNAS_STAGING
+from dependencies.staging import ARQUIVO_MANIFESTO, preparar_staging
+from tests.base import SparkTestCase
+
+DIR_RAW = os.path.join(os.path.dirname(__file__), 'test_data', 'raw')
+
+
+class PrepararStagingTests(SparkTestCase):
+
+    def setUp(self):
+        self.dir_trabalho = tempfile.mkdtemp()
+        self.dir_raw = os.path.join(self.dir_trabalho, 'raw')
+        self.dir_staging = os.path.join(self.dir_trabalho, 'staging')
+        shutil.copytree(DIR_RAW, self.dir_raw)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_trabalho)
+
+    def manifesto(self):
+        with open(os.path.join(self.dir_staging, ARQUIVO_MANIFESTO)) as arquivo:
+            return json.load(arquivo)
+
+    def test_conversao(self):
+        convertidos = preparar_staging(self.spark, self.dir_raw, self.dir_staging)
+        self.assertEqual(convertidos, ['dengue_2020_recife.csv', 'zika_2020_recife.csv'])
+
+        sdf = self.spark.read.parquet(self.dir_staging)
+        self.assertEqual(sorted(sdf.columns), sorted([campo.name for campo in COLUNAS_STAGING] + ['virus', 'ano']))
+        contagens = {(linha['virus'], linha['ano']): linha['count']
+                     for linha in sdf.groupBy('virus', 'ano').count().collect()}
+        self.assertEqual(contagens, {('DENGUE', 2020): 5, ('ZIKA', 2020): 5})
+
+    def test_reconverte_so_as_fontes_alteradas(self):
+        preparar_staging(self.spark, self.dir_raw, self.dir_staging)
+
+        # Um `touch` não muda o conteúdo e não reconverte
+        os.utime(os.path.join(self.dir_raw, 'dengue_2020_recife.csv'))
+        self.assertEqual(preparar_staging(self.spark, self.dir_raw, self.dir_staging), [])
+
+        with open(os.path.join(self.dir_raw, 'zika_2020_recife.csv'), 'rb') as arquivo:
+            linhas = arquivo.read().splitlines()
+        with open(os.path.join(self.dir_raw, 'zika_2020_recife.csv'), 'wb') as arquivo:
+            arquivo.write(b'\n'.join(linhas[:-1]) + b'\n')
+
+        self.assertEqual(preparar_staging(self.spark, self.dir_raw, self.dir_staging), ['zika_2020_recife.csv'])
+        sdf = self.spark.read.parquet(self.dir_staging)
+        self.assertEqual(sdf.filter(sdf.virus == 'ZIKA').count(), 4)
+        self.assertEqual(sdf.filter(sdf.virus == 'DENGUE').count(), 5)
+
+    def test_remove_particoes_de_fontes_ausentes(self):
+        preparar_staging(self.spark, self.dir_raw, self.dir_staging)
+        os.remove(os.path.join(self.dir_raw, 'zika_2020_recife.csv'))
+
+        self.assertEqual(preparar_staging(self.spark, self.dir_raw, self.dir_staging), [])
+        self.assertFalse(os.path.exists(os.path.join(self.dir_staging, 'virus=ZIKA')))
+        self.assertEqual(list(self.manifesto()), ['dengue_2020_recife.csv'])
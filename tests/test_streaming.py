@@ -0,0 +1,35 @@
+"""
+test_streaming.py
+~~~~~~~~~~~~~~~~~
+
+Testes da escolha do extrato vigente de cada fonte em um lote do fluxo
+contínuo (`jobs/streaming_job.py`).
+"""
+
+import os
+import sys
+
+from tests.base import SparkTestCase
+
+# O job importa `etl_job` pelo nome, como quando enviado com --py-files
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'jobs'))
+
+import streaming_job  # noqa: E402
+
+
+class ExtratosVigentesTests(SparkTestCase):
+
+    def test_maior_edicao_de_cada_fonte(self):
+        linhas = self.spark.createDataFrame([
+            ('DENGUE', 2021, 'dengue_2021_recife.csv'),
+            ('DENGUE', 2021, 'dengue_2021_recife_s9.csv'),
+            ('DENGUE', 2021, 'dengue_2021_recife_s10.csv'),
+            ('DENGUE', 2020, 'dengue_2020_recife.csv'),
+            ('ZIKA', 2021, 'zika_2021_recife_s3.csv'),
+        ], 'virus string, ano int, arquivo string')
+
+        self.assertEqual(streaming_job.extratos_vigentes(linhas), {
+            ('DENGUE', 2021): 'dengue_2021_recife_s10.csv',
+            ('DENGUE', 2020): 'dengue_2020_recife.csv',
+            ('ZIKA', 2021): 'zika_2021_recife_s3.csv',
+        })